@@ -7,7 +7,6 @@ import io
 import re
 import google.generativeai as genai
 from dotenv import load_dotenv
-import docx
 from json.decoder import JSONDecodeError
 from docx import Document
 from docx.shared import Pt, RGBColor, Inches
@@ -15,60 +14,305 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 import random
+import time
+import copy
+import difflib
+import functools
 from docx.enum.table import WD_TABLE_ALIGNMENT , WD_CELL_VERTICAL_ALIGNMENT
+import result_cache
+import gemini_client
+import stream_json
+import text_layout
+import assets
+import prompt_compaction
+import ingestion
+import resume_parser
+import json_repair
+import resilience
+import fast_score
+import fake_gemini
+import model_router
+import metrics
+import profiling
+import threading
+import contextvars
 
 load_dotenv()
 
+MODEL_NAME = model_router.QUALITY_MODEL
+# Bump whenever the prompt text or the post-processing of a response changes,
+# so stale cache entries are never served for the new prompts.
+PROMPT_VERSION = "3"
+
 # --- Gemini Client Initialization ---
+# Local fake with injectable latency and errors (see fake_gemini); no API key needed.
+# GEMINI_FAKE=1 synthesizes responses, GEMINI_FAKE=replay replays ones recorded from the
+# real model with GEMINI_RECORD=1 (both use GEMINI_RECORDINGS_PATH).
+GEMINI_FAKE = os.environ.get("GEMINI_FAKE", "0") != "0"
+GEMINI_RECORD = os.environ.get("GEMINI_RECORD", "0") != "0"
+
+def _new_model(name):
+    if GEMINI_FAKE:
+        return fake_gemini.FakeModel.from_env()
+    if GEMINI_RECORD:
+        return fake_gemini.RecordingModel(genai.GenerativeModel(name), name)
+    return genai.GenerativeModel(name)
+
 model = None
 try:
     gemini_key = os.environ.get("GEMINI_API_KEY")
-    if not gemini_key:
+    if GEMINI_FAKE:
+        model = _new_model(MODEL_NAME)
+        print(f"Using the local fake Gemini model (GEMINI_FAKE={os.environ['GEMINI_FAKE']}).")
+    elif not gemini_key:
         print("FATAL ERROR: GEMINI_API_KEY environment variable not found.")
     else:
         genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        print("Gemini model 'gemini-1.5-flash' initialized successfully.")
+        model = _new_model(MODEL_NAME)
+        print(f"Gemini model '{MODEL_NAME}' initialized successfully.")
+        if GEMINI_RECORD:
+            print(f"Recording Gemini responses to {fake_gemini.RECORDINGS_PATH}.")
 except Exception as e:
     print(f"Error initializing Gemini client: {e}")
 
-def extract_text_from_docx_stream(docx_stream):
+# --- Model Routing ---
+# Each call picks a model from its mode, prompt size and latency SLO (see model_router):
+# flash for reformat and job-title rewrites, pro for analysis and JD-tailored rewrites.
+router = model_router.from_env()
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(name=None):
+    """The model for a routed model name, created on first use; None means MODEL_NAME."""
+    if model is None or name in (None, MODEL_NAME):
+        return model
+    with _models_lock:
+        if name not in _models:
+            _models[name] = _new_model(name)
+            print(f"Gemini model '{name}' initialized for routed calls.")
+        return _models[name]
+
+def _record_gemini_call(route, seconds, outcome, response_text=""):
+    """Feeds one call's latency to the router and its latency, tokens and size to /metrics."""
+    router.record(route, None if outcome == "rejected" else seconds, ok=outcome == "ok")
+    metrics.GEMINI_SECONDS.observe(route.mode, route.model, outcome, value=seconds)
+    metrics.GEMINI_TOKENS.observe(route.mode, "prompt", value=route.tokens)
+    if outcome == "ok":
+        metrics.GEMINI_TOKENS.observe(route.mode, "response", value=prompt_compaction.estimate_tokens(response_text))
+        metrics.PAYLOAD_BYTES.observe("gemini_response", value=len(response_text))
+
+def _call_outcome(error):
+    if isinstance(error, resilience.CircuitOpenError):
+        return "rejected"  # Never reached the model
+    return "timeout" if isinstance(error, TimeoutError) else "error"
+
+# Set when a call in the current AI call was moved off its mode's preferred model. Its result
+# must not be cached: the cache key names the preferred model, and the fallback's answer
+# would outlive the slowdown that caused it.
+_rerouted = contextvars.ContextVar("gemini_rerouted", default=False)
+
+def _route(mode, prompt):
+    route = router.route(mode, prompt)
+    if route.model != router.preferred(mode):
+        _rerouted.set(True)
+    return route
+
+def _routed_generate(mode, prompt, generation_config):
+    """One non-streaming Gemini call on the model the router picks, with its latency recorded."""
+    route = _route(mode, prompt)
+    start = time.perf_counter()
     try:
-        document = docx.Document(docx_stream)
-        return "\n".join([para.text for para in document.paragraphs])
+        with metrics.stage("gemini_call"):
+            response = gemini.generate(prompt, generation_config, model_name=route.model)
     except Exception as e:
-        print(f"Error reading DOCX stream: {e}")
-        return None
+        _record_gemini_call(route, time.perf_counter() - start, _call_outcome(e))
+        raise
+    _record_gemini_call(route, time.perf_counter() - start, "ok", response.text if response.parts else "")
+    return response
 
-def extract_text_from_pdf_stream(pdf_stream):
+def _routed_stream(mode, prompt, generation_config):
+    """Streaming counterpart of _routed_generate; the latency recorded is for the whole stream."""
+    route = _route(mode, prompt)
+    start = time.perf_counter()
+    texts = []
     try:
-        doc = fitz.open(stream=pdf_stream, filetype="pdf")
-        text = "".join(page.get_text() for page in doc)
-        doc.close()
-        return text
+        with metrics.stage("gemini_call"):
+            for chunk in gemini.stream(prompt, generation_config, model_name=route.model):
+                if chunk.parts:
+                    texts.append(chunk.text)
+                yield chunk
     except Exception as e:
-        print(f"Error reading PDF stream: {e}")
+        _record_gemini_call(route, time.perf_counter() - start, _call_outcome(e))
+        raise
+    _record_gemini_call(route, time.perf_counter() - start, "ok", "".join(texts))
+
+# All Gemini calls go through this client: it bounds concurrency, enforces per-call
+# deadlines, lets identical in-flight prompts share one upstream request, retries transient
+# failures, hedges calls slower than the recent p95 and trips a circuit breaker when
+# Gemini keeps failing (see resilience).
+gemini = gemini_client.AsyncGeminiClient(
+    get_model,
+    max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8)),
+    timeout=float(os.environ.get("GEMINI_TIMEOUT_SECONDS", 90)),
+    # Per attempt, so a stuck call leaves time for a retry within the deadline
+    upstream_timeout=float(os.environ.get("GEMINI_ATTEMPT_TIMEOUT_SECONDS", 45)),
+    max_retries=int(os.environ.get("GEMINI_MAX_RETRIES", 2)),
+    hedge_percentile=float(os.environ.get("GEMINI_HEDGE_PERCENTILE", 95)),
+    hedge_min_delay=float(os.environ.get("GEMINI_HEDGE_MIN_DELAY_SECONDS", 1)),
+    breaker=resilience.CircuitBreaker(
+        failure_threshold=int(os.environ.get("GEMINI_BREAKER_FAILURES", 5)),
+        reset_timeout=float(os.environ.get("GEMINI_BREAKER_RESET_SECONDS", 30)),
+    ),
+)
+# While the breaker is open, first-pass analyses use the local fast score and reformats
+# accept a lower-confidence local parse instead of failing. GEMINI_LOCAL_FALLBACK=0 disables it.
+LOCAL_FALLBACK = os.environ.get("GEMINI_LOCAL_FALLBACK", "1") != "0"
+UNAVAILABLE_ERROR = "The AI service is temporarily unavailable. Please try again in a minute."
+
+# --- AI Result Cache ---
+# Identical (resume, JD/job title, mode) submissions are served from here instead of
+# another Gemini round trip. Set AI_CACHE_DIR to an empty string to keep it in memory only.
+_ai_cache_dir = os.environ.get("AI_CACHE_DIR", os.path.join(".cache", "ai_results"))
+ai_cache = result_cache.TieredCache(
+    "ai_results",
+    memory=result_cache.MemoryLRU(max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", 256))),
+    disk=result_cache.DiskStore(
+        _ai_cache_dir,
+        ttl_seconds=int(os.environ.get("AI_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_bytes=int(os.environ.get("AI_CACHE_MAX_MB", 200)) * 1024 * 1024,
+    ) if _ai_cache_dir else None,
+)
+
+def _cached_ai_call(mode, key_parts, compute, is_cacheable=lambda result: "error" not in result):
+    """Serves an AI call from the result cache, or runs compute(cache_key) and caches a successful result."""
+    cache_key = result_cache.make_key(mode, PROMPT_VERSION, router.preferred(mode), *key_parts)
+    with profiling.span("ai_cache_lookup"):
+        cached = ai_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    start = time.perf_counter()
+    _rerouted.set(False)
+    result = compute(cache_key)
+    # Local fallbacks stand in for an unavailable Gemini and must not outlive the outage
+    if is_cacheable(result) and not result.get("degraded") and not _rerouted.get():
+        ai_cache.set(cache_key, result, cost_seconds=time.perf_counter() - start)
+    return result
+
+SCORING_WEIGHTS = fast_score.SCORING_WEIGHTS
+
+# --- Response Schemas ---
+# Gemini output is repaired (truncation, fences, trailing commas) and coerced to these
+# shapes; fields that are still missing are requested on their own instead of the whole call.
+_CATEGORY_SPEC = {"type": "object", "fields": {
+    "score": {"type": "integer", "min": 0, "max": 100, "hint": "[Integer 0-100]"},
+    "justification": {"type": "string", "default": "", "hint": "[Justify score]"},
+}}
+_STRING_LIST_SPEC = {"type": "array", "items": {"type": "string"}, "default": []}
+ANALYSIS_SCHEMA = json_repair.Schema({"type": "object", "fields": {
+    "summary": {"type": "string", "default": ""},
+    "strengths": _STRING_LIST_SPEC,
+    "missing_keywords": _STRING_LIST_SPEC,
+    "suggested_changes": _STRING_LIST_SPEC,
+    "scoring_breakdown": {"type": "object", "fields": {category: _CATEGORY_SPEC for category in SCORING_WEIGHTS}},
+}})
+RESUME_SCHEMA = json_repair.Schema({"type": "object", "fields": {
+    "candidate_name": {"type": "string", "default": ""},
+    "designation_line": {"type": "string", "default": ""},
+    "contact_info": {"type": "object", "default": {}, "fields": {
+        "phone": {"type": "string", "default": ""}, "email": {"type": "string", "default": ""}}},
+    "sections": {"type": "array", "items": {"type": "object", "fields": {
+        "title": {"type": "string", "default": ""}, "content": {"type": "any", "default": ""}}}},
+}})
+# Follow-up requests for missing fields or cut-off sections, per call (0 disables them)
+MAX_FRAGMENT_REQUESTS = int(os.environ.get("AI_MAX_FRAGMENT_REQUESTS", 1))
+
+def _request_fragment(mode, prompt, generation_config):
+    """Asks Gemini for a missing piece of a response; returns the parsed JSON or None."""
+    json_repair.repair_stats.record("fragment_requests")
+    try:
+        response = _routed_generate(mode, prompt, generation_config)
+        if not response.parts:
+            return None
+        fragment = json_repair.repair(response.text).value
+    except Exception as e:
+        print(f"Fragment request failed: {type(e).__name__} - {e}")
         return None
+    return fragment if isinstance(fragment, dict) else None
+
+def _has_valid_breakdown(result):
+    breakdown = result.get("scoring_breakdown", {})
+    return isinstance(breakdown, dict) and all(
+        k in breakdown and isinstance(breakdown[k], dict) and "score" in breakdown[k] for k in SCORING_WEIGHTS.keys())
+
+def _score_jitter(seed):
+    """Small score variation that is stable for a given input, so cached results stay consistent."""
+    return random.Random(seed).randint(-2, 2)
+
+# Prompts are built from normalized text with compact JSON (see prompt_compaction).
+# PROMPT_COMPACTION=0 sends the uncompacted prompts, e.g. to compare answer quality.
+PROMPT_COMPACTION = os.environ.get("PROMPT_COMPACTION", "1") != "0"
+
+def _prepare_prompt(mode, build_prompt, *args):
+    """Builds a prompt and records its estimated token count with and without compaction."""
+    with metrics.stage("prompt_build"):
+        raw_prompt, generation_config = build_prompt(*args, compact=False)
+        if not PROMPT_COMPACTION:
+            prompt_compaction.compaction_stats.record(mode, raw_prompt, raw_prompt)
+            return raw_prompt, generation_config
+        full_prompt, generation_config = build_prompt(*args, compact=True)
+        prompt_compaction.compaction_stats.record(mode, raw_prompt, full_prompt)
+        return full_prompt, generation_config
+
+# Text extraction goes through ingestion, which enforces the upload size, page and
+# character limits (raising ingestion.UploadRejected) and avoids copying the upload.
+def extract_text_from_docx_stream(docx_stream):
+    return ingestion.extract_text("upload.docx", docx_stream)
+
+def extract_text_from_pdf_stream(pdf_stream):
+    return ingestion.extract_text("upload.pdf", pdf_stream)
 
 def extract_text_from_file(file_storage):
-    filename = file_storage.filename.lower()
-    file_stream = io.BytesIO(file_storage.read())
-    if filename.endswith('.pdf'):
-        return extract_text_from_pdf_stream(file_stream)
-    elif filename.endswith('.docx'):
-        return extract_text_from_docx_stream(file_stream)
-    else:
-        print(f"Unsupported file format: {filename}")
-        return None
+    # The spooled upload stream is read in place rather than copied with read()
+    return ingestion.extract_text(file_storage.filename, file_storage.stream)
+
+@profiling.traced()
+def extract_resume(file_storage):
+    """Like extract_text_from_file, but returns an ingestion.ExtractedText (text, candidate name, digest), or None."""
+    return ingestion.extract(file_storage.filename, file_storage.stream)
+
+def extract_text_from_bytes(filename, data):
+    """Extracts text from raw upload bytes. Module-level so it can run in a process pool."""
+    return ingestion.extract_text_from_bytes(filename, data)
 
+@profiling.traced()
 def analyze_resume_with_ai(resume_text, jd_text, initial_analysis=None):
     if not model:
         return {"error": "AI client not initialized. Check server logs for API Key issues."}
 
+    mode, key_parts = _analysis_cache_args(resume_text, jd_text, initial_analysis)
+    return _cached_ai_call(mode, key_parts, lambda cache_key: _analyze_resume_uncached(resume_text, jd_text, initial_analysis, cache_key),
+                           is_cacheable=_is_cacheable_analysis)
+
+def get_cached_analysis(resume_text, jd_text):
+    """Returns a previously computed first-pass analysis for this resume and JD, or None."""
+    mode, key_parts = _analysis_cache_args(resume_text, jd_text, None)
+    return ai_cache.get(result_cache.make_key(mode, PROMPT_VERSION, router.preferred(mode), *key_parts))
+
+def _analysis_cache_args(resume_text, jd_text, initial_analysis):
+    mode = "reanalyze" if initial_analysis else "analyze"
+    return mode, [result_cache.normalize_text(resume_text), result_cache.normalize_text(jd_text), initial_analysis]
+
+def _is_cacheable_analysis(result):
+    return "error" not in result and _has_valid_breakdown(result)
+
+def _build_analysis_prompt(resume_text, jd_text, initial_analysis, compact=True):
     generation_config = {
       "temperature": 0.2,
       "response_mime_type": "application/json",
     }
+    if compact:
+        resume_text = prompt_compaction.normalize_text(resume_text)
+        jd_text = prompt_compaction.normalize_text(jd_text)
     
     # Gemini works best by combining system instructions with the user query
     # into a single, comprehensive prompt.
@@ -80,7 +324,7 @@ def analyze_resume_with_ai(resume_text, jd_text, initial_analysis=None):
             "Your entire output MUST be a single, valid JSON object.\n\n"
             "Your task is to re-evaluate the resume. You are given the initial analysis which pointed out gaps. Now, review the new resume text and assess the improvements.\n\n"
             f"--- JOB DESCRIPTION ---\n{jd_text}\n\n"
-            f"--- INITIAL ANALYSIS & SUGGESTIONS ---\n{json.dumps(initial_analysis, indent=2)}\n\n"
+            f"--- INITIAL ANALYSIS & SUGGESTIONS ---\n{prompt_compaction.dump_json(initial_analysis, compact)}\n\n"
             f"--- NEW, UPDATED RESUME TEXT ---\n{resume_text}\n\n"
             "--- RE-ANALYSIS REQUIREMENTS ---\n"
             "Generate a new JSON analysis. The scores in this new analysis should be HIGHER than the initial analysis if the suggestions were followed. "
@@ -126,56 +370,326 @@ def analyze_resume_with_ai(resume_text, jd_text, initial_analysis=None):
             }
             """
         )
+    if compact:
+        full_prompt = prompt_compaction.squeeze_prompt(full_prompt)
+    return full_prompt, generation_config
+
+@metrics.timed("scoring")
+def _score_analysis(result, jitter_seed):
+    """Computes the weighted match_score from the AI's per-category scoring_breakdown."""
+    breakdown = result.get("scoring_breakdown", {})
+    
+    total_score = 0
+    if _has_valid_breakdown(result):
+        for category, weight in SCORING_WEIGHTS.items():
+            score_str = str(breakdown[category].get("score", "0")).strip('%')
+            score = int(score_str) if score_str.isdigit() else 0
+            total_score += score * weight
+        
+        total_score += _score_jitter(jitter_seed)
+        calculated_score = min(98, max(5, int(total_score)))
+    else:
+        calculated_score = 42 
+        result["summary"] = "AI response for scoring was malformed. This is a fallback score. " + result.get("summary", "")
+
+    result["match_score"] = calculated_score
+    return result
+
+def _build_analysis_fragment_prompt(resume_text, jd_text, partial_result, missing):
+    generation_config = {
+      "temperature": 0.2,
+      "response_mime_type": "application/json",
+    }
+    full_prompt = (
+        "You are an expert ATS analyzer. An analysis of the resume below against the job description came back incomplete. "
+        "Provide ONLY the missing fields, consistent with the partial analysis. "
+        "Your entire output MUST be a single, valid JSON object with exactly this structure:\n"
+        f"{prompt_compaction.dump_json(ANALYSIS_SCHEMA.skeleton(missing))}\n\n"
+        f"--- JOB DESCRIPTION ---\n{prompt_compaction.normalize_text(jd_text)}\n\n"
+        f"--- RESUME TEXT ---\n{prompt_compaction.normalize_text(resume_text)}\n\n"
+        f"--- PARTIAL ANALYSIS ---\n{prompt_compaction.dump_json(partial_result)}"
+    )
+    return full_prompt, generation_config
+
+def _complete_analysis(repaired, resume_text, jd_text, jitter_seed):
+    """Coerces a repaired analysis to ANALYSIS_SCHEMA, requests any fields still missing, and scores it."""
+    result, missing = ANALYSIS_SCHEMA.validate(repaired.value)
+    if missing and MAX_FRAGMENT_REQUESTS > 0:
+        print(f"Analysis is missing {', '.join(missing)}; requesting just those fields.")
+        fragment = _request_fragment("analyze", *_build_analysis_fragment_prompt(resume_text, jd_text, result, missing))
+        if fragment:
+            result, still_missing = ANALYSIS_SCHEMA.validate(json_repair.merge(result, fragment))
+            if len(still_missing) < len(missing):
+                json_repair.repair_stats.record("fragments_filled")
+    return _score_analysis(result, jitter_seed)
+
+def _local_analysis(resume_text, jd_text):
+    """The fast_score analysis, flagged as degraded, used while Gemini's circuit is open; or None."""
+    if not LOCAL_FALLBACK:
+        return None
+    print("Gemini circuit is open; answering with the local fast score.")
+    return dict(fast_score.fast_score(resume_text, jd_text), degraded=True)
+
+def _analyze_resume_uncached(resume_text, jd_text, initial_analysis, jitter_seed):
+    mode = "reanalyze" if initial_analysis else "analyze"
+    full_prompt, generation_config = _prepare_prompt(mode, _build_analysis_prompt, resume_text, jd_text, initial_analysis)
 
     try:
-        response = model.generate_content(full_prompt, generation_config=generation_config)
+        response = _routed_generate(mode, full_prompt, generation_config)
         
         # Accessing response content is different in Gemini
         if not response.parts:
             return {"error": "Request failed or was filtered by the AI."}
         
-        result = json.loads(response.text)
-        
-        breakdown = result.get("scoring_breakdown", {})
-        weights = {
-            "key_skills": 0.40, "experience_level": 0.30,
-            "project_and_impact": 0.20, "education_and_certs": 0.10
-        }
-        
-        total_score = 0
-        if all(k in breakdown and isinstance(breakdown[k], dict) and "score" in breakdown[k] for k in weights.keys()):
-            for category, weight in weights.items():
-                score_str = str(breakdown[category].get("score", "0")).strip('%')
-                score = int(score_str) if score_str.isdigit() else 0
-                total_score += score * weight
-            
-            total_score += random.randint(-2, 2)
-            calculated_score = min(98, max(5, int(total_score)))
+        return _complete_analysis(json_repair.repair(response.text), resume_text, jd_text, jitter_seed)
+
+    except resilience.CircuitOpenError:
+        if initial_analysis is None:
+            fallback = _local_analysis(resume_text, jd_text)
+            if fallback:
+                return fallback
+        return {"error": UNAVAILABLE_ERROR}
+    except JSONDecodeError:
+        return {"error": "The AI returned a response in an invalid format. Please try again."}
+    except TimeoutError:
+        return {"error": "The AI took too long to respond. Please try again."}
+    except Exception as e:
+        print(f"An unexpected server-side AI error occurred in analyze_resume_with_ai: {type(e).__name__} - {e}")
+        return {"error": f"An unexpected server-side AI error occurred. Please check the server logs."}
+
+
+# --- Incremental Re-Analysis ---
+# After a rewrite only some sections change. Re-scoring sends just those sections plus a
+# compact digest of the first analysis, and carries the other category scores forward.
+INCREMENTAL_REANALYSIS = os.environ.get("INCREMENTAL_REANALYSIS", "1") != "0"
+SECTION_UNCHANGED_RATIO = 0.97
+
+# Which scoring categories a change to each kind of section can move
+SECTION_CATEGORIES = {
+    "summary": ("key_skills", "experience_level"),
+    "skills": ("key_skills",),
+    "experience": ("key_skills", "experience_level", "project_and_impact"),
+    "projects": ("key_skills", "project_and_impact"),
+    "education": ("education_and_certs",),
+    "certifications": ("education_and_certs", "key_skills"),
+}
+def _split_text_sections(resume_text):
+    """Splits plain resume text on headings like 'EXPERIENCE' into {kind: text}; the header block is dropped."""
+    sections, kind = {}, None
+    for line in str(resume_text or "").splitlines():
+        heading_kind = resume_parser.heading_kind(line)
+        if heading_kind:
+            kind = heading_kind
+            sections.setdefault(kind, [])
+        elif kind:
+            sections[kind].append(line)
+    return {kind: "\n".join(lines) for kind, lines in sections.items()}
+
+def _unlabelled(text):
+    return "\n".join(resume_parser._strip_labels(line.strip()) for line in text.splitlines())
+
+def _section_unchanged(old_text, new_text):
+    """
+    True if a section only changed in formatting, wording order or minor trims. A section
+    that introduces any new word counts as changed, since added keywords move scores.
+    The "Project:" style labels convert_resume_json_to_text adds are not resume words.
+    """
+    old_words = re.findall(r"\w+", _unlabelled(old_text).lower())
+    new_words = re.findall(r"\w+", _unlabelled(new_text).lower())
+    if set(new_words) - set(old_words):
+        return False
+    if not old_words and not new_words:
+        return True
+    return difflib.SequenceMatcher(None, old_words, new_words, autojunk=False).ratio() >= SECTION_UNCHANGED_RATIO
+
+@profiling.traced()
+def diff_resume_sections(original_resume_text, new_resume_json):
+    """
+    Compares each section of the generated resume with the same kind of section in the
+    original text. Returns (changed, unchanged): lists of (title, kind, text), where kind
+    is None for sections that could not be classified.
+    """
+    original_sections = _split_text_sections(original_resume_text)
+    new_sections = {}
+    for section in new_resume_json.get("sections", []) if isinstance(new_resume_json, dict) else []:
+        title = section.get("title", "")
+        text = convert_resume_json_to_text({"sections": [section]}).strip()
+        new_sections.setdefault((resume_parser.section_kind(title), title), []).append(text)
+
+    changed, unchanged = [], []
+    for (kind, title), texts in new_sections.items():
+        text = "\n".join(texts)
+        body = text.split("\n", 1)[1] if "\n" in text else ""  # Drop the heading line itself
+        if kind and kind in original_sections and _section_unchanged(original_sections[kind], body):
+            unchanged.append((title, kind, text))
         else:
-            calculated_score = 42 
-            result["summary"] = "AI response for scoring was malformed. This is a fallback score. " + result.get("summary", "")
+            changed.append((title, kind, text))
+    return changed, unchanged
 
-        result["match_score"] = calculated_score
-        
+def _analysis_digest(initial_analysis):
+    """The parts of the first analysis the re-analysis needs, as compact JSON."""
+    breakdown = initial_analysis.get("scoring_breakdown", {})
+    return json.dumps({
+        "previous_scores": {category: breakdown[category].get("score") for category in SCORING_WEIGHTS},
+        "missing_keywords": initial_analysis.get("missing_keywords", []),
+        "suggested_changes": initial_analysis.get("suggested_changes", []),
+    }, separators=(",", ":"))
+
+@profiling.traced()
+def reanalyze_resume_incremental(original_resume_text, new_resume_json, jd_text, initial_analysis):
+    """
+    Re-scores a rewritten resume by sending only the sections that changed. Categories no
+    changed section can affect keep their first-analysis score and justification.
+    Falls back to a full re-analysis when the first analysis has no usable breakdown or
+    the sections cannot be matched up.
+    """
+    if not model:
+        return {"error": "AI client not initialized. Check server logs for API Key issues."}
+    new_resume_text = convert_resume_json_to_text(new_resume_json)
+    if not INCREMENTAL_REANALYSIS or not _has_valid_breakdown(initial_analysis):
+        return analyze_resume_with_ai(new_resume_text, jd_text, initial_analysis=initial_analysis)
+
+    changed, unchanged = diff_resume_sections(original_resume_text, new_resume_json)
+    if not unchanged:
+        # Nothing to carry forward, so the full prompt costs the same and scores better
+        return analyze_resume_with_ai(new_resume_text, jd_text, initial_analysis=initial_analysis)
+
+    rescore = set()
+    for _, kind, _ in changed:
+        rescore.update(SECTION_CATEGORIES.get(kind, SCORING_WEIGHTS))
+    rescore = [category for category in SCORING_WEIGHTS if category in rescore]
+    report = {
+        "mode": "incremental",
+        "changed_sections": [title for title, _, _ in changed],
+        "unchanged_sections": [title for title, _, _ in unchanged],
+        "rescored_categories": rescore,
+    }
+
+    if not rescore:
+        result = copy.deepcopy(initial_analysis)
+        result["reanalysis"] = report
         return result
 
+    changed_text = "\n\n".join(text for _, _, text in changed)
+    digest = _analysis_digest(initial_analysis)
+    key_parts = [result_cache.normalize_text(changed_text), result_cache.normalize_text(jd_text), digest, rescore]
+    result = _cached_ai_call("reanalyze_incremental", key_parts, lambda cache_key: _reanalyze_incremental_uncached(
+        changed_text, report["unchanged_sections"], jd_text, digest, rescore, initial_analysis, cache_key),
+        is_cacheable=_is_cacheable_analysis)
+    if "error" not in result:
+        result["reanalysis"] = report
+    return result
+
+def _build_incremental_prompt(changed_text, unchanged_titles, jd_text, digest, rescore, compact=True):
+    generation_config = {
+      "temperature": 0.2,
+      "response_mime_type": "application/json",
+    }
+    if compact:
+        changed_text = prompt_compaction.normalize_text(changed_text)
+        jd_text = prompt_compaction.normalize_text(jd_text)
+    breakdown_format = ",\n".join(
+        f'        "{category}": {{ "score": "[Integer 0-100]", "justification": "[Justify score based on improvement]" }}'
+        for category in rescore)
+    full_prompt = (
+        "You are an expert ATS Re-Analyzer. A resume was rewritten to address an earlier analysis. "
+        "Only the sections that changed are shown below; the other sections are identical to the version that earned the previous scores. "
+        "Score the listed categories for the WHOLE updated resume, recognizing keywords and suggestions that were successfully integrated. "
+        "Your entire output MUST be a single, valid JSON object.\n\n"
+        f"--- JOB DESCRIPTION ---\n{jd_text}\n\n"
+        f"--- PREVIOUS ANALYSIS (compact) ---\n{digest}\n\n"
+        f"--- UNCHANGED SECTIONS ---\n{', '.join(unchanged_titles)}\n\n"
+        f"--- CHANGED SECTIONS ---\n{changed_text}\n\n"
+        "--- RE-ANALYSIS REQUIREMENTS ---\n"
+        "Generate a JSON object with this exact structure:\n"
+        "{\n"
+        '    "summary": "[2-3 sentences explaining how the resume has improved and any remaining gaps]",\n'
+        '    "strengths": ["List the strongest matching skills/experiences in the updated resume"],\n'
+        '    "missing_keywords": ["List any CRITICAL keywords that are still missing, if any"],\n'
+        '    "suggested_changes": ["Provide 1-2 final polish suggestions if needed, otherwise an empty list"],\n'
+        '    "scoring_breakdown": {\n' + breakdown_format + "\n    }\n}"
+    )
+    if compact:
+        full_prompt = prompt_compaction.squeeze_prompt(full_prompt)
+    return full_prompt, generation_config
+
+def _reanalyze_incremental_uncached(changed_text, unchanged_titles, jd_text, digest, rescore, initial_analysis, jitter_seed):
+    full_prompt, generation_config = _prepare_prompt(
+        "reanalyze_incremental", _build_incremental_prompt, changed_text, unchanged_titles, jd_text, digest, rescore)
+
+    try:
+        response = _routed_generate("reanalyze_incremental", full_prompt, generation_config)
+        if not response.parts:
+            return {"error": "Request failed or was filtered by the AI."}
+        # Categories the AI leaves out are carried forward below, so none are requested again
+        result, _ = ANALYSIS_SCHEMA.validate(json_repair.repair(response.text).value)
+    except resilience.CircuitOpenError:
+        return {"error": UNAVAILABLE_ERROR}
     except JSONDecodeError:
         return {"error": "The AI returned a response in an invalid format. Please try again."}
+    except TimeoutError:
+        return {"error": "The AI took too long to respond. Please try again."}
     except Exception as e:
-        print(f"An unexpected server-side AI error occurred in analyze_resume_with_ai: {type(e).__name__} - {e}")
+        print(f"An unexpected server-side AI error occurred in reanalyze_resume_incremental: {type(e).__name__} - {e}")
         return {"error": f"An unexpected server-side AI error occurred. Please check the server logs."}
 
+    # Carry forward every category that was not re-scored (or that the AI left out)
+    new_breakdown = result.get("scoring_breakdown") if isinstance(result.get("scoring_breakdown"), dict) else {}
+    merged = {}
+    for category in SCORING_WEIGHTS:
+        entry = new_breakdown.get(category) if category in rescore else None
+        merged[category] = entry if isinstance(entry, dict) and "score" in entry else copy.deepcopy(initial_analysis["scoring_breakdown"][category])
+    result["scoring_breakdown"] = merged
+    return _score_analysis(result, jitter_seed)
+
+
+# --- Local Reformatting ---
+# A reformat only restructures the resume, so resume_parser builds it without Gemini when
+# it is confident in the result. LOCAL_REFORMAT=0 sends every reformat to the AI.
+LOCAL_REFORMAT = os.environ.get("LOCAL_REFORMAT", "1") != "0"
+
+def _local_reformat(original_resume_text, candidate_name, layout):
+    """The reformat_only result parsed locally, or None when the AI should do it."""
+    if LOCAL_FALLBACK and gemini.circuit_open():
+        # Gemini is down: any local parse beats an error, so the confidence bar is dropped
+        resume_json = resume_parser.reformat(original_resume_text, candidate_name, layout, min_confidence=0.0)
+        return {"new_resume_json": resume_json, "degraded": True} if resume_json else None
+    if not LOCAL_REFORMAT:
+        return None
+    resume_json = resume_parser.reformat(original_resume_text, candidate_name, layout)
+    return {"new_resume_json": resume_json} if resume_json else None
 
-def generate_new_resume_text_with_ai(original_resume_text, jd_text, suggested_changes, reformat_only=False, candidate_name="", job_title_only=""):
+@profiling.traced()
+def generate_new_resume_text_with_ai(original_resume_text, jd_text, suggested_changes, reformat_only=False, candidate_name="", job_title_only="", layout=None):
+    """layout is ingestion's styling hints for the uploaded resume; it helps the local reformat."""
+    if reformat_only:
+        local_result = _local_reformat(original_resume_text, candidate_name, layout)
+        if local_result:
+            return local_result
     if not model:
         return {"error": "AI client not initialized. Check server logs for API Key issues."}
     if not candidate_name:
         return {"error": "Candidate name was not provided to the generation function."}
 
+    mode, key_parts = _generation_cache_args(original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only)
+    return _cached_ai_call(mode, key_parts, lambda cache_key: _generate_new_resume_uncached(
+        original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only))
+
+def _generation_cache_args(original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only):
+    if reformat_only:
+        return "reformat", [result_cache.normalize_text(original_resume_text), candidate_name]
+    if job_title_only:
+        return "job_title", [result_cache.normalize_text(original_resume_text), candidate_name, result_cache.normalize_text(job_title_only)]
+    return "rewrite", [result_cache.normalize_text(original_resume_text), candidate_name, result_cache.normalize_text(jd_text), suggested_changes]
+
+def _build_generation_prompt(original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only, compact=True):
     generation_config = {
       "temperature": 0.3,
       "response_mime_type": "application/json",
     }
+    if compact:
+        original_resume_text = prompt_compaction.normalize_text(original_resume_text)
+        jd_text = prompt_compaction.normalize_text(jd_text)
 
     json_structure_prompt = f"""
 --- OUTPUT FORMAT (NON-NEGOTIABLE) ---
@@ -261,27 +775,162 @@ You must use one of the following formats for each object inside the "sections"
         --- ORIGINAL RESUME ---
         {original_resume_text}
         --- AI ANALYSIS & SUGGESTIONS ---
-        {json.dumps(suggested_changes, indent=2)}
+        {prompt_compaction.dump_json(suggested_changes, compact)}
         {json_structure_prompt}
         Now, generate the complete, rewritten resume as a single JSON object.
         """
     
     full_prompt = f"{system_prompt}\n\n{user_prompt}"
+    if compact:
+        full_prompt = prompt_compaction.squeeze_prompt(full_prompt)
+    return full_prompt, generation_config
+
+def _complete_resume(repaired, full_prompt, generation_config, candidate_name, mode):
+    """
+    Coerces a repaired resume to RESUME_SCHEMA. If the response was cut off, the last
+    (possibly partial) section is dropped and only the remaining sections are requested.
+    """
+    resume_json, missing = RESUME_SCHEMA.validate(repaired.value)
+    resume_json["candidate_name"] = resume_json["candidate_name"] or candidate_name
+    if ("truncated" in repaired.repairs or "sections" in missing) and MAX_FRAGMENT_REQUESTS > 0:
+        complete = resume_json.get("sections", [])[:-1] if "truncated" in repaired.repairs else []
+        titles = [section["title"] for section in complete]
+        print(f"Generated resume was cut off after {len(titles)} complete section(s); requesting the rest.")
+        fragment = _request_fragment(
+            mode,
+            f"{full_prompt}\n\n--- CONTINUATION ---\n"
+            f"Your previous answer was cut off. It already contains these sections: {json.dumps(titles)}. "
+            'Output ONLY a JSON object {"sections": [...]} holding the sections that follow them, in the same section formats.',
+            generation_config)
+        sections, _ = RESUME_SCHEMA.validate({"sections": (fragment or {}).get("sections")})
+        if sections.get("sections"):
+            resume_json["sections"] = complete + sections["sections"]
+            json_repair.repair_stats.record("fragments_filled")
+    resume_json.setdefault("sections", [])
+    return {"new_resume_json": resume_json}
+
+def _generate_new_resume_uncached(original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only):
+    mode, _ = _generation_cache_args(original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only)
+    full_prompt, generation_config = _prepare_prompt(
+        mode, _build_generation_prompt, original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only)
 
     try:
-        response = model.generate_content(full_prompt, generation_config=generation_config)
+        response = _routed_generate(mode, full_prompt, generation_config)
         
         if not response.parts:
             return {"error": "Rewrite failed or was filtered by the AI."}
         
-        result_json = json.loads(response.text)
-        return {"new_resume_json": result_json}
+        return _complete_resume(json_repair.repair(response.text), full_prompt, generation_config, candidate_name, mode)
     
+    except resilience.CircuitOpenError:
+        return {"error": UNAVAILABLE_ERROR}
     except JSONDecodeError as e:
         return {"error": "The AI returned a response in an invalid JSON format."}
+    except TimeoutError:
+        return {"error": "The AI took too long to respond. Please try again."}
     except Exception as e:
         return {"error": f"An unexpected server-side AI error occurred: {e}"}
 
+# --- Streaming Variants (Server-Sent Events) ---
+# These yield (event, data) tuples as soon as each piece of the JSON response is complete,
+# so the browser can render the summary, strengths and sections before Gemini finishes.
+
+@profiling.traced()
+def stream_analysis_with_ai(resume_text, jd_text):
+    """
+    Streaming variant of analyze_resume_with_ai. Yields ("field", {"name", "value"})
+    for each top-level field, then ("complete", analysis) or ("error", {"error": ...}).
+    """
+    if not model:
+        yield "error", {"error": "AI client not initialized. Check server logs for API Key issues."}
+        return
+    mode, key_parts = _analysis_cache_args(resume_text, jd_text, None)
+    full_prompt, generation_config = _prepare_prompt(mode, _build_analysis_prompt, resume_text, jd_text, None)
+    yield from _stream_ai_call(mode, key_parts, full_prompt, generation_config,
+                               finalize=lambda repaired, cache_key: _complete_analysis(repaired, resume_text, jd_text, cache_key),
+                               is_cacheable=_is_cacheable_analysis,
+                               fallback=lambda: _local_analysis(resume_text, jd_text))
+
+@profiling.traced()
+def stream_new_resume_with_ai(original_resume_text, jd_text, suggested_changes, reformat_only=False, candidate_name="", job_title_only="", layout=None):
+    """
+    Streaming variant of generate_new_resume_text_with_ai. Yields ("field", ...) for the
+    header fields, ("section", {"index", "section"}) per resume section, then
+    ("complete", {"new_resume_json": ...}) or ("error", {"error": ...}).
+    """
+    if reformat_only:
+        local_result = _local_reformat(original_resume_text, candidate_name, layout)
+        if local_result:
+            yield from _replay_events(local_result["new_resume_json"], "sections")
+            yield "complete", local_result
+            return
+    if not model:
+        yield "error", {"error": "AI client not initialized. Check server logs for API Key issues."}
+        return
+    if not candidate_name:
+        yield "error", {"error": "Candidate name was not provided to the generation function."}
+        return
+    args = (original_resume_text, jd_text, suggested_changes, reformat_only, candidate_name, job_title_only)
+    mode, key_parts = _generation_cache_args(*args)
+    full_prompt, generation_config = _prepare_prompt(mode, _build_generation_prompt, *args)
+    yield from _stream_ai_call(mode, key_parts, full_prompt, generation_config,
+                               finalize=lambda repaired, cache_key: _complete_resume(repaired, full_prompt, generation_config, candidate_name, mode),
+                               item_key="sections")
+
+def _stream_ai_call(mode, key_parts, full_prompt, generation_config, finalize, item_key=None, is_cacheable=lambda result: "error" not in result, fallback=None):
+    cache_key = result_cache.make_key(mode, PROMPT_VERSION, router.preferred(mode), *key_parts)
+    cached = ai_cache.get(cache_key)
+    if cached is not None:
+        yield from _replay_events(cached.get("new_resume_json", cached), item_key)
+        yield "complete", cached
+        return
+
+    start = time.perf_counter()
+    _rerouted.set(False)
+    parser = stream_json.IncrementalJSONParser(item_keys=[item_key] if item_key else [])
+    try:
+        for chunk in _routed_stream(mode, full_prompt, generation_config):
+            if not chunk.parts:
+                continue
+            for event in parser.feed(chunk.text):
+                if event[0] == "item":
+                    yield "section", {"index": event[2], "section": event[3]}
+                else:
+                    yield "field", {"name": event[1], "value": event[2]}
+        result = finalize(json_repair.repair(parser.buffer), cache_key)
+    except resilience.CircuitOpenError:
+        result = fallback() if fallback else None
+        if not result:
+            yield "error", {"error": UNAVAILABLE_ERROR}
+            return
+        yield from _replay_events(result, item_key)
+        yield "complete", result
+        return
+    except JSONDecodeError:
+        yield "error", {"error": "The AI returned a response in an invalid format. Please try again."}
+        return
+    except TimeoutError:
+        yield "error", {"error": "The AI took too long to respond. Please try again."}
+        return
+    except Exception as e:
+        print(f"An unexpected server-side AI error occurred while streaming {mode}: {type(e).__name__} - {e}")
+        yield "error", {"error": "An unexpected server-side AI error occurred. Please check the server logs."}
+        return
+
+    if is_cacheable(result) and not _rerouted.get():
+        ai_cache.set(cache_key, result, cost_seconds=time.perf_counter() - start)
+    yield "complete", result
+
+def _replay_events(result_json, item_key):
+    """Emits a cached result as the same field/section events a live stream would produce."""
+    for name, value in result_json.items():
+        if name == item_key and isinstance(value, list):
+            for index, item in enumerate(value):
+                yield "section", {"index": index, "section": item}
+        else:
+            yield "field", {"name": name, "value": value}
+
+@metrics.timed("resume_to_text")
 def convert_resume_json_to_text(resume_json):
     if not isinstance(resume_json, dict): return ""
     parts = []
@@ -328,19 +977,7 @@ LINE_HEIGHT = 15.5
 BODY_FONTSIZE = 11
 
 def _get_wrapped_text_height(text, width, fontname=FONT_NAME_REGULAR, fontsize=BODY_FONTSIZE, line_height=LINE_HEIGHT):
-    lines = 0
-    words = str(text).split()
-    if not words: return line_height
-    current_line = ""
-    for word in words:
-        test_line = f"{current_line} {word}".strip()
-        if fitz.get_text_length(test_line, fontname=fontname, fontsize=fontsize) < width:
-            current_line = test_line
-        else:
-            lines += 1
-            current_line = word
-    lines += 1
-    return lines * line_height
+    return text_layout.wrapped_height(text, width, fontname, fontsize, line_height)
 
 def _render_text_with_wrapping(page, y, text, width, x_offset=0, bullet=False, fontname=FONT_NAME_REGULAR, fontsize=BODY_FONTSIZE, color=COLOR_SECONDARY):
     x_pos = LEFT_MARGIN + x_offset
@@ -349,31 +986,36 @@ def _render_text_with_wrapping(page, y, text, width, x_offset=0, bullet=False, f
     if bullet:
         page.insert_text(fitz.Point(LEFT_MARGIN, y), "•", fontname=FONT_NAME_BOLD, fontsize=fontsize+2, color=COLOR_PRIMARY)
     
-    words = str(text).strip().split()
-    if not words: return y + LINE_HEIGHT
-
-    current_line = ""
-    for word in words:
-        test_line = f"{current_line} {word}".strip()
-        if fitz.get_text_length(test_line, fontname=fontname, fontsize=fontsize) < text_width:
-            current_line = test_line
-        else:
-            page.insert_text(fitz.Point(x_pos, y), current_line, fontname=fontname, fontsize=fontsize, color=color)
-            y += LINE_HEIGHT
-            current_line = word
-    page.insert_text(fitz.Point(x_pos, y), current_line, fontname=fontname, fontsize=fontsize, color=color)
-    return y + LINE_HEIGHT
+    # Shares the memoized layout with _get_wrapped_text_height, so text measured for
+    # page-break decisions is not wrapped a second time here.
+    lines = text_layout.wrap_lines(str(text).strip(), text_width, fontname, fontsize)
+    if not lines: return y + LINE_HEIGHT
+
+    for line in lines:
+        page.insert_text(fitz.Point(x_pos, y), line, fontname=fontname, fontsize=fontsize, color=color)
+        y += LINE_HEIGHT
+    return y
+
+def _insert_logo(page, logo, xref=0):
+    """
+    Draws the company logo in the page header and returns its image xref.
+    Pass the xref back in for later pages so the image is embedded in the PDF only once.
+    """
+    if not logo: return 0
+    rect = fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10)
+    if xref:
+        page.insert_image(rect, xref=xref)
+        return xref
+    return page.insert_image(rect, stream=logo.image_bytes)
 
+@profiling.traced()
 def create_pdf_with_logo(resume_data, company):
-    logo_paths = { "beround": "static/logos/beround.jpg", "climber": "static/logos/climber.jpg", "rennova": "static/logos/rennova.jpg" }
-    logo_path = logo_paths.get(company)
-    if company in logo_paths and (not logo_path or not os.path.exists(logo_path)):
-        raise FileNotFoundError(f"Logo for {company} not found at {logo_path}")
+    logo = assets.get_logo(company)
     doc = fitz.open()
     page = doc.new_page(width=595, height=842)
     y = TOP_MARGIN
     page_num = 1
-    if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+    logo_xref = _insert_logo(page, logo)
     candidate_name = resume_data.get("candidate_name", "Candidate Name")
     designation_line = resume_data.get("designation_line", "Professional")
     contact_info = resume_data.get("contact_info", {})
@@ -400,7 +1042,7 @@ def create_pdf_with_logo(resume_data, company):
             page = doc.new_page(width=595, height=842)
             y = TOP_MARGIN
             page_num += 1
-            if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+            logo_xref = _insert_logo(page, logo, logo_xref)
         
         y += LINE_HEIGHT * 1.8
         page.insert_text(fitz.Point(LEFT_MARGIN, y), section_title.upper(), fontname=FONT_NAME_BOLD, fontsize=14, color=COLOR_PRIMARY)
@@ -429,7 +1071,7 @@ def create_pdf_with_logo(resume_data, company):
                 if y + table_height > page.rect.height - BOTTOM_MARGIN:
                     page.insert_text(fitz.Point((page.rect.width - 10)/2, page.rect.height - BOTTOM_MARGIN/2), f"{page_num}", fontname=FONT_NAME_REGULAR, fontsize=9, color=COLOR_SECONDARY)
                     page = doc.new_page(width=595, height=842); y = TOP_MARGIN; page_num += 1
-                    if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+                    logo_xref = _insert_logo(page, logo, logo_xref)
                 table_start_y = y
                 for i, (label, data) in enumerate(rows_data):
                     row_h = row_heights[i]
@@ -455,7 +1097,7 @@ def create_pdf_with_logo(resume_data, company):
                 if y + est_height > page.rect.height - BOTTOM_MARGIN:
                      page.insert_text(fitz.Point((page.rect.width - 10)/2, page.rect.height - BOTTOM_MARGIN/2), f"{page_num}", fontname=FONT_NAME_REGULAR, fontsize=9, color=COLOR_SECONDARY)
                      page = doc.new_page(width=595, height=842); y = TOP_MARGIN; page_num += 1
-                     if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+                     logo_xref = _insert_logo(page, logo, logo_xref)
 
                 page.insert_text(fitz.Point(LEFT_MARGIN, y), job_title, fontname=FONT_NAME_BOLD, fontsize=BODY_FONTSIZE + 1, color=COLOR_PRIMARY)
                 y += LINE_HEIGHT
@@ -468,20 +1110,20 @@ def create_pdf_with_logo(resume_data, company):
                     if y + duty_height > page.rect.height - BOTTOM_MARGIN:
                         page.insert_text(fitz.Point((page.rect.width - 10)/2, page.rect.height - BOTTOM_MARGIN/2), f"{page_num}", fontname=FONT_NAME_REGULAR, fontsize=9, color=COLOR_SECONDARY)
                         page = doc.new_page(width=595, height=842); y = TOP_MARGIN; page_num += 1
-                        if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+                        logo_xref = _insert_logo(page, logo, logo_xref)
                     y = _render_text_with_wrapping(page, y, duty, page.rect.width - LEFT_MARGIN - RIGHT_MARGIN, x_offset=15, bullet=True)
                 y += LINE_HEIGHT
 
         else: # Generic content (string or list of strings)
             content_list = content if isinstance(content, list) else [content] if content else []
+            is_bullet = isinstance(content, list)
             for item in content_list:
-                item_height = _get_wrapped_text_height(item, page.rect.width - LEFT_MARGIN - RIGHT_MARGIN)
+                item_height = _get_wrapped_text_height(item, page.rect.width - LEFT_MARGIN - RIGHT_MARGIN - (15 if is_bullet else 0))
                 if y + item_height > page.rect.height - BOTTOM_MARGIN:
                     page.insert_text(fitz.Point((page.rect.width - 10)/2, page.rect.height - BOTTOM_MARGIN/2), f"{page_num}", fontname=FONT_NAME_REGULAR, fontsize=9, color=COLOR_SECONDARY)
                     page = doc.new_page(width=595, height=842); y = TOP_MARGIN; page_num += 1
-                    if logo_path: page.insert_image(fitz.Rect(page.rect.width - RIGHT_MARGIN - 80, TOP_MARGIN - 40, page.rect.width - RIGHT_MARGIN, TOP_MARGIN - 10), filename=logo_path)
+                    logo_xref = _insert_logo(page, logo, logo_xref)
                 
-                is_bullet = isinstance(content, list)
                 y = _render_text_with_wrapping(page, y, str(item), page.rect.width - LEFT_MARGIN - RIGHT_MARGIN, x_offset=15 if is_bullet else 0, bullet=is_bullet)
 
     page.insert_text(fitz.Point((page.rect.width - 10)/2, page.rect.height - BOTTOM_MARGIN/2), f"{page_num}", fontname=FONT_NAME_REGULAR, fontsize=9, color=COLOR_SECONDARY)
@@ -491,10 +1133,8 @@ def create_pdf_with_logo(resume_data, company):
     pdf_buffer.seek(0)
     return pdf_buffer
 
-def create_docx(resume_data, company):
-    """
-    Generates a professional-looking DOCX resume from structured JSON data.
-    """
+def _build_docx_base(company):
+    """Builds an empty document with the margins, styles and header logo shared by every resume for a company."""
     doc = Document()
 
     # Document-Wide Setup
@@ -516,6 +1156,47 @@ def create_docx(resume_data, company):
     list_bullet_format.space_before = Pt(0)
     list_bullet_format.line_spacing = 1.05
 
+    # Logo in Header
+    logo = assets.LOGOS.get(company)
+    if logo:
+        header = doc.sections[0].header
+        htable = header.add_table(rows=1, cols=1, width=Inches(6.5))
+        htable.alignment = WD_TABLE_ALIGNMENT.RIGHT
+        htab_cell = htable.cell(0, 0)
+        htab_cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        run = htab_cell.paragraphs[0].add_run()
+        run.add_picture(io.BytesIO(logo.image_bytes), height=Inches(0.5))
+    return doc
+
+@functools.lru_cache(maxsize=None)
+def _docx_base_template(template_key):
+    """The serialized base document for a company, built once per process."""
+    buffer = io.BytesIO()
+    _build_docx_base(template_key).save(buffer)
+    return buffer.getvalue()
+
+@functools.lru_cache(maxsize=None)
+def _docx_base_prototype(template_key):
+    return Document(io.BytesIO(_docx_base_template(template_key)))
+
+def _clone_docx_base(company):
+    """
+    Returns a fresh copy of the company's base document. Deep-copying the parsed
+    prototype is cheaper than re-reading the serialized template or rebuilding it.
+    """
+    # Companies without a logo all share the plain template, which keeps the cache bounded
+    template_key = company if assets.LOGOS.get(company) else "nologo"
+    return copy.deepcopy(_docx_base_prototype(template_key))
+
+@profiling.traced()
+def create_docx(resume_data, company):
+    """
+    Generates a professional-looking DOCX resume from structured JSON data.
+    """
+    return _render_docx(_clone_docx_base(company), resume_data)
+
+def _render_docx(doc, resume_data):
+    """Fills a base document (see _build_docx_base) with the resume content and serializes it."""
     # Define Colors and Helper Functions
     TITLE_BLUE = RGBColor(47, 84, 150)
     SUBTLE_GRAY = RGBColor(89, 89, 89)
@@ -534,18 +1215,6 @@ def create_docx(resume_data, company):
         pBdr.set(qn('w:bottom'), 'w:single w:sz="6" w:space="1" w:color="2F5496"')
         pPr.append(pBdr)
 
-    # Logo in Header
-    logo_paths = { "beround": "static/logos/beround.jpg", "climber": "static/logos/climber.jpg", "rennova": "static/logos/rennova.jpg" }
-    logo_path = logo_paths.get(company)
-    if logo_path and os.path.exists(logo_path):
-        header = doc.sections[0].header
-        htable = header.add_table(rows=1, cols=1, width=Inches(6.5))
-        htable.alignment = WD_TABLE_ALIGNMENT.RIGHT
-        htab_cell = htable.cell(0, 0)
-        htab_cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        run = htab_cell.paragraphs[0].add_run()
-        run.add_picture(logo_path, height=Inches(0.5))
-
     # Main Header (Name, Title, Contact)
     header_table = doc.add_table(rows=1, cols=2)
     header_table.columns[0].width = Inches(4.75)
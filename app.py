@@ -1,20 +1,134 @@
 # app.py
 
-from flask import Flask, render_template, request, jsonify, session, send_file, redirect, url_for
-from flask_session import Session
+from flask import Flask, render_template, request, jsonify, session, send_file, redirect, url_for, Response, stream_with_context, g
 import analyzer_logic
+import batch_analyzer
+import fast_score
+import render_service
+import session_store
+import speculative
+import job_queue
+import prompt_compaction
+import ingestion
+import resume_parser
+import json_repair
+import metrics
+import profiling
+import fake_gemini
 import os
+import time
 import io
 import random
 import json
+import threading
 
 app = Flask(__name__)
 
 # --- Server-Side Session Configuration ---
+# Sessions live in SQLite; the cookie only carries the session id, and large values
+# (resume text, JD, analysis) are stored once as compressed, shared blobs.
 app.config['SECRET_KEY'] = os.urandom(24) 
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SESSION_PERMANENT'] = False
-Session(app)
+# Whole-request cap (several files for /batch/analyze); single uploads are capped in _validate_upload
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('MAX_REQUEST_MB', 100)) * 1024 * 1024)
+FORM_FIELDS_ALLOWANCE_BYTES = 1024 * 1024  # Room for the JD and other form fields next to the file
+app.session_interface = session_store.SQLiteSessionInterface(session_store.SQLiteSessionStore(
+    os.environ.get('SESSION_DB_PATH', os.path.join('.cache', 'sessions.sqlite3')),
+    ttl_seconds=int(os.environ.get('SESSION_TTL_SECONDS', 24 * 3600)),
+    max_bytes=int(float(os.environ.get('SESSION_STORE_MAX_MB', 200)) * 1024 * 1024),
+    gc_interval=int(os.environ.get('SESSION_GC_INTERVAL_SECONDS', 300)),
+))
+
+
+# --- Job Queue ---
+# /analyze and /generate can hand their AI work to the queue's worker threads (see
+# _wants_async), so a slow Gemini call no longer holds a web worker.
+JOB_LONG_POLL_MAX_SECONDS = float(os.environ.get('JOB_LONG_POLL_MAX_SECONDS', 25))
+JOB_EVENTS_REFRESH_SECONDS = 1.0  # How often /jobs/<id>/events re-reads a queued job's position
+SSE_KEEPALIVE_SECONDS = 15  # Comment frames on an idle stream, so proxies do not close it
+job_queue.queue.register('analyze', lambda payload: _run_analysis(payload))
+job_queue.queue.register('generate', lambda payload: _run_generation(payload))
+
+# --- Streaming Admission ---
+# The UI streams /analyze and /generate over SSE (see /analyze/stream), which holds a web
+# worker for the whole AI call. Once MAX_AI_STREAMS are open, further streams are queued
+# as jobs instead, and the client follows them at /jobs/<id>/events. 0 disables the limit.
+MAX_AI_STREAMS = int(os.environ.get('MAX_AI_STREAMS', 8))
+_streams_lock = threading.Lock()
+_stream_stats = {'open': 0, 'streamed': 0, 'queued_when_busy': 0}
+
+def _admit_stream():
+    """Takes one of the MAX_AI_STREAMS slots for an AI stream; False when they are all in use."""
+    with _streams_lock:
+        if MAX_AI_STREAMS and _stream_stats['open'] >= MAX_AI_STREAMS:
+            _stream_stats['queued_when_busy'] += 1
+            return False
+        _stream_stats['open'] += 1
+        _stream_stats['streamed'] += 1
+        return True
+
+def _release_stream():
+    with _streams_lock:
+        _stream_stats['open'] -= 1
+
+def _stream_admission_stats():
+    with _streams_lock:
+        return dict(_stream_stats, max_open=MAX_AI_STREAMS)
+
+
+# --- Request Metrics ---
+# In-flight gauges, status counts and latency per endpoint for /metrics. For streamed
+# responses the latency covers the time until the response starts, not the whole stream.
+# A request counts as done once the server closes its response, i.e. after an SSE stream
+# ends (teardown runs twice for stream_with_context responses, so it is not used for that).
+@app.before_request
+def _start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    metrics.HTTP_IN_FLIGHT.inc(g.metrics_endpoint)
+
+@app.after_request
+def _record_request_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        endpoint = g.metrics_endpoint
+        metrics.HTTP_REQUESTS.inc(endpoint, request.method, response.status_code)
+        metrics.HTTP_SECONDS.observe(endpoint, value=time.perf_counter() - start)
+        response.call_on_close(lambda: metrics.HTTP_IN_FLIGHT.dec(endpoint))
+    return response
+
+@app.teardown_request
+def _finish_request_metrics(error=None):
+    if g.pop('metrics_start', None) is not None:  # after_request never ran
+        metrics.HTTP_IN_FLIGHT.dec(g.metrics_endpoint)
+
+
+# --- Request Profiling ---
+# Opt-in spans, cProfile and tracemalloc per request (see profiling): via the X-Profile
+# header when PROFILE_HEADER_ENABLED is set, PROFILE_SAMPLE_RATE, or automatically for
+# requests slower than PROFILE_SLOW_REQUEST_MS. Captures are browsed at /debug/profiles.
+PROFILE_DEBUG_ENDPOINT = os.environ.get('PROFILE_DEBUG_ENDPOINT', '0') != '0'
+
+@app.before_request
+def _start_profiling():
+    g.profile_trace = profiling.start_request(request.endpoint or 'unmatched', request.headers.get(profiling.HEADER_NAME))
+
+@app.after_request
+def _finish_profiling_on_close(response):
+    trace = g.pop('profile_trace', None)
+    if trace is not None:
+        if trace.reason != 'slow':
+            response.headers['X-Profile-Id'] = trace.id
+        # On close, so SSE routes are traced until their stream ends
+        method, path, status = request.method, request.path, response.status_code
+        response.call_on_close(lambda: profiling.finish_request(trace, method, path, status))
+    return response
+
+@app.teardown_request
+def _finish_profiling(error=None):
+    trace = g.pop('profile_trace', None)
+    if trace is not None:  # after_request never ran
+        profiling.finish_request(trace, request.method, request.path, 500)
 
 
 @app.route('/')
@@ -26,151 +140,445 @@ def index():
 @app.route('/reset')
 def reset_session():
     """Clears the session and redirects to the homepage to start fresh."""
+    speculative.rewriter.discard(session.get('speculative_rewrite'))
     session.clear()
     return redirect(url_for('index'))
 
+def _validate_upload():
+    """Returns an error response if the request has no usable resume upload, otherwise None."""
+    # Checked before request.files is touched, so an oversized body is never parsed or spooled
+    if request.content_length and request.content_length > ingestion.MAX_UPLOAD_BYTES + FORM_FIELDS_ALLOWANCE_BYTES:
+        return jsonify({'error': f'The upload is too large; the limit is {ingestion.MAX_UPLOAD_BYTES / 1024 / 1024:g} MB.'}), 413
+    if 'resume' not in request.files:
+        return jsonify({'error': 'No resume file provided.'}), 400
+
+    resume_file = request.files['resume']
+    allowed_extensions = {'.pdf', '.docx'}
+    if not any(resume_file.filename.lower().endswith(ext) for ext in allowed_extensions):
+        return jsonify({'error': 'Invalid file type. Please upload a PDF or DOCX file.'}), 400
+    return None
+
+def _speculation_requested():
+    """A speculative rewrite runs if SPECULATIVE_REWRITE=1, unless the form opts out with speculative_rewrite=0."""
+    return speculative.ENABLED and request.form.get('speculative_rewrite') != '0'
+
+def _start_speculative_rewrite(resume_text, jd_text, analysis_result, candidate_name):
+    """Starts the rewrite /generate will most likely ask for, and remembers it in the session."""
+    job_id = speculative.job_id_for(resume_text, jd_text, candidate_name)
+    speculative.rewriter.start(job_id, resume_text, jd_text, analysis_result.get('suggested_changes', []), candidate_name)
+    return job_id
+
+def _sse(event, data):
+    """Formats one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _sse_response(events):
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+def _ai_stream_response(events):
+    """SSE response for a stream admitted by _admit_stream; its slot is freed once the server closes it."""
+    response = _sse_response(events)
+    response.call_on_close(_release_stream)
+    return response
+
+def _wants_async():
+    """Clients opt into job mode with ?async=1 or a 'Prefer: respond-async' header."""
+    return request.args.get('async') == '1' or 'respond-async' in request.headers.get('Prefer', '')
+
+def _job_accepted(job_id):
+    """202 response pointing at the job's status URL and its event stream."""
+    status_url = url_for('get_job', job_id=job_id)
+    response = jsonify({'status': 'queued', 'job_id': job_id, 'status_url': status_url,
+                        'events_url': url_for('job_events', job_id=job_id)})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+def _run_analysis(payload):
+    """
+    The AI work behind /analyze for full_analysis, job_title and format_only. Runs in the
+    request or as an 'analyze' job, and returns the response body (or an 'error' dict).
+    """
+    mode = payload['mode']
+    resume_text = payload['resume_text']
+    candidate_name = payload['candidate_name']
+
+    if mode == 'full_analysis':
+        analysis_result = analyzer_logic.analyze_resume_with_ai(resume_text, payload['jd_text'])
+        if 'error' in analysis_result:
+            return analysis_result
+        analysis_result['candidate_name'] = candidate_name
+        # A degraded (local fallback) analysis means Gemini is down, so there is nothing to speculate on
+        if payload.get('speculative_rewrite') and not analysis_result.get('degraded'):
+            _start_speculative_rewrite(resume_text, payload['jd_text'], analysis_result, candidate_name)
+        return {'status': 'analysis_complete', 'data': analysis_result}
+
+    # job_title and format_only generate the resume directly
+    generation_result = analyzer_logic.generate_new_resume_text_with_ai(
+        original_resume_text=resume_text,
+        jd_text="", # Not needed for these modes
+        suggested_changes=[], # Not needed
+        reformat_only=(mode == 'format_only'),
+        candidate_name=candidate_name,
+        job_title_only=payload.get('job_title', ''), # The key parameter for job_title mode
+        layout=payload.get('resume_layout')
+    )
+    if 'error' in generation_result:
+        return generation_result
+    return {'status': 'generation_complete', 'data': generation_result}
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """
     Main endpoint that handles all initial submissions.
     It routes the request based on the user's selected mode.
+    With ?async=1 (or 'Prefer: respond-async') the AI work is queued and a job id is
+    returned at once; poll /jobs/<job_id> for the same payload this route would return.
     """
+    speculative.rewriter.discard(session.get('speculative_rewrite'))
     session.clear()
 
-    if 'resume' not in request.files:
-        return jsonify({'error': 'No resume file provided.'}), 400
+    error_response = _validate_upload()
+    if error_response:
+        return error_response
 
     resume_file = request.files['resume']
     mode = request.form.get('analysis_mode', 'full_analysis')
-    
-    allowed_extensions = {'.pdf', '.docx'}
-    if not any(resume_file.filename.lower().endswith(ext) for ext in allowed_extensions):
-        return jsonify({'error': 'Invalid file type. Please upload a PDF or DOCX file.'}), 400
 
     try:
-        resume_text = analyzer_logic.extract_text_from_file(resume_file)
-        if resume_text is None:
+        extracted = analyzer_logic.extract_resume(resume_file)
+        if extracted is None:
             return jsonify({'error': 'Could not read text from the uploaded file.'}), 500
         
-        # Extract candidate name early as it's needed in all modes
-        candidate_name = resume_text.strip().split('\n')[0].strip()
+        # The candidate name is needed in all modes; it is cached with the extracted text
+        resume_text, candidate_name = extracted.text, extracted.candidate_name
+        payload = {'mode': mode, 'resume_text': resume_text, 'candidate_name': candidate_name,
+                   'resume_layout': extracted.layout}
 
         # --- Route based on mode ---
         if mode == 'full_analysis':
             jd_text = request.form.get('job_description', '')
             if not jd_text.strip():
                 return jsonify({'error': 'Job Description is required for Full Analysis mode.'}), 400
+            payload['jd_text'] = jd_text
             
-            analysis_result = analyzer_logic.analyze_resume_with_ai(resume_text, jd_text)
-            if 'error' in analysis_result:
-                return jsonify(analysis_result), 500
-            
+            # Store necessary data in session for the 'rewrite' step. A queued analysis
+            # cannot write the session, so /generate reads it from the job's result.
+            session['original_resume_text'] = resume_text
+            session['resume_layout'] = extracted.layout
+            session['job_description'] = jd_text
+            session['candidate_name'] = candidate_name
+            if _speculation_requested():
+                payload['speculative_rewrite'] = True
+                session['speculative_rewrite'] = speculative.job_id_for(resume_text, jd_text, candidate_name)
+
+        elif mode == 'fast_score':
+            jd_text = request.form.get('job_description', '')
+            if not jd_text.strip():
+                return jsonify({'error': 'Job Description is required for Instant Score mode.'}), 400
+
+            # Local keyword/TF-IDF scoring: no Gemini call, answers in milliseconds
+            analysis_result = fast_score.fast_score(resume_text, jd_text)
             analysis_result['candidate_name'] = candidate_name
-            # Store necessary data in session for the 'rewrite' step
+            # Stored like a full analysis so the user can still ask for an AI rewrite
             session['initial_analysis'] = analysis_result
             session['original_resume_text'] = resume_text
+            session['resume_layout'] = extracted.layout
             session['job_description'] = jd_text
-            
-            # Respond with a status and the analysis data
+
             return jsonify({'status': 'analysis_complete', 'data': analysis_result})
 
         elif mode == 'job_title':
             job_title = request.form.get('job_title', '')
             if not job_title.strip():
                 return jsonify({'error': 'Job Title is required for this mode.'}), 400
-            
-            # Directly generate the resume based on the job title
-            generation_result = analyzer_logic.generate_new_resume_text_with_ai(
-                original_resume_text=resume_text,
-                jd_text="", # Not needed for this mode
-                suggested_changes=[], # Not needed
-                reformat_only=False,
-                candidate_name=candidate_name,
-                job_title_only=job_title # The key parameter for this mode
-            )
-            if 'error' in generation_result:
-                return jsonify(generation_result), 500
-            
-            # Respond with a status and the generated JSON
-            return jsonify({'status': 'generation_complete', 'data': generation_result})
-
-        elif mode == 'format_only':
-            # Directly format the resume without changes
-            generation_result = analyzer_logic.generate_new_resume_text_with_ai(
-                original_resume_text=resume_text,
-                jd_text="",
-                suggested_changes=[],
-                reformat_only=True,
-                candidate_name=candidate_name
-            )
-            if 'error' in generation_result:
-                return jsonify(generation_result), 500
-
-            # Respond with a status and the generated JSON
-            return jsonify({'status': 'generation_complete', 'data': generation_result})
-
-        else:
+            payload['job_title'] = job_title
+
+        elif mode != 'format_only':
             return jsonify({'error': 'Invalid analysis mode selected.'}), 400
 
+        if _wants_async():
+            job_id = job_queue.queue.enqueue('analyze', payload)
+            if mode == 'full_analysis':
+                session['analysis_job'] = job_id
+            return _job_accepted(job_id)
+
+        result = _run_analysis(payload)
+        if 'error' in result:
+            return jsonify(result), 500
+        if mode == 'full_analysis':
+            session['initial_analysis'] = result['data']
+        # Respond with a status and the analysis data or generated JSON
+        return jsonify(result)
+
+    except ingestion.UploadRejected as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         print(f"An unhandled error occurred in /analyze: {e}")
         return jsonify({'error': f'An internal server error occurred: {e}'}), 500
 
-@app.route('/generate', methods=['POST'])
-def generate():
+@app.errorhandler(ingestion.UploadRejected)
+def upload_rejected(e):
+    return jsonify({'error': str(e)}), 413
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': 'The request is too large.'}), 413
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
     """
-    Endpoint to generate a new resume after a full analysis.
-    It can either do a full rewrite with AI or just a reformat.
+    Streaming variant of /analyze. Responds with Server-Sent Events: 'field' and
+    'section' events as parts of the AI response complete, then a final 'complete'
+    event carrying the same payload /analyze would return, or an 'error' event.
+    While MAX_AI_STREAMS streams are open the AI work is queued instead, as with
+    /analyze?async=1, and the 202 response points at the job's events_url.
     """
+    speculative.rewriter.discard(session.get('speculative_rewrite'))
+    session.clear()
+
+    error_response = _validate_upload()
+    if error_response:
+        return error_response
+
+    mode = request.form.get('analysis_mode', 'full_analysis')
+    try:
+        extracted = analyzer_logic.extract_resume(request.files['resume'])
+    except ingestion.UploadRejected as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        print(f"An unhandled error occurred in /analyze/stream: {e}")
+        return jsonify({'error': f'An internal server error occurred: {e}'}), 500
+    if extracted is None:
+        return jsonify({'error': 'Could not read text from the uploaded file.'}), 500
+    resume_text, candidate_name = extracted.text, extracted.candidate_name
+
+    if mode == 'full_analysis':
+        jd_text = request.form.get('job_description', '')
+        if not jd_text.strip():
+            return jsonify({'error': 'Job Description is required for Full Analysis mode.'}), 400
+        # The session is saved before the body streams; the analysis is written to it once complete
+        session['original_resume_text'] = resume_text
+        session['resume_layout'] = extracted.layout
+        session['job_description'] = jd_text
+        session['candidate_name'] = candidate_name
+        speculate = _speculation_requested()
+        if speculate:
+            # The job id only depends on the inputs, so it can be stored before the analysis exists
+            session['speculative_rewrite'] = speculative.job_id_for(resume_text, jd_text, candidate_name)
+        events = analyzer_logic.stream_analysis_with_ai(resume_text, jd_text)
+        status = 'analysis_complete'
+    elif mode == 'fast_score':
+        jd_text = request.form.get('job_description', '')
+        if not jd_text.strip():
+            return jsonify({'error': 'Job Description is required for Instant Score mode.'}), 400
+        analysis_result = fast_score.fast_score(resume_text, jd_text)
+        analysis_result['candidate_name'] = candidate_name
+        session['initial_analysis'] = analysis_result
+        session['original_resume_text'] = resume_text
+        session['resume_layout'] = extracted.layout
+        session['job_description'] = jd_text
+        return _sse_response(iter([_sse('complete', {'status': 'analysis_complete', 'data': analysis_result})]))
+    elif mode in ('job_title', 'format_only'):
+        job_title = request.form.get('job_title', '')
+        if mode == 'job_title' and not job_title.strip():
+            return jsonify({'error': 'Job Title is required for this mode.'}), 400
+        events = analyzer_logic.stream_new_resume_with_ai(
+            original_resume_text=resume_text,
+            jd_text="",
+            suggested_changes=[],
+            reformat_only=(mode == 'format_only'),
+            candidate_name=candidate_name,
+            job_title_only=job_title if mode == 'job_title' else "",
+            layout=extracted.layout
+        )
+        status = 'generation_complete'
+    else:
+        return jsonify({'error': 'Invalid analysis mode selected.'}), 400
+
+    if not _admit_stream():
+        payload = {'mode': mode, 'resume_text': resume_text, 'candidate_name': candidate_name,
+                   'resume_layout': extracted.layout}
+        if mode == 'full_analysis':
+            payload.update(jd_text=jd_text, speculative_rewrite=speculate)
+        elif mode == 'job_title':
+            payload['job_title'] = job_title
+        job_id = job_queue.queue.enqueue('analyze', payload)
+        if mode == 'full_analysis':
+            session['analysis_job'] = job_id
+        return _job_accepted(job_id)
+
+    def generate_events():
+        for event, data in events:
+            if event == 'complete':
+                if status == 'analysis_complete':
+                    data['candidate_name'] = candidate_name
+                    if mode == 'full_analysis':
+                        session['initial_analysis'] = data
+                        app.session_interface.write(session._get_current_object())
+                        if speculate and not data.get('degraded'):
+                            _start_speculative_rewrite(resume_text, jd_text, data, candidate_name)
+                yield _sse('complete', {'status': status, 'data': data})
+            else:
+                yield _sse(event, data)
+
+    return _ai_stream_response(generate_events())
+
+def _load_generation_inputs():
+    """Reads the data /analyze left in the session, or returns None if it has expired."""
     original_resume = session.get('original_resume_text')
     jd_text = session.get('job_description')
     initial_analysis = session.get('initial_analysis')
-    
+    if not initial_analysis and session.get('analysis_job'):
+        # Queued analyses are kept with their job, degraded ones included
+        job = job_queue.queue.get(session['analysis_job'])
+        if job and job['status'] == 'done':
+            initial_analysis = job['result']['data']
     if not all([original_resume, jd_text, initial_analysis]):
-        return jsonify({'error': 'Session expired or data not found. Please start over.'}), 400
+        return None
+    return original_resume, jd_text, initial_analysis
 
-    reformat_only = request.json.get('reformat_only', False)
+def _reanalyze_new_resume(original_resume, new_resume_json, jd_text, initial_analysis):
+    """
+    Re-analyzes the generated resume so the UI can show the score improvement.
+    Only the sections the rewrite changed are sent; other category scores carry forward.
+    """
+    new_analysis_result = analyzer_logic.reanalyze_resume_incremental(original_resume, new_resume_json, jd_text, initial_analysis)
     
+    if 'error' in new_analysis_result:
+        print(f"Warning: Re-analysis failed. Error: {new_analysis_result['error']}")
+        return None
+
+    # Logic to ensure the new score feels like an improvement
+    old_score = initial_analysis.get('match_score', 0)
+    new_score = new_analysis_result.get('match_score', 0)
+    if new_score < old_score:
+        new_analysis_result['match_score'] = min(95, old_score + random.randint(5, 10))
+        new_analysis_result['summary'] = "This rewritten version incorporates key suggestions for better keyword alignment. " + new_analysis_result.get('summary', '')
+    return new_analysis_result
+
+def _run_generation(payload):
+    """
+    The AI work behind /generate: the rewrite (or reformat) and the re-analysis. Runs in
+    the request or as a 'generate' job, and returns the response body (or an 'error' dict).
+    """
+    original_resume = payload['original_resume']
+    jd_text = payload['jd_text']
+    initial_analysis = payload['initial_analysis']
+    reformat_only = payload['reformat_only']
+
     suggestions = [] if reformat_only else initial_analysis.get('suggested_changes', [])
     candidate_name = initial_analysis.get('candidate_name', '')
 
-    generation_result = analyzer_logic.generate_new_resume_text_with_ai(
-        original_resume, 
-        jd_text, 
-        suggestions,
-        reformat_only,
-        candidate_name
-    )
+    # A rewrite started speculatively by /analyze is returned as soon as it is done
+    generation_result = None
+    if not reformat_only:
+        generation_result = speculative.rewriter.claim(payload.get('speculative_job'), suggestions)
+    if generation_result is None:
+        generation_result = analyzer_logic.generate_new_resume_text_with_ai(
+            original_resume, 
+            jd_text, 
+            suggestions,
+            reformat_only,
+            candidate_name,
+            layout=payload.get('resume_layout')
+        )
     
     if 'error' in generation_result:
-        return jsonify(generation_result), 500
+        return generation_result
     
     new_resume_json = generation_result.get("new_resume_json")
     if not new_resume_json:
-        return jsonify({'error': 'AI failed to generate a valid resume structure.'}), 500
-
-    new_resume_text = analyzer_logic.convert_resume_json_to_text(new_resume_json)
+        return {'error': 'AI failed to generate a valid resume structure.'}
 
     new_analysis_result = None
     if not reformat_only:
-        # Re-analyze the newly generated resume to show the score improvement
-        new_analysis_result = analyzer_logic.analyze_resume_with_ai(new_resume_text, jd_text, initial_analysis=initial_analysis)
-        
-        if 'error' in new_analysis_result:
-            print(f"Warning: Re-analysis failed. Error: {new_analysis_result['error']}")
-            new_analysis_result = None
-        else:
-            # Logic to ensure the new score feels like an improvement
-            old_score = initial_analysis.get('match_score', 0)
-            new_score = new_analysis_result.get('match_score', 0)
-            if new_score < old_score:
-                new_analysis_result['match_score'] = min(95, old_score + random.randint(5, 10))
-                new_analysis_result['summary'] = "This rewritten version incorporates key suggestions for better keyword alignment. " + new_analysis_result.get('summary', '')
-
-    return jsonify({
+        new_analysis_result = _reanalyze_new_resume(original_resume, new_resume_json, jd_text, initial_analysis)
+
+    return {
         "new_resume_json": new_resume_json,
         "new_analysis_result": new_analysis_result
-    })
+    }
+
+def _generation_payload(original_resume, jd_text, initial_analysis, reformat_only):
+    """The input of _run_generation, from the request's session."""
+    return {
+        'original_resume': original_resume,
+        'jd_text': jd_text,
+        'initial_analysis': initial_analysis,
+        'reformat_only': reformat_only,
+        'resume_layout': session.get('resume_layout'),
+        'speculative_job': session.get('speculative_rewrite'),
+    }
+
+@app.route('/generate', methods=['POST'])
+def generate():
+    """
+    Endpoint to generate a new resume after a full analysis.
+    It can either do a full rewrite with AI or just a reformat.
+    Supports ?async=1 / 'Prefer: respond-async' like /analyze.
+    """
+    inputs = _load_generation_inputs()
+    if not inputs:
+        return jsonify({'error': 'Session expired or data not found. Please start over.'}), 400
+    original_resume, jd_text, initial_analysis = inputs
+
+    payload = _generation_payload(original_resume, jd_text, initial_analysis, request.json.get('reformat_only', False))
+    if _wants_async():
+        return _job_accepted(job_queue.queue.enqueue('generate', payload))
+
+    result = _run_generation(payload)
+    if 'error' in result:
+        return jsonify(result), 500
+    return jsonify(result)
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """
+    Streaming variant of /generate. Sends each resume section as a 'section' event as
+    soon as it is generated, then a 'complete' event with the same payload as /generate.
+    Queued like /analyze/stream while the server is busy.
+    """
+    inputs = _load_generation_inputs()
+    if not inputs:
+        return jsonify({'error': 'Session expired or data not found. Please start over.'}), 400
+    original_resume, jd_text, initial_analysis = inputs
+
+    reformat_only = request.json.get('reformat_only', False)
+    if not _admit_stream():
+        payload = _generation_payload(original_resume, jd_text, initial_analysis, reformat_only)
+        return _job_accepted(job_queue.queue.enqueue('generate', payload))
+    suggestions = [] if reformat_only else initial_analysis.get('suggested_changes', [])
+    candidate_name = initial_analysis.get('candidate_name', '')
+    speculative_job = None if reformat_only else session.get('speculative_rewrite')
+    resume_layout = session.get('resume_layout')
+
+    def generate_events():
+        if speculative_job:
+            # Wait for a speculative rewrite still in flight; once it is done the stream
+            # below replays it from the AI result cache instead of calling Gemini again
+            speculative.rewriter.claim(speculative_job, suggestions)
+        for event, data in analyzer_logic.stream_new_resume_with_ai(
+                original_resume, jd_text, suggestions, reformat_only, candidate_name, layout=resume_layout):
+            if event != 'complete':
+                yield _sse(event, data)
+                continue
+            new_resume_json = data.get("new_resume_json")
+            if not new_resume_json:
+                yield _sse('error', {'error': 'AI failed to generate a valid resume structure.'})
+                return
+            new_analysis_result = None
+            if not reformat_only:
+                new_analysis_result = _reanalyze_new_resume(original_resume, new_resume_json, jd_text, initial_analysis)
+            yield _sse('complete', {
+                "new_resume_json": new_resume_json,
+                "new_analysis_result": new_analysis_result
+            })
+
+    return _ai_stream_response(generate_events())
 
 @app.route('/download', methods=['POST'])
 def download():
@@ -188,25 +596,195 @@ def download():
     if file_format not in ['pdf', 'docx']:
         return jsonify({'error': 'Invalid file format requested.'}), 400
         
+    # The ETag is a hash of everything that determines the file, so a client that already
+    # holds this exact file gets a 304 without anything being rendered or sent
+    etag = render_service.RenderService.artifact_key(file_format, resume_json, company)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
     try:
         company_name_part = company.capitalize() if company != 'nologo' else 'Plain'
         
+        # Rendering runs in the render service's process pool, not in this web worker;
+        # repeat downloads are served from its rendered-file cache
+        file_bytes = render_service.renderer.render(file_format, resume_json, company, key=etag)
         if file_format == 'docx':
-            buffer = analyzer_logic.create_docx(resume_json, company)
             mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
             filename = f'Updated_Resume_{company_name_part}.docx'
         else: # Default to PDF
-            buffer = analyzer_logic.create_pdf_with_logo(resume_json, company)
             mimetype = 'application/pdf'
             filename = f'Updated_Resume_{company_name_part}.pdf'
             
-        return send_file(buffer, as_attachment=True, download_name=filename, mimetype=mimetype)
+        response = send_file(io.BytesIO(file_bytes), as_attachment=True, download_name=filename, mimetype=mimetype, etag=etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 404
+    except render_service.RenderTimeout as e:
+        return jsonify({'error': f'Failed to create {file_format.upper()}: {e}'}), 504
     except Exception as e:
         print(f"An unhandled error occurred in /download: {e}")
         return jsonify({'error': f'Failed to create {file_format.upper()}: {e}'}), 500
-    
+
+@app.route('/batch/analyze', methods=['POST'])
+def batch_analyze():
+    """
+    Screens many uploaded resumes ('resumes') against one or more job descriptions
+    (repeated 'job_description' fields and/or .txt uploads in 'job_description_files').
+    With 'min_fast_score', pairs scoring below it on the local fast score skip the AI call.
+    Results stream back as JSONL (default) or CSV ('format=csv') as each pair completes.
+    """
+    resume_files = request.files.getlist('resumes')
+    if not resume_files:
+        return jsonify({'error': 'No resume files provided.'}), 400
+    allowed_extensions = {'.pdf', '.docx'}
+    resumes = []
+    for resume_file in resume_files:
+        if not any(resume_file.filename.lower().endswith(ext) for ext in allowed_extensions):
+            return jsonify({'error': f'Invalid file type for {resume_file.filename}. Please upload PDF or DOCX files.'}), 400
+        resumes.append((resume_file.filename, resume_file.read()))
+
+    job_descriptions = [(f'JD {i}', text) for i, text in enumerate(request.form.getlist('job_description'), start=1) if text.strip()]
+    for jd_file in request.files.getlist('job_description_files'):
+        job_descriptions.append((jd_file.filename, jd_file.read().decode('utf-8', errors='replace')))
+    if not job_descriptions:
+        return jsonify({'error': 'At least one Job Description is required.'}), 400
+
+    output_format = request.form.get('format', 'jsonl').lower()
+    try:
+        max_workers = max(1, min(int(request.form.get('max_workers', 4)), 16))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_workers must be a whole number.'}), 400
+    min_fast_score = request.form.get('min_fast_score', type=int)
+
+    def generate_rows():
+        if output_format == 'csv':
+            yield batch_analyzer.csv_header()
+        for record in batch_analyzer.run_batch(resumes, job_descriptions, max_workers=max_workers, min_fast_score=min_fast_score):
+            if output_format == 'csv':
+                if record['type'] == 'result':
+                    yield batch_analyzer.to_csv_row(record)
+            else:
+                yield batch_analyzer.to_jsonl(record)
+
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(generate_rows(), mimetype=mimetype)
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """
+    Status of a queued /analyze or /generate call: queued (with its queue position),
+    running, done or failed. 'result' holds the body the synchronous route would have
+    returned. With ?wait=N the request long-polls for up to N seconds until the job finishes.
+    """
+    wait = min(request.args.get('wait', 0, type=float), JOB_LONG_POLL_MAX_SECONDS)
+    job = job_queue.queue.wait(job_id, wait) if wait > 0 else job_queue.queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found. It may have expired.'}), 404
+    if job['status'] == 'done' and job_id == session.get('analysis_job') and not session.get('initial_analysis'):
+        # Kept in the session too, since finished jobs are deleted after JOB_RESULT_TTL_SECONDS
+        session['initial_analysis'] = job['result']['data']
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-Sent Events for a queued job: 'status' (status and queue position) whenever it
+    changes, then 'complete' with the body the synchronous route would have returned, or
+    'error'. The result is sent as soon as the job finishes, with no polling delay.
+    """
+    job = job_queue.queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found. It may have expired.'}), 404
+
+    def generate_events(job):
+        last_state, last_sent = None, time.monotonic()
+        while True:
+            if job is None:
+                yield _sse('error', {'error': 'Job not found. It may have expired.'})
+                return
+            if job['status'] == 'done':
+                yield _sse('complete', job['result'])
+                return
+            if job['status'] == 'failed':
+                yield _sse('error', {'error': job.get('error') or 'The job failed.'})
+                return
+            state = {'status': job['status'], 'position': job.get('position')}
+            if state != last_state:
+                yield _sse('status', state)
+                last_state, last_sent = state, time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            job = job_queue.queue.wait(job_id, JOB_EVENTS_REFRESH_SECONDS)
+
+    return _sse_response(generate_events(job))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """
+    Reports AI result cache hits and the Gemini time they saved, request coalescing, render pool
+    and session store counters, speculative rewrite hit rate and wasted work, job queue depth and wait
+    time, estimated prompt tokens before and after compaction per mode, upload sizes and limits, how
+    many reformats the local resume parser handled without Gemini, how often Gemini output was repaired,
+    and how many requests were profiled.
+    """
+    return jsonify(_component_stats())
+
+def _component_stats():
+    stats = {
+        'ai_results': analyzer_logic.ai_cache.stats(),
+        'gemini_client': analyzer_logic.gemini.stats(),
+        'model_routing': analyzer_logic.router.stats(),
+        'render_service': render_service.renderer.stats(),
+        'session_store': app.session_interface.store.stats(),
+        'speculative_rewrite': speculative.rewriter.stats(),
+        'job_queue': job_queue.queue.stats(),
+        'ai_streams': _stream_admission_stats(),
+        'prompt_compaction': prompt_compaction.compaction_stats.stats(),
+        'ingestion': ingestion.ingestion_stats.stats(),
+        'resume_parser': resume_parser.parser_stats.stats(),
+        'json_repair': json_repair.repair_stats.stats(),
+        'profiling': profiling.profiles.stats(),
+    }
+    if analyzer_logic.GEMINI_FAKE or analyzer_logic.GEMINI_RECORD:
+        stats['fake_gemini'] = fake_gemini.fake_stats.stats()
+    return stats
+
+# Every numeric counter from /cache/stats is also exported as a gauge on /metrics
+metrics.registry.add_collector(lambda: [metrics.stats_gauge(
+    'resume_component_stat', 'Numeric values from /cache/stats, by component and dotted stat path.', _component_stats())])
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus text format: per-stage latency histograms (upload read, extraction, prompt
+    build, Gemini call, JSON parse, scoring, resume-to-text, PDF/DOCX render), payload
+    sizes, Gemini token counts, errors by stage and type, per-endpoint request counts,
+    latency and in-flight gauges, plus everything /cache/stats reports.
+    """
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/debug/profiles')
+def list_profiles():
+    """Captured request profiles, newest first. Only served when PROFILE_DEBUG_ENDPOINT is set."""
+    if not PROFILE_DEBUG_ENDPOINT:
+        return jsonify({'error': 'Not found.'}), 404
+    return jsonify({'profiles': profiling.profiles.list(), 'stats': profiling.profiles.stats()})
+
+@app.route('/debug/profiles/<trace_id>')
+def get_profile(trace_id):
+    """One captured profile: nested spans, plus the cProfile report and allocation diff if captured."""
+    if not PROFILE_DEBUG_ENDPOINT:
+        return jsonify({'error': 'Not found.'}), 404
+    record = profiling.profiles.get(trace_id)
+    if record is None:
+        return jsonify({'error': 'Profile not found. It may have been evicted from the buffer.'}), 404
+    return jsonify(record)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
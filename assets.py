@@ -0,0 +1,70 @@
+# assets.py
+
+import os
+from collections import namedtuple
+
+import fitz  # PyMuPDF
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOGO_FILES = {
+    "beround": os.path.join(BASE_DIR, "static", "logos", "beround.jpg"),
+    "climber": os.path.join(BASE_DIR, "static", "logos", "climber.jpg"),
+    "rennova": os.path.join(BASE_DIR, "static", "logos", "rennova.jpg"),
+}
+
+# Largest boxes the renderers draw logos into, in points: the PDF header box is
+# 80x30 pt and the DOCX header picture is 0.5 in (36 pt) tall with free width.
+PDF_LOGO_BOX = (80, 30)
+DOCX_LOGO_HEIGHT = 36
+TARGET_DPI = 300
+
+LogoAsset = namedtuple("LogoAsset", ["company", "image_bytes", "width", "height"])
+
+
+def _load_logo(company, path):
+    """Reads a logo once and downscales it to what the largest display box needs at TARGET_DPI."""
+    with open(path, "rb") as f:
+        original = f.read()
+    pix = fitz.Pixmap(original)
+    px_per_pt = TARGET_DPI / 72
+    pdf_scale = min(PDF_LOGO_BOX[0] / pix.width, PDF_LOGO_BOX[1] / pix.height) * px_per_pt
+    docx_scale = DOCX_LOGO_HEIGHT / pix.height * px_per_pt
+    scale = max(pdf_scale, docx_scale)
+    if scale >= 1:
+        # Already small enough; keep the original bytes rather than re-encoding
+        return LogoAsset(company, original, pix.width, pix.height)
+
+    width, height = max(1, round(pix.width * scale)), max(1, round(pix.height * scale))
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)  # JPEG has no alpha channel
+    small = fitz.Pixmap(pix, width, height, None)
+    return LogoAsset(company, small.tobytes("jpg", jpg_quality=90), width, height)
+
+
+def load_logos():
+    logos = {}
+    for company, path in LOGO_FILES.items():
+        try:
+            logos[company] = _load_logo(company, path)
+        except Exception as e:
+            print(f"Warning: could not load logo for {company} from {path}: {e}")
+            logos[company] = None
+    return logos
+
+
+# Loaded once at startup and shared by the PDF and DOCX renderers
+LOGOS = load_logos()
+
+
+def get_logo(company):
+    """
+    Returns the LogoAsset for a company, or None for companies without a logo (e.g. 'nologo').
+    Raises FileNotFoundError if the company should have a logo but it could not be loaded.
+    """
+    if company not in LOGO_FILES:
+        return None
+    logo = LOGOS.get(company)
+    if logo is None:
+        raise FileNotFoundError(f"Logo for {company} not found at {LOGO_FILES[company]}")
+    return logo
@@ -0,0 +1,242 @@
+# batch_analyzer.py
+
+import os
+import io
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import analyzer_logic
+import fast_score
+import ingestion
+import render_service
+
+# Text extraction runs in one process pool shared by every batch, started like the render pool's
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+RESULT_FIELDS = ["rank", "resume", "job", "candidate_name", "match_score", "fast_score", "status", "summary", "missing_keywords", "error", "seconds"]
+
+
+def _get_extraction_pool(workers=None):
+    """The shared extraction pool; workers only sizes it when it is first created."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ProcessPoolExecutor(max_workers=workers or int(os.environ.get("BATCH_EXTRACTION_WORKERS", 0)) or None,
+                                                   mp_context=render_service.POOL_CONTEXT)
+        return _extraction_pool
+
+
+def _discard_extraction_pool(broken_pool):
+    """Drops a pool whose worker died, so the next batch starts a fresh one."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is broken_pool:
+            _extraction_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(resumes, job_descriptions, max_workers=4, extraction_workers=None, min_fast_score=None):
+    """
+    Screens every resume against every job description and yields records as they complete.
+
+    Args:
+        resumes (list): (filename, bytes) pairs for the uploaded PDF/DOCX files.
+        job_descriptions (list): (name, text) pairs.
+        max_workers (int): Maximum number of concurrent analyze_resume_with_ai calls.
+        extraction_workers (int): Size of the shared text extraction process pool, if this
+            call creates it (default: BATCH_EXTRACTION_WORKERS, else the CPU count).
+        min_fast_score (int): Optional pre-filter. Pairs whose local fast score is below
+            this are reported with status "filtered" and never sent to the AI.
+
+    Yields:
+        dict: {"type": "result", ...} per (resume, job) pair in completion order, where
+        "rank" is the pair's position among the results completed so far, followed by one
+        {"type": "summary", ...} record with the final ranking and throughput.
+        A failed pair is reported as a result with status "error" and never stops the batch.
+    """
+    start = time.perf_counter()
+    completed = []
+    lock = threading.Lock()
+
+    def record(row):
+        with lock:
+            completed.append(row)
+            ranked = sorted(completed, key=_rank_key)
+            row["rank"] = next(i for i, other in enumerate(ranked, start=1) if other is row)
+        return dict(row, type="result")
+
+    # Keyed by position: two JD files may share a name
+    scorers = [fast_score.FastScorer(jd_text) for _, jd_text in job_descriptions] if min_fast_score is not None else None
+
+    def analyze_pair(resume_name, candidate_name, resume_text, job_name, jd_text, quick_score=None):
+        pair_start = time.perf_counter()
+        row = _base_row(resume_name, job_name, candidate_name)
+        row["fast_score"] = quick_score
+        result = analyzer_logic.analyze_resume_with_ai(resume_text, jd_text)
+        row["seconds"] = round(time.perf_counter() - pair_start, 2)
+        if "error" in result:
+            row.update(status="error", error=result["error"])
+        else:
+            row.update(status="ok", match_score=result.get("match_score"), summary=result.get("summary", ""),
+                       missing_keywords=result.get("missing_keywords", []))
+        return row
+
+    extract_pool = _get_extraction_pool(extraction_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as ai_pool:
+        ai_futures = []
+        extracted = []
+        extraction_futures = {
+            extract_pool.submit(analyzer_logic.extract_text_from_bytes, name, data): name
+            for name, data in resumes
+        }
+        for future in as_completed(extraction_futures):
+            resume_name = extraction_futures[future]
+            error = "Could not read text from the uploaded file."
+            try:
+                resume_text = future.result()
+            except ingestion.UploadRejected as e:
+                resume_text, error = None, str(e)
+            except BrokenProcessPool as e:
+                print(f"Text extraction crashed for {resume_name}: {e}")
+                _discard_extraction_pool(extract_pool)
+                resume_text = None
+            except Exception as e:
+                print(f"Text extraction crashed for {resume_name}: {e}")
+                resume_text = None
+            if not resume_text or not resume_text.strip():
+                for job_name, _ in job_descriptions:
+                    row = _base_row(resume_name, job_name, "")
+                    row.update(status="error", error=error)
+                    yield record(row)
+                continue
+            candidate_name = ingestion.candidate_name_from_text(resume_text)
+            if scorers is not None:
+                extracted.append((resume_name, candidate_name, resume_text))
+                continue
+            for job_name, jd_text in job_descriptions:
+                ai_futures.append(ai_pool.submit(analyze_pair, resume_name, candidate_name, resume_text, job_name, jd_text))
+
+        # The pre-filter scores every resume against each JD in one vectorized pass, once all are extracted
+        if scorers is not None and extracted:
+            texts = [resume_text for _, _, resume_text in extracted]
+            for (job_name, jd_text), scorer in zip(job_descriptions, scorers):
+                for (resume_name, candidate_name, resume_text), quick in zip(extracted, scorer.score_many(texts)):
+                    if quick["match_score"] < min_fast_score:
+                        row = _base_row(resume_name, job_name, candidate_name)
+                        row.update(status="filtered", match_score=quick["match_score"], fast_score=quick["match_score"],
+                                   summary=quick["summary"], missing_keywords=quick["missing_keywords"])
+                        yield record(row)
+                        continue
+                    ai_futures.append(ai_pool.submit(analyze_pair, resume_name, candidate_name, resume_text,
+                                                     job_name, jd_text, quick["match_score"]))
+
+        for future in as_completed(ai_futures):
+            try:
+                row = future.result()
+            except Exception as e:
+                print(f"Batch analysis task failed: {e}")
+                row = _base_row("", "", "")
+                row.update(status="error", error=str(e))
+            yield record(row)
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for row in completed if row["status"] == "ok")
+    filtered = sum(1 for row in completed if row["status"] == "filtered")
+    yield {
+        "type": "summary",
+        "pairs": len(completed),
+        "succeeded": succeeded,
+        "filtered": filtered,
+        "failed": len(completed) - succeeded - filtered,
+        "elapsed_seconds": round(elapsed, 2),
+        "pairs_per_minute": round(len(completed) / elapsed * 60, 1) if elapsed else 0.0,
+        "ranking": [{k: row[k] for k in ("resume", "job", "candidate_name", "match_score")}
+                    for row in sorted(completed, key=_rank_key)],
+    }
+
+
+def _base_row(resume_name, job_name, candidate_name):
+    return {"rank": None, "resume": resume_name, "job": job_name, "candidate_name": candidate_name,
+            "match_score": None, "fast_score": None, "status": "", "summary": "", "missing_keywords": [], "error": "", "seconds": 0.0}
+
+
+def _rank_key(row):
+    # AI-scored pairs first by score, then pairs cut by the fast-score pre-filter; failures sink to the bottom
+    return (row["match_score"] is None, row["status"] == "filtered", -(row["match_score"] or 0), row["resume"], row["job"])
+
+
+def to_jsonl(record):
+    return json.dumps(record) + "\n"
+
+
+def csv_header():
+    return _csv_line(RESULT_FIELDS)
+
+
+def to_csv_row(record):
+    row = [record.get(field, "") for field in RESULT_FIELDS]
+    row[RESULT_FIELDS.index("missing_keywords")] = "; ".join(map(str, record.get("missing_keywords") or []))
+    return _csv_line(row)
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Screens many resumes against one or more job descriptions and ranks the results."
+    )
+    parser.add_argument("resumes", nargs="+", help="Paths to resume PDF/DOCX files.")
+    parser.add_argument("--jd", action="append", required=True, help="Path to a job description text file. Repeat for several jobs.")
+    parser.add_argument("-o", "--output", help="Optional: write the ranked results to this .csv or .jsonl file.")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent AI analyses (default: 4).")
+    parser.add_argument("--extraction-workers", type=int, default=None, help="Text extraction processes (default: CPU count).")
+    parser.add_argument("--min-fast-score", type=int, default=None, help="Skip the AI call for pairs whose instant local score is below this.")
+    args = parser.parse_args()
+
+    resumes = []
+    for path in args.resumes:
+        with open(path, "rb") as f:
+            resumes.append((os.path.basename(path), f.read()))
+    job_descriptions = []
+    for path in args.jd:
+        with open(path, "r", encoding="utf-8") as f:
+            job_descriptions.append((os.path.basename(path), f.read()))
+
+    print(f"Screening {len(resumes)} resume(s) against {len(job_descriptions)} job description(s)...", file=sys.stderr)
+    results, summary = [], None
+    for record in run_batch(resumes, job_descriptions, args.workers, args.extraction_workers, args.min_fast_score):
+        if record["type"] == "summary":
+            summary = record
+            continue
+        results.append(record)
+        score = f"error: {record['error']}" if record["status"] == "error" else record["match_score"]
+        if record["status"] == "filtered":
+            score = f"{score} (filtered by fast score)"
+        print(f"  [{len(results)}] {record['resume']} x {record['job']}: {score}", file=sys.stderr)
+
+    results.sort(key=_rank_key)
+    for rank, record in enumerate(results, start=1):
+        record["rank"] = rank
+    if args.output and args.output.endswith(".jsonl"):
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(to_jsonl(record) for record in results + [summary])
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        out.write(csv_header())
+        out.writelines(to_csv_row(record) for record in results)
+        if args.output:
+            out.close()
+
+    print(f"\nDone: {summary['succeeded']} succeeded, {summary['filtered']} filtered, {summary['failed']} failed in {summary['elapsed_seconds']}s "
+          f"({summary['pairs_per_minute']} analyses/min).", file=sys.stderr)
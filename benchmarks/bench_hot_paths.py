@@ -0,0 +1,172 @@
+# benchmarks/bench_hot_paths.py
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+import bench_env
+
+bench_env.configure()
+# Extraction is cached by file hash; without this every iteration after the first is a cache hit
+os.environ["EXTRACTION_CACHE_DIR"] = ""
+os.environ["EXTRACTION_CACHE_MAX_ENTRIES"] = "0"
+os.environ.setdefault("MAX_PDF_PAGES", "100")
+
+import fitz
+import analyzer_logic
+from synthetic import make_resume
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = "1,5,12"
+MIN_SAMPLE_SECONDS = 0.005
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _calibrate(rounds=9):
+    """
+    Fastest time of a fixed pure-Python workload. Results are compared against the baseline
+    relative to this, so a slower machine does not read as a regression.
+    """
+    payload = make_resume(10, seed=1)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(200):
+            json.loads(json.dumps(payload, sort_keys=True))
+        samples.append(time.perf_counter() - start)
+    return min(samples) * 1000
+
+
+def _measure(fn, iterations, warmup):
+    start = time.perf_counter()
+    for _ in range(max(1, warmup)):
+        fn()
+    # Sub-millisecond functions are timed in batches, so timer resolution and one-off
+    # scheduler hiccups do not dominate their percentiles
+    batch = max(1, int(MIN_SAMPLE_SECONDS / ((time.perf_counter() - start) / max(1, warmup))))
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        samples.append((time.perf_counter() - start) / batch)
+    # Peak memory from a separate run, since tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 99) * 1000, 3),
+        "ops_per_sec": round(len(samples) / sum(samples), 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def _cases(units, company):
+    resume = make_resume(units)
+    pdf_bytes = analyzer_logic.create_pdf_with_logo(resume, company).getvalue()
+    docx_bytes = analyzer_logic.create_docx(resume, company).getvalue()
+    pages = fitz.open(stream=pdf_bytes, filetype="pdf").page_count
+    cases = {
+        "create_pdf_with_logo": lambda: analyzer_logic.create_pdf_with_logo(resume, company),
+        "create_docx": lambda: analyzer_logic.create_docx(resume, company),
+        "convert_resume_json_to_text": lambda: analyzer_logic.convert_resume_json_to_text(resume),
+        "extract_text_from_pdf_stream": lambda: analyzer_logic.extract_text_from_pdf_stream(io.BytesIO(pdf_bytes)),
+        "extract_text_from_docx_stream": lambda: analyzer_logic.extract_text_from_docx_stream(io.BytesIO(docx_bytes)),
+    }
+    return pages, cases
+
+
+def run(sizes, company, iterations, warmup, only=None):
+    results = {}
+    for units in sizes:
+        pages, cases = _cases(units, company)
+        for name, fn in cases.items():
+            if only and not any(part in name for part in only):
+                continue
+            key = f"{name}@{units}"
+            results[key] = dict(_measure(fn, iterations, warmup), pages=pages)
+            r = results[key]
+            print(f"  {key:<34} {pages:>3}p  p50 {r['p50_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  "
+                  f"{r['ops_per_sec']:>8.1f} ops/s  peak {r['peak_kb']:>8.0f} KB")
+    return results
+
+
+def compare(results, calibration_ms, baseline, threshold):
+    """Returns the cases whose p50 (scaled for machine speed) is more than threshold slower than the baseline."""
+    scale = calibration_ms / baseline["calibration_ms"] if baseline.get("calibration_ms") else 1.0
+    regressions = []
+    for key, result in results.items():
+        expected = baseline["results"].get(key)
+        if not expected:
+            continue
+        allowed = expected["p50_ms"] * scale * (1 + threshold)
+        if result["p50_ms"] > allowed:
+            regressions.append((key, result["p50_ms"], expected["p50_ms"] * scale))
+    return scale, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency, throughput and peak memory of the rendering, text conversion and extraction hot paths.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated synthetic resume sizes, in pages of content")
+    parser.add_argument("--company", default="beround")
+    parser.add_argument("-n", "--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", help="comma-separated substrings; only run matching functions")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results as the new baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    only = [part.strip() for part in args.only.split(",")] if args.only else None
+    calibration_ms = _calibrate()
+    print(f"Hot paths ({args.company}, {args.iterations} runs after {args.warmup} warmup)")
+    results = run(sizes, args.company, args.iterations, args.warmup, only)
+    # Calibrated again afterwards, so a burst of background load at start-up does not skew the comparison
+    calibration_ms = min(calibration_ms, _calibrate())
+    print(f"Calibration workload: {calibration_ms:.1f} ms")
+
+    if args.update_baseline:
+        baseline = {
+            "calibration_ms": round(calibration_ms, 3),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "iterations": args.iterations,
+            "results": results,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    scale, regressions = compare(results, calibration_ms, baseline, args.threshold)
+    print(f"Against {args.baseline} (machine speed factor {scale:.2f}, threshold {args.threshold:.0%}):")
+    if not regressions:
+        print("  no regressions")
+        return 0
+    for key, actual, expected in regressions:
+        print(f"  REGRESSION {key}: p50 {actual:.2f} ms vs {expected:.2f} ms expected (+{(actual / expected - 1) * 100:.0f}%)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
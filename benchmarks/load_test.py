@@ -0,0 +1,192 @@
+# benchmarks/load_test.py
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import http.cookiejar
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_env
+
+# analyzer_logic only renders the upload PDFs here; requests go to the running app
+bench_env.configure()
+
+import analyzer_logic
+from synthetic import make_resume
+
+JOB_DESCRIPTION = """Senior Backend Engineer. We are looking for an engineer with strong Python, SQL and
+AWS experience to build and scale data-intensive services. You will own APIs end to end, work with
+Kubernetes, Kafka and PostgreSQL, mentor engineers and improve reliability and latency.
+Requirements: 5+ years of backend development, Python, Flask or Django, REST APIs, Docker,
+Kubernetes, CI/CD, observability. Nice to have: Terraform, Spark, Airflow, Elasticsearch."""
+FLOW_STEPS = ("analyze", "generate", "download")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n").encode()
+    for name, (filename, data, content_type) in files.items():
+        body += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+                 f"Content-Type: {content_type}\r\n\r\n").encode()
+        body += data + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+class Results:
+    """Latency and status of every request, by endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.flows = 0
+
+    def record(self, endpoint, seconds, error=None):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if error:
+                errors = self.errors.setdefault(endpoint, {})
+                errors[error] = errors.get(error, 0) + 1
+
+    def finish_flow(self):
+        with self._lock:
+            self.flows += 1
+
+    def summary(self, elapsed):
+        report = {"elapsed_seconds": round(elapsed, 2), "flows": self.flows,
+                  "flows_per_sec": round(self.flows / elapsed, 2), "endpoints": {}}
+        for endpoint, samples in self.samples.items():
+            errors = self.errors.get(endpoint, {})
+            report["endpoints"][endpoint] = {
+                "requests": len(samples),
+                "errors": sum(errors.values()),
+                "error_types": errors,
+                "req_per_sec": round(len(samples) / elapsed, 2),
+                **{f"p{pct}_ms": round(_percentile(samples, pct) * 1000, 1) for pct in (50, 90, 99)},
+                "max_ms": round(max(samples) * 1000, 1),
+            }
+        return report
+
+
+class VirtualUser:
+    """One browser: its own session cookie, walking analyze -> generate -> download."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, body, content_type):
+        req = urllib.request.Request(self.base_url + path, data=body, headers={"Content-Type": content_type}, method="POST")
+        with self.opener.open(req, timeout=self.timeout) as response:
+            return response.status, response.read()
+
+    def timed(self, results, endpoint, path, body, content_type):
+        """Sends one request and records it. Returns the response body, or None if it failed."""
+        start = time.perf_counter()
+        try:
+            status, data = self.request(path, body, content_type)
+            error = None if status == 200 else f"HTTP {status}"
+        except urllib.error.HTTPError as e:
+            data, error = None, f"HTTP {e.code}"
+        except Exception as e:
+            data, error = None, type(e).__name__
+        results.record(endpoint, time.perf_counter() - start, error)
+        return None if error else data
+
+
+def run_flow(user, results, steps, upload, resume_json, args):
+    if "analyze" in steps:
+        body, content_type = _multipart({"analysis_mode": args.mode, "job_description": JOB_DESCRIPTION},
+                                        {"resume": ("resume.pdf", upload, "application/pdf")})
+        if user.timed(results, "analyze", "/analyze", body, content_type) is None:
+            return
+    if "generate" in steps:
+        data = user.timed(results, "generate", "/generate", json.dumps({"reformat_only": args.reformat_only}).encode(),
+                          "application/json")
+        if data is None:
+            return
+        resume_json = json.loads(data).get("new_resume_json") or resume_json
+    if "download" in steps:
+        for file_format in args.formats:
+            body = json.dumps({"company": args.company, "resume_json": resume_json, "format": file_format}).encode()
+            if user.timed(results, f"download_{file_format}", "/download", body, "application/json") is None:
+                return
+    results.finish_flow()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drives /analyze, /generate and /download at a fixed concurrency and "
+                                                 "reports throughput and latency percentiles per endpoint. Start the "
+                                                 "app with GEMINI_FAKE=1 (or =replay) to test without Gemini quota.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="virtual users running flows at once")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="seconds to keep starting new flows")
+    parser.add_argument("--flow", default=",".join(FLOW_STEPS), help="comma-separated steps of each flow")
+    parser.add_argument("--mode", default="full_analysis", help="analysis_mode sent to /analyze")
+    parser.add_argument("--reformat-only", action="store_true", help="ask /generate to reformat instead of rewrite")
+    parser.add_argument("--formats", default="pdf", help="comma-separated /download formats per flow")
+    parser.add_argument("--company", default="beround")
+    parser.add_argument("--resumes", type=int, default=20, help="distinct resumes to cycle through; more means fewer cache hits")
+    parser.add_argument("--pages", type=int, default=2, help="size of each synthetic resume, in pages of content")
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    args.formats = [part.strip() for part in args.formats.split(",") if part.strip()]
+    steps = [part.strip() for part in args.flow.split(",") if part.strip()]
+    unknown = set(steps) - set(FLOW_STEPS)
+    if unknown:
+        parser.error(f"unknown flow steps: {', '.join(sorted(unknown))}")
+
+    print(f"Preparing {args.resumes} synthetic resume(s) of {args.pages} page(s)...")
+    resumes = [make_resume(args.pages, seed=seed) for seed in range(max(1, args.resumes))]
+    uploads = [analyzer_logic.create_pdf_with_logo(resume, "nologo").getvalue() for resume in resumes]
+
+    results = Results()
+    deadline = time.monotonic() + args.duration
+    counter = iter(range(sys.maxsize))
+    counter_lock = threading.Lock()
+
+    def worker():
+        while time.monotonic() < deadline:
+            with counter_lock:
+                index = next(counter) % len(uploads)
+            run_flow(VirtualUser(args.url, args.timeout), results, steps, uploads[index], resumes[index], args)
+
+    print(f"Running {' -> '.join(steps)} against {args.url} with {args.concurrency} virtual user(s) for {args.duration:g}s")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker)
+    report = results.summary(time.monotonic() - start)
+    report["settings"] = {"concurrency": args.concurrency, "flow": steps, "resumes": args.resumes, "pages": args.pages}
+
+    print(f"\n{report['flows']} complete flow(s) in {report['elapsed_seconds']}s ({report['flows_per_sec']} flows/s)")
+    print(f"  {'endpoint':<14} {'requests':>8} {'errors':>7} {'req/s':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"  {endpoint:<14} {r['requests']:>8} {r['errors']:>7} {r['req_per_sec']:>7.2f} {r['p50_ms']:>9.1f} "
+              f"{r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+        for error, count in r["error_types"].items():
+            print(f"      {error}: {count}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.json}")
+    return 1 if any(r["errors"] for r in report["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# benchmarks/synthetic.py
+
+import random
+
+# Roughly one A4 page of rendered PDF per unit: three jobs and one project
+JOBS_PER_PAGE = 3
+DUTIES_PER_JOB = 6
+PROJECTS_PER_PAGE = 1
+
+_TITLES = ["Software Engineer", "Senior Software Engineer", "Staff Engineer", "Backend Engineer",
+           "Data Engineer", "Platform Engineer", "Engineering Manager", "Site Reliability Engineer"]
+_COMPANIES = ["Acme Corp", "Initech", "Globex", "Umbrella Labs", "Hooli", "Stark Industries",
+              "Wayne Enterprises", "Cyberdyne", "Soylent", "Vandelay Industries"]
+_VERBS = ["Led", "Built", "Designed", "Migrated", "Automated", "Scaled", "Rewrote", "Optimised", "Launched", "Owned"]
+_OBJECTS = ["the billing pipeline", "a search platform", "the payments API", "40 services to Kubernetes",
+            "the data warehouse", "an event-driven ingestion layer", "the CI/CD system", "a feature store",
+            "the customer analytics dashboard", "the authentication service"]
+_RESULTS = ["cutting deploy time by 70%", "serving 2M requests a day", "reducing cloud spend by $300K a year",
+            "improving p99 latency by 45%", "raising test coverage from 40% to 85%", "with zero downtime",
+            "across 12 teams and 3 regions", "processing 5TB of events daily"]
+_TECH = ["Python", "Go", "Java", "SQL", "AWS", "GCP", "Kubernetes", "Terraform", "PostgreSQL", "Redis",
+         "Kafka", "Spark", "Airflow", "Elasticsearch", "React", "Docker", "gRPC", "Flask"]
+
+
+def _sentence(rng):
+    return f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)}, {rng.choice(_RESULTS)}."
+
+
+def make_resume(pages=1, seed=0):
+    """
+    A schema-valid resume JSON (the shape Gemini returns for rewrites) that renders to
+    about `pages` pages: Experience and Projects grow with the page count. The same
+    pages and seed always give the same resume, so timings are comparable across runs.
+    """
+    rng = random.Random(f"{pages}:{seed}")
+    jobs = []
+    for i in range(max(1, pages * JOBS_PER_PAGE)):
+        start = 2024 - 2 * (i + 1)
+        jobs.append({
+            "job_title": rng.choice(_TITLES),
+            "company_and_date": f"{rng.choice(_COMPANIES)} | Jan {start} - Dec {start + 2}",
+            "duties": [_sentence(rng) for _ in range(DUTIES_PER_JOB)],
+        })
+    projects = [{
+        "project_name": f"{rng.choice(['Search', 'Billing', 'Insights', 'Ingest', 'Atlas', 'Beacon'])} Platform {i + 1}",
+        "description": " ".join(_sentence(rng) for _ in range(3)),
+        "tech_stack": ", ".join(rng.sample(_TECH, 5)),
+    } for i in range(max(1, pages * PROJECTS_PER_PAGE))]
+    return {
+        "candidate_name": "Jane Doe",
+        "designation_line": f"Senior Software Engineer | {2 * len(jobs)}+ Years of Experience",
+        "contact_info": {"phone": "+1 555 0100", "email": "jane.doe@example.com"},
+        "sections": [
+            {"title": "Summary", "content": " ".join(_sentence(rng) for _ in range(4))},
+            {"title": "Skills", "content": [", ".join(rng.sample(_TECH, 6)) for _ in range(3)]},
+            {"title": "Experience", "content": jobs},
+            {"title": "Projects", "content": projects},
+            {"title": "Education", "content": ["B.Tech in Computer Science, 2012"]},
+            {"title": "Certifications", "content": ["AWS Certified Solutions Architect", "CKA: Certified Kubernetes Administrator"]},
+        ],
+    }
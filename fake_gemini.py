@@ -0,0 +1,269 @@
+# fake_gemini.py
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+
+SCORING_CATEGORIES = ("key_skills", "experience_level", "project_and_impact", "education_and_certs")
+# JSONL of recorded Gemini responses, written with GEMINI_RECORD=1 and replayed with GEMINI_FAKE=replay
+RECORDINGS_PATH = os.environ.get("GEMINI_RECORDINGS_PATH", os.path.join(".cache", "gemini_recordings.jsonl"))
+
+
+class FakeStats:
+    """Calls served by fake models, and responses recorded from the real one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "replayed": 0, "replayed_by_kind": 0, "synthesized": 0,
+                       "recorded": 0, "record_errors": 0}
+
+    def record(self, key, count=1):
+        with self._lock:
+            self._stats[key] += count
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+fake_stats = FakeStats()
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+
+
+def prompt_kind(prompt):
+    """"analysis" for prompts asking for a scored analysis, "resume" for ones asking for resume JSON."""
+    prompt = str(prompt)
+    if '"scoring_breakdown"' in prompt:
+        return "analysis"  # Checked first: re-analysis prompts embed the previous analysis and its candidate_name
+    return "resume" if '"candidate_name"' in prompt or '"sections"' in prompt else "analysis"
+
+
+class FakeUpstreamError(Exception):
+    """An injected upstream failure; code mirrors the HTTP status of google.api_core errors."""
+
+    def __init__(self, message="Injected upstream failure", code=503):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class Recordings:
+    """
+    Recorded responses, looked up by the exact prompt first and otherwise by the kind of
+    prompt (taking turns through that kind's responses), so a load test with new resumes
+    still gets realistic response sizes. Only a hash of each prompt is stored.
+    """
+
+    def __init__(self, entries=()):
+        self._by_key = {}
+        self._by_kind = {}
+        self._turns = {}
+        self._lock = threading.Lock()
+        for entry in entries:
+            self._by_key[entry["key"]] = entry
+            self._by_kind.setdefault(entry["kind"], []).append(entry)
+
+    @classmethod
+    def load(cls, path):
+        entries = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # A line cut short by a crash while recording
+        except OSError as e:
+            print(f"Warning: no Gemini recordings loaded from {path}: {e}")
+        print(f"Loaded {len(entries)} recorded Gemini response(s) from {path}.")
+        return cls(entries)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def lookup(self, prompt):
+        """The recorded entry for this prompt, or one of the same kind; None if there is neither."""
+        entry = self._by_key.get(prompt_key(prompt))
+        if entry is not None:
+            fake_stats.record("replayed")
+            return entry
+        entries = self._by_kind.get(prompt_kind(prompt))
+        if not entries:
+            return None
+        with self._lock:
+            turn = self._turns.get(prompt_kind(prompt), 0)
+            self._turns[prompt_kind(prompt)] = turn + 1
+        fake_stats.record("replayed_by_kind")
+        return entries[turn % len(entries)]
+
+
+_recordings = {}
+_recordings_lock = threading.Lock()
+
+
+def load_recordings(path=RECORDINGS_PATH):
+    """Recordings shared by every fake model (one per routed model name) in the process."""
+    with _recordings_lock:
+        if path not in _recordings:
+            _recordings[path] = Recordings.load(path)
+        return _recordings[path]
+
+
+class FakeModel:
+    """
+    A local stand-in for genai.GenerativeModel with injectable latency and errors, for
+    exercising timeouts, retries, hedging, the circuit breaker and load tests without Gemini.
+
+    Each call sleeps latency seconds (spread log-normally around it when latency_sigma is
+    set), or tail_latency with probability tail_rate, and then fails with probability
+    error_rate. With recordings, responses are replayed (after their recorded latency
+    scaled by replay_speed, or the synthetic latency when replay_speed is 0); otherwise,
+    or when nothing fits, they are schema-valid analysis or resume JSON depending on the
+    prompt. configure() changes the behaviour of a running model.
+    """
+
+    SETTINGS = ("latency", "latency_sigma", "tail_latency", "tail_rate", "error_rate", "error_code", "replay_speed")
+
+    def __init__(self, latency=0.05, tail_latency=0.0, tail_rate=0.0, error_rate=0.0, error_code=503, seed=None,
+                 chunk_size=64, latency_sigma=0.0, recordings=None, replay_speed=1.0):
+        self.chunk_size = chunk_size
+        self.recordings = recordings
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.configure(latency=latency, latency_sigma=latency_sigma, tail_latency=tail_latency, tail_rate=tail_rate,
+                       error_rate=error_rate, error_code=error_code, replay_speed=replay_speed)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Configured by GEMINI_FAKE_LATENCY_MS, _LATENCY_SIGMA, _TAIL_MS, _TAIL_RATE, _ERROR_RATE
+        and _SEED. GEMINI_FAKE=replay replays GEMINI_RECORDINGS_PATH at GEMINI_FAKE_REPLAY_SPEED.
+        """
+        seed = os.environ.get("GEMINI_FAKE_SEED")
+        replay = os.environ.get("GEMINI_FAKE", "0").lower() == "replay"
+        return cls(latency=float(os.environ.get("GEMINI_FAKE_LATENCY_MS", 50)) / 1000,
+                   latency_sigma=float(os.environ.get("GEMINI_FAKE_LATENCY_SIGMA", 0)),
+                   tail_latency=float(os.environ.get("GEMINI_FAKE_TAIL_MS", 0)) / 1000,
+                   tail_rate=float(os.environ.get("GEMINI_FAKE_TAIL_RATE", 0)),
+                   error_rate=float(os.environ.get("GEMINI_FAKE_ERROR_RATE", 0)),
+                   seed=int(seed) if seed else None,
+                   recordings=load_recordings() if replay else None,
+                   replay_speed=float(os.environ.get("GEMINI_FAKE_REPLAY_SPEED", 1)))
+
+    def configure(self, **settings):
+        with self._lock:
+            for name, value in settings.items():
+                if name not in self.SETTINGS:
+                    raise TypeError(f"Unknown fake model setting: {name}")
+                setattr(self, name, value)
+
+    def _simulate(self, recorded_latency=None):
+        with self._lock:
+            self.calls += 1
+            slow = self._random.random() < self.tail_rate
+            if slow:
+                delay = self.tail_latency
+            elif recorded_latency is not None and self.replay_speed:
+                delay = recorded_latency * self.replay_speed
+            else:
+                delay = self.latency * (self._random.lognormvariate(0, self.latency_sigma) if self.latency_sigma else 1)
+            fail = self._random.random() < self.error_rate
+            error_code = self.error_code
+        fake_stats.record("calls")
+        time.sleep(delay)
+        if fail:
+            fake_stats.record("errors")
+            raise FakeUpstreamError(code=error_code)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        entry = self.recordings.lookup(prompt) if self.recordings is not None else None
+        self._simulate(entry.get("latency") if entry else None)
+        if entry is not None:
+            text = entry["text"]
+        else:
+            fake_stats.record("synthesized")
+            text = json.dumps(self._response_json(str(prompt)))
+        if stream:
+            return (FakeResponse(text[i:i + self.chunk_size]) for i in range(0, len(text), self.chunk_size))
+        return FakeResponse(text)
+
+    def _response_json(self, prompt):
+        if prompt_kind(prompt) == "resume":
+            return {
+                "candidate_name": "Jane Doe",
+                "designation_line": "Software Engineer | 5+ Years of Experience",
+                "contact_info": {"phone": "555-0100", "email": "jane@example.com"},
+                "sections": [
+                    {"title": "Summary", "content": "Engineer building reliable Python services."},
+                    {"title": "Skills", "content": ["Python", "Flask", "SQL"]},
+                    {"title": "Experience", "content": [{
+                        "job_title": "Software Engineer",
+                        "company_and_date": "Example Corp | Jan 2020 - Present",
+                        "duties": ["Built APIs serving 1M requests a day.", "Cut p99 latency by 40%."],
+                    }]},
+                ],
+            }
+        return {
+            "summary": "Solid match on core skills with a few gaps.",
+            "strengths": ["Python", "Flask"],
+            "missing_keywords": ["Kubernetes"],
+            "suggested_changes": ["Mention container orchestration experience."],
+            "scoring_breakdown": {category: {"score": 75, "justification": "Fake model response."}
+                                  for category in SCORING_CATEGORIES},
+        }
+
+
+class RecordingModel:
+    """
+    Wraps a real genai.GenerativeModel and appends each successful response, its latency
+    and a hash of its prompt to a JSONL file for GEMINI_FAKE=replay. Responses contain
+    resume content, so keep recordings out of anything shared.
+    """
+
+    def __init__(self, model, model_name, path=RECORDINGS_PATH):
+        self.model = model
+        self.model_name = model_name
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, prompt, text, seconds):
+        entry = {"key": prompt_key(prompt), "kind": prompt_kind(prompt), "model": self.model_name,
+                 "latency": round(seconds, 3), "text": text, "recorded_at": time.time()}
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            fake_stats.record("recorded")
+        except OSError as e:
+            fake_stats.record("record_errors")
+            print(f"Warning: could not record Gemini response to {self.path}: {e}")
+
+    def _stream(self, prompt, chunks, start):
+        parts = []
+        for chunk in chunks:
+            if chunk.parts:
+                parts.append(chunk.text)
+            yield chunk
+        self._write(prompt, "".join(parts), time.perf_counter() - start)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        if stream:
+            return self._stream(prompt, response, start)
+        if response.parts:
+            self._write(prompt, response.text, time.perf_counter() - start)
+        return response
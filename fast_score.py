@@ -0,0 +1,270 @@
+# fast_score.py
+
+import re
+from datetime import date
+
+import numpy as np
+
+# Weight of each category in the overall match score. Shared with the Gemini analysis
+# (analyzer_logic), so both engines score on the same scale.
+SCORING_WEIGHTS = {
+    "key_skills": 0.40, "experience_level": 0.30,
+    "project_and_impact": 0.20, "education_and_certs": 0.10
+}
+
+# Canonical skill -> alternative spellings. Every variant is rewritten to the canonical
+# term before tokenizing, so "k8s" in a resume matches "Kubernetes" in a JD.
+SKILL_SYNONYMS = {
+    "javascript": ["js", "ecmascript", "es6"],
+    "typescript": [],
+    "python": ["py", "python3"],
+    "golang": ["go lang"],
+    "c++": ["cpp"],
+    "c#": ["csharp", "c sharp"],
+    "node.js": ["nodejs", "node js", "node"],
+    "react": ["reactjs", "react.js"],
+    "angular": ["angularjs", "angular.js"],
+    "vue": ["vuejs", "vue.js"],
+    "django": [],
+    "flask": [],
+    "fastapi": ["fast api"],
+    "spring": ["spring boot", "springboot"],
+    "postgresql": ["postgres", "psql"],
+    "mysql": [],
+    "mongodb": ["mongo"],
+    "redis": [],
+    "sql": ["structured query language"],
+    "nosql": ["no sql"],
+    "aws": ["amazon web services"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "azure": ["microsoft azure"],
+    "docker": ["containerization"],
+    "kubernetes": ["k8s"],
+    "terraform": [],
+    "ci/cd": ["cicd", "ci cd", "continuous integration", "continuous delivery", "continuous deployment"],
+    "git": ["github", "gitlab"],
+    "rest": ["restful", "rest api", "rest apis", "restful api", "restful apis"],
+    "graphql": [],
+    "microservices": ["micro services", "microservice"],
+    "machine learning": ["ml"],
+    "deep learning": [],
+    "natural language processing": ["nlp"],
+    "computer vision": [],
+    "tensorflow": [],
+    "pytorch": ["torch"],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "pandas": [],
+    "numpy": [],
+    "spark": ["pyspark", "apache spark"],
+    "kafka": ["apache kafka"],
+    "linux": ["unix"],
+    "agile": ["scrum", "kanban"],
+    "java": [],
+    "kotlin": [],
+    "swift": [],
+    "rust": [],
+    "html": ["html5"],
+    "css": ["css3"],
+    "unit testing": ["unit tests", "pytest", "junit", "integration tests", "integration testing"],
+    "data analysis": ["data analytics"],
+    "project management": ["pmp"],
+    "communication": ["communication skills"],
+    "leadership": ["team lead", "led a team"],
+}
+
+DEGREE_TERMS = ["bachelor", "bachelors", "b.tech", "btech", "b.e", "b.sc", "bsc", "master", "masters", "m.tech",
+                "mtech", "m.sc", "msc", "mba", "phd", "ph.d", "degree", "diploma"]
+CERT_TERMS = ["certified", "certification", "certificate"]
+
+STOPWORDS = set("""
+a an and are as at be been being but by can could did do does for from had has have having he her his i if in
+into is it its job just may me more most must my no not of on or our out over own per role same she should so
+some such than that the their them then there these they this those through to too under up us very was we
+were what when where which while who will with within would you your years year experience work working team
+strong ability skills skill knowledge understanding including etc using use used new well good excellent
+responsibilities requirements required preferred qualifications candidate ideal looking join plus least
+like seeking highly ensure develop design maintain implement building build various seamless
+senior junior mid entry level lead principal staff nice bonus ideally related field equivalent relevant
+environment company opportunity position title hands-on proven solid deep demonstrated familiarity e.g i.e
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./_-]*[a-z0-9+#]|[a-z0-9]")
+_YEARS_RE = re.compile(r"(\d{1,2})\s*\+?\s*(?:years|yrs)", re.I)
+_DATE_RANGE_RE = re.compile(r"((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now)", re.I)
+# Technical-looking JD terms (c++, s3, node.js, ec2) that are worth reporting as missing
+# even though they are not in SKILL_SYNONYMS
+_TECH_TOKEN_RE = re.compile(r"(?=.*[a-z])(?=.*[\d+#./]).*")
+_QUANTIFIED_RE = re.compile(r"\d+(?:\.\d+)?\s*(?:%|x\b|k\b|m\b|\+)|\$\s?\d", re.I)
+
+
+def _build_synonym_pattern():
+    variants = {}
+    for canonical, alternatives in SKILL_SYNONYMS.items():
+        for variant in [canonical] + alternatives:
+            variants[variant] = canonical.replace(" ", "_")
+    # Longest variants first so "rest apis" wins over "rest"
+    ordered = sorted(variants, key=len, reverse=True)
+    pattern = re.compile(r"(?<![a-z0-9])(" + "|".join(re.escape(v) for v in ordered) + r")(?![a-z0-9+#])")
+    return pattern, variants
+
+_SYNONYM_RE, _SYNONYM_MAP = _build_synonym_pattern()
+SKILL_TERMS = frozenset(canonical.replace(" ", "_") for canonical in SKILL_SYNONYMS)
+# Scored by the education_and_certs category, so never a keyword: "bachelor" would
+# otherwise be reported missing from a resume that lists a B.Sc.
+_EDUCATION_TERMS = frozenset(DEGREE_TERMS + CERT_TERMS)
+
+
+def tokenize(text):
+    """Lowercases, maps skill synonyms to their canonical term and splits into tokens."""
+    text = _SYNONYM_RE.sub(lambda m: f" {_SYNONYM_MAP[m.group(1)]} ", str(text or "").lower())
+    return [t for t in _TOKEN_RE.findall(text) if t not in STOPWORDS and not t.isdigit()]
+
+
+def _display(term):
+    return term.replace("_", " ")
+
+
+class FastScorer:
+    """
+    Scores resumes against one job description without any network call.
+
+    The JD is tokenized once; score_many() then builds a single (resumes x vocabulary)
+    term-count matrix with NumPy and scores all resumes together, which keeps batch
+    ranking of hundreds of resumes in the millisecond range.
+    """
+
+    def __init__(self, jd_text, max_keywords=25):
+        self.jd_text = jd_text or ""
+        jd_tokens = tokenize(self.jd_text)
+        self.vocabulary = {}
+        for token in jd_tokens:
+            self.vocabulary.setdefault(token, len(self.vocabulary))
+        self.terms = list(self.vocabulary)
+        self.jd_counts = self._count_matrix([jd_tokens])[0] if self.terms else np.zeros(0)
+
+        # Segment-level IDF over the JD's own lines down-weights boilerplate that appears everywhere
+        segments = [tokenize(line) for line in self.jd_text.splitlines() if line.strip()] or [jd_tokens]
+        segment_presence = self._count_matrix(segments) > 0
+        df = segment_presence.sum(axis=0)
+        self.idf = np.log((1 + len(segments)) / (1 + df)) + 1.0 if self.terms else np.zeros(0)
+
+        skill_mask = np.array([term in SKILL_TERMS for term in self.terms], dtype=bool)
+        self.jd_weights = self.jd_counts * self.idf * np.where(skill_mask, 2.0, 1.0)
+        order = np.argsort(-self.jd_weights, kind="stable")
+        keyword_indices = [i for i in order if skill_mask[i]]
+        keyword_indices += [i for i in order if not skill_mask[i] and len(self.terms[i]) > 2 and self.terms[i] not in _EDUCATION_TERMS
+                            ][:max(0, max_keywords - len(keyword_indices))]
+        self.keyword_indices = np.array(keyword_indices[:max_keywords], dtype=int)
+
+        self.required_years = max((int(y) for y in _YEARS_RE.findall(self.jd_text)), default=0)
+        jd_lower = self.jd_text.lower()
+        self.requires_degree = any(term in jd_lower for term in DEGREE_TERMS)
+        self.requires_cert = any(term in jd_lower for term in CERT_TERMS)
+
+    def _count_matrix(self, token_lists):
+        counts = np.zeros((len(token_lists), len(self.vocabulary)), dtype=np.float64)
+        for row, tokens in enumerate(token_lists):
+            indices = [self.vocabulary[t] for t in tokens if t in self.vocabulary]
+            if indices:
+                np.add.at(counts[row], indices, 1.0)
+        return counts
+
+    def score(self, resume_text):
+        return self.score_many([resume_text])[0]
+
+    def score_many(self, resume_texts):
+        """Returns one analysis dict per resume, shaped like analyze_resume_with_ai's output."""
+        token_lists = [tokenize(text) for text in resume_texts]
+        counts = self._count_matrix(token_lists)
+        present = counts > 0
+
+        # key_skills: weighted share of the JD's top keywords found in each resume
+        keyword_weights = self.jd_weights[self.keyword_indices] if len(self.keyword_indices) else np.zeros(0)
+        if keyword_weights.sum() > 0:
+            skill_scores = (present[:, self.keyword_indices] @ keyword_weights) / keyword_weights.sum() * 100
+        else:
+            skill_scores = np.full(len(resume_texts), 50.0)
+
+        # Overall TF-IDF cosine similarity, used to temper the heuristic categories
+        resume_vectors = np.log1p(counts) * self.idf
+        jd_vector = np.log1p(self.jd_counts) * self.idf
+        norms = np.linalg.norm(resume_vectors, axis=1) * (np.linalg.norm(jd_vector) or 1.0)
+        similarity = np.divide(resume_vectors @ jd_vector, norms, out=np.zeros(len(resume_texts)), where=norms > 0)
+
+        results = []
+        for i, text in enumerate(resume_texts):
+            results.append(self._build_result(text, present[i], float(skill_scores[i]), float(similarity[i])))
+        return results
+
+    def _build_result(self, resume_text, present, skill_score, similarity):
+        text_lower = str(resume_text or "").lower()
+        matched = [self.terms[j] for j in self.keyword_indices if present[j]]
+        # Generic JD words still count towards key_skills, but only skills and technical terms
+        # are reported missing: they become suggestions that are fed into the AI rewrite
+        missing = [self.terms[j] for j in self.keyword_indices if not present[j]]
+        reportable = [term for term in missing if term in SKILL_TERMS or _TECH_TOKEN_RE.fullmatch(term)]
+
+        resume_years = _estimate_years(resume_text)
+        if self.required_years:
+            experience_score = min(100.0, resume_years / self.required_years * 100) if resume_years else 35.0
+            experience_note = f"Resume shows about {resume_years:g} years against {self.required_years} required."
+        else:
+            experience_score = 55.0 + 45.0 * similarity
+            experience_note = "No explicit years requirement; scored on overall relevance to the JD."
+
+        quantified = len(_QUANTIFIED_RE.findall(resume_text or ""))
+        impact_score = min(100.0, 40.0 * similarity + 25.0 + 7.5 * quantified)
+        impact_note = f"{quantified} quantified achievement(s) found; content similarity {similarity:.2f}."
+
+        has_degree = any(term in text_lower for term in DEGREE_TERMS)
+        has_cert = any(term in text_lower for term in CERT_TERMS)
+        if self.requires_degree or self.requires_cert:
+            met = (has_degree or not self.requires_degree) + (has_cert or not self.requires_cert)
+            education_score = 30.0 + 35.0 * met
+        else:
+            education_score = 85.0 if has_degree else 65.0
+        education_note = ("Degree found. " if has_degree else "No degree found. ") + ("Certification found." if has_cert else "No certification found.")
+
+        breakdown = {
+            "key_skills": {"score": int(round(skill_score)), "justification": f"Matched {len(matched)} of {len(matched) + len(missing)} key JD terms."},
+            "experience_level": {"score": int(round(experience_score)), "justification": experience_note},
+            "project_and_impact": {"score": int(round(impact_score)), "justification": impact_note},
+            "education_and_certs": {"score": int(round(education_score)), "justification": education_note},
+        }
+        total = sum(breakdown[category]["score"] * weight for category, weight in SCORING_WEIGHTS.items())
+        match_score = min(98, max(5, int(total)))
+
+        suggestions = [f"If you have experience with {_display(term)}, mention it explicitly in your skills or experience." for term in reportable[:5]]
+        if quantified < 3:
+            suggestions.append("Quantify more achievements with numbers, percentages or scale.")
+        if self.required_years and resume_years < self.required_years:
+            suggestions.append(f"Make your total years of relevant experience clear; the role asks for {self.required_years}+.")
+
+        return {
+            "summary": (f"Instant keyword-based estimate: the resume covers {len(matched)} of the "
+                        f"{len(matched) + len(missing)} most important terms in the job description."),
+            "strengths": [_display(term) for term in matched],
+            "missing_keywords": [_display(term) for term in reportable],
+            "suggested_changes": suggestions,
+            "scoring_breakdown": breakdown,
+            "match_score": match_score,
+            "analysis_engine": "fast_score",
+        }
+
+
+def _estimate_years(resume_text):
+    """Estimates total years of experience from explicit statements or date ranges."""
+    text = str(resume_text or "")
+    stated = max((int(y) for y in _YEARS_RE.findall(text)), default=0)
+    this_year = date.today().year
+    span_years = 0
+    for start, end in _DATE_RANGE_RE.findall(text):
+        end_year = this_year if not end[:1].isdigit() else int(end)
+        span_years += max(0, end_year - int(start))
+    # Overlapping roles would otherwise be counted twice; cap at a plausible career length
+    return float(min(max(stated, span_years), 45))
+
+
+def fast_score(resume_text, jd_text):
+    """Scores a single resume against a JD in milliseconds, with no LLM call."""
+    return FastScorer(jd_text).score(resume_text)
@@ -0,0 +1,341 @@
+# gemini_client.py
+
+import time
+import asyncio
+import functools
+import threading
+
+import result_cache
+import resilience
+
+
+class _SharedStream:
+    """The chunks of one upstream stream so far, read by every caller streaming the same prompt."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.readers = 0
+        self.stopped = False
+        self.done = False
+        self.error = None
+
+
+class AsyncGeminiClient:
+    """
+    Runs Gemini calls on a dedicated asyncio event loop in a background thread.
+
+    - A semaphore bounds how many upstream calls, streams included, are in flight at once.
+      A blocking call run on a thread keeps its slot past its timeout, until it returns.
+    - Each caller gets its own deadline; a caller that gives up does not cancel the
+      upstream call other callers may still be waiting on.
+    - Concurrent calls with the same prompt and config share one upstream request
+      (single-flight), keyed by a hash of the prompt.
+    - Transient failures (timeouts, 429/5xx) are retried with jittered exponential
+      backoff while the deadline allows; each attempt is capped at upstream_timeout.
+    - An attempt still running after the recent p95 latency gets a hedged duplicate
+      request, and whichever answers first wins.
+    - A circuit breaker rejects new calls with resilience.CircuitOpenError after
+      repeated failures, so callers can fail fast or fall back to local modes.
+
+    Flask routes use the blocking generate() and stream(); async code can await generate_async().
+    model_getter(model_name) returns the model to call; model_name=None means the default.
+    """
+
+    def __init__(self, model_getter, max_concurrency=8, timeout=90.0, upstream_timeout=180.0,
+                 max_retries=2, backoff_base=0.5, backoff_cap=8.0,
+                 hedge_percentile=95, hedge_min_delay=1.0, breaker=None):
+        self._model_getter = model_getter
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.upstream_timeout = upstream_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_percentile = hedge_percentile  # 0 disables hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or resilience.CircuitBreaker()
+        self._latency = {}
+        self._loop = None
+        self._semaphore = None
+        self._inflight = {}
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "upstream_calls": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "in_flight": 0,
+                       "retries": 0, "hedges": 0, "hedge_wins": 0, "streams": 0, "abandoned_calls": 0}
+
+    def _ensure_loop(self):
+        # Started lazily so forked worker processes never inherit a half-running loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-client", daemon=True).start()
+                self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    def _count(self, field, delta=1):
+        with self._stats_lock:
+            self._stats[field] += delta
+
+    def circuit_open(self):
+        """True while the breaker is rejecting calls, i.e. Gemini is known to be degraded."""
+        return self.breaker.is_open()
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise resilience.CircuitOpenError("Gemini is failing repeatedly; calls are paused while it recovers.")
+
+    def generate(self, prompt, generation_config=None, timeout=None, model_name=None):
+        """
+        Blocking call for synchronous code. Raises TimeoutError once the deadline passes and
+        resilience.CircuitOpenError without calling Gemini while the breaker is open.
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.generate_async(prompt, generation_config, timeout, model_name), loop)
+        return future.result()
+
+    async def generate_async(self, prompt, generation_config=None, timeout=None, model_name=None):
+        if self._semaphore is None:
+            raise RuntimeError("generate_async must run on the client's event loop; use generate() from other threads.")
+        self._count("calls")
+        key = result_cache.make_key(prompt, generation_config, model_name)
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            self._check_breaker()
+            task = asyncio.ensure_future(self._call_with_retries(prompt, generation_config, model_name, timeout or self.timeout))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._call_done, key))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"Gemini did not respond within {timeout or self.timeout:g} seconds.")
+
+    def _call_done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved here so a failure after every caller timed out is not logged as unhandled
+
+    async def _call_with_retries(self, prompt, generation_config, model_name, deadline_seconds):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + deadline_seconds
+        attempt = 0
+        while True:
+            try:
+                response = await self._hedged_call(prompt, generation_config, model_name, min(self.upstream_timeout, deadline - loop.time()))
+            except Exception as e:
+                transient = resilience.is_transient(e)
+                delay = resilience.backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                if not transient or attempt >= self.max_retries or loop.time() + delay >= deadline:
+                    # Only failures that say something about Gemini's health count towards the breaker
+                    if transient:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    raise
+                attempt += 1
+                self._count("retries")
+                print(f"Gemini call failed ({type(e).__name__}: {e}); retry {attempt} of {self.max_retries} in {delay:.2f}s.")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+
+    def _latency_window(self, model_name):
+        # Per model: flash and pro latencies are too far apart to share one hedging delay
+        with self._stats_lock:
+            if model_name not in self._latency:
+                self._latency[model_name] = resilience.LatencyWindow()
+            return self._latency[model_name]
+
+    def _hedge_delay(self, model_name=None):
+        if not self.hedge_percentile:
+            return None
+        slow = self._latency_window(model_name).percentile(self.hedge_percentile)
+        return None if slow is None else max(self.hedge_min_delay, slow)
+
+    async def _hedged_call(self, prompt, generation_config, model_name, attempt_timeout):
+        primary = asyncio.ensure_future(self._call_upstream(prompt, generation_config, model_name, attempt_timeout))
+        hedge_delay = self._hedge_delay(model_name)
+        if hedge_delay is None or hedge_delay >= attempt_timeout:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        # With no free slot a hedge would only queue behind the load that made the call slow
+        if done or self._semaphore.locked():
+            return await primary
+
+        self._count("hedges")
+        hedge = asyncio.ensure_future(self._call_upstream(prompt, generation_config, model_name, attempt_timeout - hedge_delay))
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if task is hedge:
+                        self._count("hedge_wins")
+                    return task.result()
+                error = error or task.exception()
+        raise error
+
+    async def _call_upstream(self, prompt, generation_config, model_name=None, attempt_timeout=None):
+        model = self._model_getter(model_name)
+        await self._semaphore.acquire()
+        self._count("upstream_calls")
+        self._count("in_flight")
+        start = time.perf_counter()
+        call = None
+        try:
+            if hasattr(model, "generate_content_async"):
+                response = await asyncio.wait_for(model.generate_content_async(prompt, generation_config=generation_config),
+                                                  attempt_timeout or self.upstream_timeout)
+            else:
+                call = asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(model.generate_content, prompt, generation_config=generation_config))
+                # Shielded: cancelling the future would not stop its thread, only hide it from the slot count
+                response = await asyncio.wait_for(asyncio.shield(call), attempt_timeout or self.upstream_timeout)
+        except Exception:
+            self._count("errors")
+            raise
+        finally:
+            if call is not None and not call.done():
+                # The blocking call keeps its thread busy after a timeout or a cancelled hedge,
+                # so its slot is only freed once it really returns
+                self._count("abandoned_calls")
+                call.add_done_callback(self._release_slot)
+            else:
+                self._release_slot()
+        self._latency_window(model_name).record(time.perf_counter() - start)
+        return response
+
+    def _release_slot(self, call=None):
+        if call is not None and not call.cancelled():
+            call.exception()  # Retrieved so an abandoned call's failure is not logged as unhandled
+        self._count("in_flight", -1)
+        self._semaphore.release()
+
+    async def _acquire_slot(self, timeout):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(0.0, timeout))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stream(self, prompt, generation_config=None, timeout=None, model_name=None):
+        """
+        Blocking streaming call: yields response chunks as Gemini produces them.
+
+        The upstream stream is read on a helper thread that holds a concurrency slot for as
+        long as it runs, and concurrent streams of the same prompt share it (a late caller
+        first gets the chunks already received). A stalled upstream raises TimeoutError at
+        the deadline instead of blocking the request. The helper stops reading once the
+        deadline passes or every caller has gone away. Streams are not retried or hedged,
+        since chunks may already have been sent to the client.
+        """
+        loop = self._ensure_loop()
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        key = result_cache.make_key("stream", prompt, generation_config, model_name)
+        self._count("streams")
+        with self._streams_lock:
+            shared = self._streams.get(key)
+            if shared is not None:
+                self._count("coalesced")
+            else:
+                self._check_breaker()
+                shared = self._streams[key] = _SharedStream()
+                threading.Thread(target=self._produce, name="gemini-stream", daemon=True,
+                                 args=(loop, key, shared, prompt, generation_config, model_name, deadline)).start()
+            shared.readers += 1
+        index = 0
+        try:
+            while True:
+                with shared.cond:
+                    while index >= len(shared.chunks) and not shared.done:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._count("timeouts")
+                            raise TimeoutError(f"Gemini did not finish streaming within {timeout:g} seconds.")
+                        shared.cond.wait(remaining)
+                    if index < len(shared.chunks):
+                        chunk = shared.chunks[index]
+                        index += 1
+                    elif shared.error is not None:
+                        raise shared.error
+                    else:
+                        return
+                yield chunk
+        finally:
+            with self._streams_lock, shared.cond:
+                shared.readers -= 1
+                if shared.readers == 0 and not shared.done:
+                    shared.stopped = True  # Nobody is reading any more; the helper stops at its next chunk
+                    if self._streams.get(key) is shared:
+                        del self._streams[key]
+
+    def _produce(self, loop, key, shared, prompt, generation_config, model_name, deadline):
+        """Reads one upstream stream into shared, inside a concurrency slot, and records its outcome."""
+        response, error, stopped = None, None, False
+        acquired = asyncio.run_coroutine_threadsafe(self._acquire_slot(deadline - time.monotonic()), loop).result()
+        try:
+            if not acquired:
+                raise TimeoutError("No Gemini concurrency slot freed up before the stream's deadline.")
+            self._count("upstream_calls")
+            self._count("in_flight")
+            try:
+                # request_options bounds each blocking read, so a stalled connection cannot hold the slot forever
+                response = self._model_getter(model_name).generate_content(
+                    prompt, generation_config=generation_config, stream=True,
+                    request_options={"timeout": max(1.0, deadline - time.monotonic())})
+                for chunk in response:
+                    with shared.cond:
+                        if shared.stopped or time.monotonic() >= deadline:
+                            stopped = True
+                            break
+                        shared.chunks.append(chunk)
+                        shared.cond.notify_all()
+            finally:
+                self._count("in_flight", -1)
+                loop.call_soon_threadsafe(self._semaphore.release)
+        except Exception as e:
+            error = e
+            self._count("errors")
+        finally:
+            if response is not None and hasattr(response, "close"):
+                response.close()
+            with self._streams_lock, shared.cond:
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+                shared.done, shared.error = True, error
+                shared.cond.notify_all()
+        if not acquired or (stopped and time.monotonic() < deadline):
+            # Local saturation, or every caller went away mid-stream: says nothing about Gemini
+            self.breaker.release()
+        elif stopped or (error is not None and resilience.is_transient(error)):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["max_concurrency"] = self.max_concurrency
+        with self._stats_lock:
+            models = list(self._latency)
+        stats["models"] = {}
+        for model_name in models:
+            hedge_delay = self._hedge_delay(model_name)
+            stats["models"][model_name or "default"] = dict(
+                self._latency_window(model_name).stats(),
+                hedge_delay_ms=round(hedge_delay * 1000, 1) if hedge_delay is not None else None)
+        stats["circuit_breaker"] = self.breaker.stats()
+        return stats
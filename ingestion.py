@@ -0,0 +1,338 @@
+# ingestion.py
+
+import os
+import io
+import mmap
+import hashlib
+import time
+import zipfile
+import threading
+import tracemalloc
+from collections import Counter, namedtuple
+from contextlib import contextmanager, nullcontext
+
+import docx
+import fitz  # PyMuPDF
+
+import metrics
+import profiling
+import prompt_compaction
+import result_cache
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 10)) * 1024 * 1024)
+MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", 20))
+MAX_TEXT_CHARS = int(os.environ.get("MAX_TEXT_CHARS", 100_000))
+# A DOCX is a zip; this caps what it may expand to, so zip bombs are rejected before parsing
+MAX_DOCX_UNCOMPRESSED_BYTES = int(float(os.environ.get("MAX_DOCX_UNCOMPRESSED_MB", 50)) * 1024 * 1024)
+# Tracks peak Python heap per upload with tracemalloc. It slows every allocation while on,
+# and uploads and memory-profiled requests handled at the same time share one peak, so it
+# is meant for diagnosis.
+TRACE_MEMORY = os.environ.get("INGESTION_TRACE_MEMORY", "0") == "1"
+
+# Bump whenever extraction output changes (e.g. header/footer stripping), so cached text is not reused
+EXTRACTION_VERSION = "3"
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+# --- Extraction Cache ---
+# Extracted text keyed by the SHA-256 of the uploaded file, so re-uploading the same resume
+# (a new mode, a new JD, starting over) skips parsing. EXTRACTION_CACHE_DIR="" keeps it in memory only.
+_extraction_cache_dir = os.environ.get("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extractions"))
+extraction_cache = result_cache.TieredCache(
+    "extractions",
+    memory=result_cache.MemoryLRU(max_entries=int(os.environ.get("EXTRACTION_CACHE_MAX_ENTRIES", 128))),
+    disk=result_cache.DiskStore(
+        _extraction_cache_dir,
+        ttl_seconds=int(os.environ.get("EXTRACTION_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+        max_bytes=int(os.environ.get("EXTRACTION_CACHE_MAX_MB", 100)) * 1024 * 1024,
+    ) if _extraction_cache_dir else None,
+)
+
+# layout holds the styling hints resume_parser uses to find section headings and job titles
+ExtractedText = namedtuple("ExtractedText", ["text", "candidate_name", "layout", "digest", "cached"])
+
+_BOLD_FLAG = 16  # PyMuPDF span flag
+_MAX_LAYOUT_LINES = 300
+
+
+class UploadRejected(Exception):
+    """The upload exceeds a configured limit. Routes answer with 413."""
+
+
+class _IngestionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"uploads": 0, "rejected": 0, "bytes": 0, "max_upload_bytes": 0, "max_peak_python_bytes": 0,
+                       "last_peak_python_bytes": None}
+
+    def record(self, size, peak=None, rejected=False):
+        with self._lock:
+            self._stats["uploads"] += 1
+            self._stats["rejected"] += rejected
+            self._stats["bytes"] += size
+            self._stats["max_upload_bytes"] = max(self._stats["max_upload_bytes"], size)
+            if peak is not None:
+                self._stats["last_peak_python_bytes"] = peak
+                self._stats["max_peak_python_bytes"] = max(self._stats["max_peak_python_bytes"], peak)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["limits"] = {"max_upload_bytes": MAX_UPLOAD_BYTES, "max_pdf_pages": MAX_PDF_PAGES,
+                           "max_text_chars": MAX_TEXT_CHARS}
+        stats["cache"] = extraction_cache.stats()
+        return stats
+
+
+ingestion_stats = _IngestionStats()
+
+
+def _stream_size(stream):
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+@contextmanager
+def _buffer_view(stream):
+    """
+    A read-only memoryview over an upload stream, without copying it: the buffer of a
+    BytesIO, or an mmap of the file behind anything with a fileno().
+    """
+    if isinstance(stream, io.BytesIO):
+        view = stream.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()  # The BytesIO cannot be closed while a view is exported
+        return
+    try:
+        # Werkzeug spools uploads in a SpooledTemporaryFile; fileno() moves one still held in
+        # memory (under 500 KB) to its temporary file, which takes about 0.1 ms
+        fileno = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    if fileno is None or os.fstat(fileno).st_size == 0:
+        yield memoryview(stream.read())  # Unknown stream type (or nothing to map): one copy
+        return
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapped.close()
+
+
+def _sha256(view):
+    """Hashes the upload in chunks of the memoryview, without copying it."""
+    digest = hashlib.sha256()
+    for offset in range(0, len(view), _HASH_CHUNK_BYTES):
+        digest.update(view[offset:offset + _HASH_CHUNK_BYTES])
+    return digest.hexdigest()
+
+
+def _is_contact_line(line):
+    return "@" in line or "://" in line or "www." in line.lower() or sum(c.isdigit() for c in line) >= 7
+
+
+def candidate_name_from_text(text):
+    """
+    The candidate's name is taken to be the first line of the resume, skipping contact
+    details: two-column PDF headers often put the phone and email before the name.
+    """
+    lines = [line.strip() for line in (text or "").strip().split('\n') if line.strip()]
+    return next((line for line in lines if not _is_contact_line(line)), lines[0] if lines else "")
+
+
+def _check_size(size):
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadRejected(f"The file is {size / 1024 / 1024:.1f} MB; the limit is {MAX_UPLOAD_BYTES / 1024 / 1024:g} MB.")
+
+
+def _pdf_page(page):
+    """
+    A page's text, exactly as page.get_text() returns it, and (text, font size, bold, chars)
+    for each of its lines, from a single parse of the page.
+    """
+    text, lines = [], []
+    # Text-mode flags, so the text matches get_text(); image data is left out of the dict
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", ()):
+            line_text = "".join(span["text"] for span in line["spans"])
+            text.append(line_text + "\n")
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if spans:
+                bold = all(span["flags"] & _BOLD_FLAG or "bold" in span["font"].lower() for span in spans)
+                lines.append((line_text.strip(), max(span["size"] for span in spans), bold,
+                              sum(len(span["text"]) for span in spans)))
+    return "".join(text), lines
+
+
+def _pdf_layout(lines):
+    """
+    Lines set larger than the body font are "headings" and bold lines at body size are
+    "bold". Section headings are taken to be the largest size at least two lines use;
+    larger lines (the name) are headings too, while lines between body and heading size
+    (job and project titles) count as "bold".
+    """
+    sizes = Counter()
+    for _, size, _, chars in lines:
+        sizes[round(size, 1)] += chars
+    if not sizes:
+        return {"headings": [], "bold": [], "bullets": []}
+    body_size = sizes.most_common(1)[0][0]
+    # Glyph-only lines, such as bullets drawn larger than the text, say nothing about headings
+    large = Counter(round(size, 1) for text, size, _, _ in lines if size >= body_size + 1 and any(c.isalnum() for c in text))
+    heading_size = max((size for size, count in large.items() if count >= 2), default=body_size + 1)
+    headings, bold = [], []
+    for text, size, is_bold, _ in lines:
+        if not any(c.isalnum() for c in text):
+            continue
+        if round(size, 1) >= heading_size:
+            headings.append(text)
+        elif size >= body_size + 1 or is_bold:
+            bold.append(text)
+    return {"headings": headings[:_MAX_LAYOUT_LINES], "bold": bold[:_MAX_LAYOUT_LINES], "bullets": []}
+
+
+def _pdf_text(view, with_layout=True):
+    doc = fitz.open(stream=view, filetype="pdf")
+    try:
+        # page_count only reads the page tree, so this is checked before any page is parsed
+        if doc.page_count > MAX_PDF_PAGES:
+            raise UploadRejected(f"The PDF has {doc.page_count} pages; the limit is {MAX_PDF_PAGES}.")
+        pages, lines, chars = [], [], 0
+        for page in doc:
+            # The dict pass behind the layout costs about 40% more than plain text extraction
+            text, page_lines = _pdf_page(page) if with_layout else (page.get_text(), ())
+            chars += len(text)
+            if chars > MAX_TEXT_CHARS:
+                raise UploadRejected(f"The file contains more than {MAX_TEXT_CHARS:,} characters of text.")
+            pages.append(text)
+            lines.extend(page_lines)
+    finally:
+        doc.close()
+    # Running headers/footers repeat on every page; keep them once
+    return prompt_compaction.strip_page_furniture(pages), _pdf_layout(lines) if with_layout else None
+
+
+def _docx_layout(paragraphs):
+    """Heading/Title-styled paragraphs are "headings", all-bold ones "bold", list paragraphs "bullets"."""
+    layout = {"headings": [], "bold": [], "bullets": []}
+    for para in paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        style = para.style
+        style_name = (style.name or "") if style is not None else ""
+        runs = [run for run in para.runs if run.text.strip()]
+        if style_name.startswith(("Heading", "Title")):
+            layout["headings"].append(text)
+        elif runs and all(run.bold or (run.bold is None and style is not None and style.font.bold) for run in runs):
+            layout["bold"].append(text)
+        p_pr = para._p.pPr
+        if "List" in style_name or (p_pr is not None and p_pr.numPr is not None):
+            layout["bullets"].append(text)
+    return {kind: lines[:_MAX_LAYOUT_LINES] for kind, lines in layout.items()}
+
+
+def _docx_paragraphs(container):
+    """
+    Body paragraphs in reading order, including those in tables (row by row), where
+    resume templates often put the name and contact block or a skills grid.
+    """
+    for item in container.iter_inner_content():
+        if isinstance(item, docx.table.Table):
+            for row in item.rows:
+                seen = set()
+                for cell in row.cells:
+                    if id(cell._tc) not in seen:  # A merged cell is returned once per column it spans
+                        seen.add(id(cell._tc))
+                        yield from _docx_paragraphs(cell)
+        else:
+            yield item
+
+
+def _docx_text(stream, with_layout=True):
+    with zipfile.ZipFile(stream) as archive:
+        expanded = sum(info.file_size for info in archive.infolist())
+    if expanded > MAX_DOCX_UNCOMPRESSED_BYTES:
+        raise UploadRejected(f"The DOCX expands to {expanded / 1024 / 1024:.1f} MB; the limit is "
+                             f"{MAX_DOCX_UNCOMPRESSED_BYTES / 1024 / 1024:g} MB.")
+    stream.seek(0)
+    # python-docx reads the zip straight from the stream; no copy of the upload is made
+    paragraphs = list(_docx_paragraphs(docx.Document(stream)))
+    text = "\n".join(para.text for para in paragraphs)
+    if len(text) > MAX_TEXT_CHARS:
+        raise UploadRejected(f"The file contains more than {MAX_TEXT_CHARS:,} characters of text.")
+    return text, _docx_layout(paragraphs) if with_layout else None
+
+
+def extract(filename, stream):
+    """
+    Extracts text from an uploaded PDF or DOCX given its seekable stream (e.g.
+    FileStorage.stream), enforcing the byte, page and character limits as early as
+    possible. Returns an ExtractedText, or None for unsupported or unreadable files;
+    raises UploadRejected for files over a limit.
+    """
+    return _extract(filename, _stream_size(stream), lambda: _buffer_view(stream), stream)
+
+
+def extract_text(filename, stream):
+    """Same as extract, for callers that only need the text: the layout is not worked out."""
+    extracted = _extract(filename, _stream_size(stream), lambda: _buffer_view(stream), stream, with_layout=False)
+    return extracted.text if extracted else None
+
+
+def extract_text_from_bytes(filename, data):
+    """Same as extract_text for upload bytes already in memory (e.g. batch jobs)."""
+    @contextmanager
+    def bytes_view():
+        with memoryview(data) as view:
+            yield view
+    extracted = _extract(filename, len(data), bytes_view, io.BytesIO(data), with_layout=False)
+    return extracted.text if extracted else None
+
+
+def _extract(filename, size, open_view, stream, with_layout=True):
+    filename = filename.lower()
+    with profiling.trace_memory() if TRACE_MEMORY else nullcontext():
+        start = time.perf_counter()
+        extracted, rejected = None, False
+        try:
+            _check_size(size)
+            kind = "pdf" if filename.endswith(".pdf") else "docx" if filename.endswith(".docx") else None
+            if kind is None:
+                print(f"Unsupported file format: {filename}")
+                return None
+            metrics.PAYLOAD_BYTES.observe("upload", value=size)
+            with open_view() as view:
+                with metrics.stage("upload_read"):
+                    digest = _sha256(view)
+                cache_key = result_cache.make_key("extract", EXTRACTION_VERSION, kind, digest)
+                cached = extraction_cache.get(cache_key)
+                # An entry cached by a text-only caller has no layout
+                if cached is not None and len(cached["text"]) <= MAX_TEXT_CHARS and (cached["layout"] or not with_layout):
+                    extracted = ExtractedText(cached["text"], cached["candidate_name"], cached["layout"], digest, True)
+                    return extracted
+                with metrics.stage(f"{kind}_extraction"):
+                    text, layout = _pdf_text(view, with_layout) if kind == "pdf" else _docx_text(stream, with_layout)
+                metrics.PAYLOAD_BYTES.observe("extracted_text", value=len(text or ""))
+            extracted = ExtractedText(text, candidate_name_from_text(text), layout, digest, False)
+            if text and text.strip():
+                extraction_cache.set(cache_key, {"text": text, "candidate_name": extracted.candidate_name, "layout": layout},
+                                     cost_seconds=time.perf_counter() - start)
+        except UploadRejected:
+            rejected = True
+            raise
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] if TRACE_MEMORY else None
+            ingestion_stats.record(size, peak, rejected)
+            if peak is not None:
+                cached_note = " (cache hit)" if extracted and extracted.cached else ""
+                print(f"Ingested {filename}: {size} bytes in {time.perf_counter() - start:.3f}s, "
+                      f"peak Python memory {peak / 1024:.0f} KB{' (rejected)' if rejected else cached_note}")
+    return extracted
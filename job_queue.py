@@ -0,0 +1,242 @@
+# job_queue.py
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import deque
+
+
+class JobQueue:
+    """
+    A persistent job queue in SQLite with a pool of worker threads in this process.
+
+    Routes enqueue slow AI work and return a job id straight away, so web workers are free
+    for cheap requests while the call runs here. Every web process runs its own workers
+    against the shared database; a job is claimed with a lease that a heartbeat thread renews
+    while its handler runs, and a job whose process died mid-run is queued again once its
+    lease runs out (up to max_attempts times).
+
+    Handlers are registered per kind and take the job's JSON payload. A result containing
+    an "error" key marks the job failed; the result is kept either way for result_ttl seconds.
+    """
+
+    def __init__(self, path, workers=4, lease_seconds=300, max_attempts=2, result_ttl=3600, poll_interval=0.5):
+        self.path = path
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._local = threading.local()
+        self._threads = []
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "completed": 0, "failed": 0, "requeued": 0}
+        self._wait_seconds = deque(maxlen=512)
+        self._run_seconds = deque(maxlen=512)
+        self._last_maintenance = 0.0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL,
+                result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL);
+            CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def _start_workers(self):
+        if self._threads or self.workers <= 0:
+            return
+        with self._start_lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                                 for i in range(self.workers)]
+                self._threads.append(threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True))
+                for thread in self._threads:
+                    thread.start()
+
+    def enqueue(self, kind, payload):
+        """Stores a job and returns its id."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'.")
+        self._start_workers()
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, kind, json.dumps(payload), time.time()))
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+        with self._changed:
+            self._changed.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job's public state, or None for an unknown (or expired) id."""
+        self._start_workers()  # Jobs left queued by a restarted process are picked up too
+        row = self._connect().execute(
+            "SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {"id": row[0], "kind": row[1], "status": row[2], "created_at": row[5],
+               "started_at": row[6], "finished_at": row[7]}
+        if row[2] == "queued":
+            job["position"] = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?", (row[5],)).fetchone()[0]
+        if row[3] is not None:
+            job["result"] = json.loads(row[3])
+        if row[4]:
+            job["error"] = row[4]
+        return job
+
+    def wait(self, job_id, timeout):
+        """Long-polls until the job is done or failed, or timeout seconds pass. Returns get(job_id)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                return job
+            # Jobs finished by this process wake us at once; other processes' jobs are polled
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def _claim(self):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, kind, payload, created_at FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                         (now, now + self.lease_seconds, row[0]))
+        with self._stats_lock:
+            self._wait_seconds.append(now - row[3])
+        return row[0], row[1], json.loads(row[2])
+
+    def _finish(self, job_id, result, error, seconds):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+            ("failed" if error else "done", json.dumps(result) if result is not None else None, error, time.time(), job_id))
+        with self._stats_lock:
+            self._stats["failed" if error else "completed"] += 1
+            self._run_seconds.append(seconds)
+        with self._changed:
+            self._changed.notify_all()
+
+    def _maintain(self):
+        """Requeues jobs whose worker died, and deletes finished jobs past result_ttl."""
+        now = time.time()
+        if now - self._last_maintenance < min(60, self.lease_seconds):
+            return
+        self._last_maintenance = now
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET status = 'failed', error = 'The job was interrupted too many times.', finished_at = ? "
+                         "WHERE status = 'running' AND lease_until < ? AND attempts >= ?", (now, now, self.max_attempts))
+            requeued = conn.execute("UPDATE jobs SET status = 'queued', lease_until = NULL "
+                                    "WHERE status = 'running' AND lease_until < ?", (now,)).rowcount
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - self.result_ttl,))
+        if requeued:
+            print(f"Job queue: requeued {requeued} job(s) whose worker stopped responding.")
+            with self._stats_lock:
+                self._stats["requeued"] += requeued
+
+    def _heartbeat_loop(self):
+        """Extends the lease of every job this process is running, well before it runs out."""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._running_lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self._connect().execute(
+                    f"UPDATE jobs SET lease_until = ? WHERE status = 'running' AND id IN ({','.join('?' * len(running))})",
+                    (time.time() + self.lease_seconds, *running))
+            except sqlite3.Error as e:
+                print(f"Job queue database error: {e}")
+
+    def _worker_loop(self):
+        while True:
+            try:
+                self._maintain()
+                claimed = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue database error: {e}")
+                claimed = None
+            if claimed is None:
+                with self._changed:
+                    self._changed.wait(self.poll_interval)
+                continue
+
+            job_id, kind, payload = claimed
+            start = time.perf_counter()
+            with self._running_lock:
+                self._running.add(job_id)
+            try:
+                result = self._handlers[kind](payload)
+                error = result.get("error") if isinstance(result, dict) else None
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) failed: {type(e).__name__} - {e}")
+                result, error = None, f"An internal server error occurred: {e}"
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
+            self._finish(job_id, result, error, time.perf_counter() - start)
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        oldest = self._connect().execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        with self._stats_lock:
+            stats = dict(self._stats)
+            waits, runs = sorted(self._wait_seconds), sorted(self._run_seconds)
+        counts = dict(rows)
+        stats.update({
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "workers": self.workers,
+            "oldest_queued_seconds": round(time.time() - oldest, 2) if oldest else 0.0,
+            "wait_seconds": _summary(waits),
+            "run_seconds": _summary(runs),
+        })
+        return stats
+
+
+def _summary(samples):
+    if not samples:
+        return {"count": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+    return {"count": len(samples), "mean": round(sum(samples) / len(samples), 3),
+            "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3), "max": round(samples[-1], 3)}
+
+
+queue = JobQueue(
+    os.environ.get("JOB_QUEUE_DB_PATH", os.path.join(".cache", "jobs.sqlite3")),
+    workers=int(os.environ.get("JOB_QUEUE_WORKERS", 4)),
+    lease_seconds=int(os.environ.get("JOB_LEASE_SECONDS", 300)),
+    result_ttl=int(os.environ.get("JOB_RESULT_TTL_SECONDS", 3600)),
+)
@@ -0,0 +1,308 @@
+# json_repair.py
+
+import re
+import copy
+import json
+import threading
+from collections import namedtuple
+from json.decoder import JSONDecodeError
+
+import metrics
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+_TRAILING_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"$')
+_TRAILING_SCALAR_RE = re.compile(r"[\w.+-]+$")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_CLOSERS = {"{": "}", "[": "]"}
+
+# value is the parsed JSON; repairs names what had to be fixed, e.g. ("fence", "truncated")
+Repaired = namedtuple("Repaired", ["value", "repairs"])
+
+
+class RepairStats:
+    """How often Gemini output needed repair, coercion or a follow-up request for missing fields."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"parsed": 0, "clean": 0, "repaired": 0, "unrepairable": 0, "coerced_values": 0,
+                       "missing_fields": 0, "fragment_requests": 0, "fragments_filled": 0, "repairs": {}}
+
+    def record(self, key, count=1):
+        with self._lock:
+            self._stats[key] += count
+
+    def record_repairs(self, repairs):
+        with self._lock:
+            self._stats["parsed"] += 1
+            self._stats["repaired" if repairs else "clean"] += 1
+            for repair_kind in repairs:
+                self._stats["repairs"][repair_kind] = self._stats["repairs"].get(repair_kind, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, repairs=dict(self._stats["repairs"]))
+        # Each of these would otherwise have been a failed call and a full re-generation
+        stats["round_trips_avoided"] = stats["repaired"] + stats["fragments_filled"]
+        return stats
+
+
+repair_stats = RepairStats()
+
+
+def _close_structures(text):
+    """
+    Scans text once: drops trailing commas and anything after the top-level value, and
+    closes an unterminated string, array or object at the end (dropping a dangling key or
+    partial literal). Returns (fixed_text, repairs).
+    """
+    out, stack, repairs = [], [], []
+    in_string = escape = False
+    end = len(text)
+    for index, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repairs.append("trailing_comma")
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                end = index + 1
+                break
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        out.append(ch)
+    if text[end:].strip():
+        repairs.append("trailing_text")
+    if not stack and not in_string:
+        return "".join(out), repairs
+
+    repairs.append("truncated")
+    fixed = "".join(out)
+    if in_string:
+        fixed = (fixed[:-1] if escape else fixed) + '"'
+    while True:
+        fixed = fixed.rstrip()
+        if fixed.endswith(","):
+            fixed = fixed[:-1]
+        elif fixed.endswith(":"):
+            fixed = _TRAILING_STRING_RE.sub("", fixed[:-1].rstrip())  # A key with no value
+        elif stack[-1] == "{" and _TRAILING_STRING_RE.search(fixed) and \
+                _TRAILING_STRING_RE.sub("", fixed).rstrip()[-1:] in ("{", ","):
+            fixed = _TRAILING_STRING_RE.sub("", fixed)  # A key with no colon yet
+        elif _TRAILING_SCALAR_RE.search(fixed) and not _is_literal(_TRAILING_SCALAR_RE.search(fixed).group()):
+            fixed = _TRAILING_SCALAR_RE.sub("", fixed)  # e.g. "tru" or "12."
+        else:
+            break
+    return fixed + "".join(_CLOSERS[opener] for opener in reversed(stack)), repairs
+
+
+def _is_literal(token):
+    try:
+        json.loads(token)
+        return True
+    except ValueError:
+        return False
+
+
+@metrics.timed("json_parse")
+def repair(text):
+    """
+    Parses model output as JSON, repairing what it can: markdown fences, prose around the
+    object, trailing commas and truncation. Raises JSONDecodeError if it is still not JSON.
+    """
+    try:
+        value = json.loads(text)
+        repair_stats.record_repairs(())
+        return Repaired(value, ())
+    except (TypeError, ValueError):
+        pass
+
+    text, repairs = str(text or ""), []
+    if _FENCE_RE.search(text):
+        text = _FENCE_RE.sub("", text)
+        repairs.append("fence")
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        repair_stats.record("unrepairable")
+        raise JSONDecodeError("No JSON object found", text, 0)
+    if text[:start].strip():
+        repairs.append("leading_text")
+    fixed, closing_repairs = _close_structures(text[start:])
+    repairs.extend(closing_repairs)
+    try:
+        value = json.loads(fixed)
+    except JSONDecodeError:
+        repair_stats.record("unrepairable")
+        raise
+    repairs = tuple(dict.fromkeys(repairs))
+    repair_stats.record_repairs(repairs)
+    return Repaired(value, repairs)
+
+
+def merge(base, fragment):
+    """Deep-merges a fragment of fields into base (dicts merge, anything else is replaced)."""
+    if not isinstance(base, dict) or not isinstance(fragment, dict):
+        return copy.deepcopy(fragment)
+    merged = dict(base)
+    for key, value in fragment.items():
+        merged[key] = merge(base[key], value) if key in base else copy.deepcopy(value)
+    return merged
+
+
+# --- Schemas ---
+_MISSING = object()
+
+
+def _coerce_integer(value, spec):
+    if isinstance(value, bool):
+        return _MISSING
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        text = str(value).strip()
+        match = _NUMBER_RE.search(text)
+        if not match:
+            return _MISSING
+        number = float(match.group())
+        scale = re.search(r"/\s*(\d+)", text[match.end():])
+        if scale and float(scale.group(1)) > 0 and "max" in spec:
+            number = number / float(scale.group(1)) * spec["max"]  # "8/10" on a 0-100 scale
+    number = int(round(number))
+    if "min" in spec:
+        number = max(spec["min"], number)
+    if "max" in spec:
+        number = min(spec["max"], number)
+    return number
+
+
+def _coerce_string(value, spec):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return " ".join(value)
+    return _MISSING
+
+
+def _compile(spec):
+    """Turns a spec into check(value, path, state), which returns the coerced value or _MISSING."""
+    kind = spec.get("type", "any")
+    if kind == "object":
+        fields = [(name, field_spec, _compile(field_spec)) for name, field_spec in spec.get("fields", {}).items()]
+
+        def check(value, path, state):
+            if not isinstance(value, dict):
+                return _MISSING
+            result = dict(value)
+            for name, field_spec, check_field in fields:
+                field_path = f"{path}.{name}" if path else name
+                checked = check_field(value[name], field_path, state) if name in value else _MISSING
+                if checked is not _MISSING:
+                    result[name] = checked
+                elif "default" in field_spec:
+                    result[name] = copy.deepcopy(field_spec["default"])
+                    state["coerced"] += name in value
+                else:
+                    result.pop(name, None)
+                    state["missing"].append(field_path)
+            return result
+        return check
+
+    if kind == "array":
+        check_item = _compile(spec.get("items", {}))
+        item_kind = spec.get("items", {}).get("type", "any")
+
+        def check(value, path, state):
+            if isinstance(value, str) and item_kind == "string":
+                state["coerced"] += 1
+                return [value] if value.strip() else []
+            if not isinstance(value, list):
+                return _MISSING
+            items = []
+            for index, item in enumerate(value):
+                checked = check_item(item, f"{path}[{index}]", state) if item is not None else _MISSING
+                if checked is _MISSING:
+                    state["coerced"] += 1  # Unusable items are dropped
+                else:
+                    items.append(checked)
+            return items
+        return check
+
+    coerce = {"integer": _coerce_integer, "string": _coerce_string}.get(kind)
+
+    def check(value, path, state):
+        if value is None or coerce is None:
+            return _MISSING if value is None else value
+        checked = coerce(value, spec)
+        if checked is not _MISSING and checked != value:
+            state["coerced"] += 1
+        return checked
+    return check
+
+
+class Schema:
+    """
+    A compiled validator for one JSON shape. Specs are nested dicts:
+    {"type": "object", "fields": {...}}, {"type": "array", "items": {...}}, {"type": "string"},
+    {"type": "integer", "min": 0, "max": 100} or {"type": "any"}, each with an optional
+    "default" (used when the field is missing or unusable, instead of reporting it) and
+    "hint" (the placeholder shown when Gemini is asked for the field).
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._check = _compile(spec)
+
+    def validate(self, value):
+        """
+        Coerces value to the schema (e.g. "85%" -> 85, a string -> [string]). Returns
+        (value, missing): missing lists the dotted paths of required fields that are
+        absent or could not be coerced.
+        """
+        state = {"missing": [], "coerced": 0}
+        checked = self._check(value, "", state)
+        if checked is _MISSING:
+            checked = self._check({}, "", state)
+        repair_stats.record("coerced_values", state["coerced"])
+        repair_stats.record("missing_fields", len(state["missing"]))
+        return checked, state["missing"]
+
+    def skeleton(self, paths):
+        """The JSON structure for just the given paths, with hints as values, for a follow-up prompt."""
+        skeleton = {}
+        for path in paths:
+            if "[" in path:
+                continue  # Array items always have defaults
+            spec, target = self.spec, skeleton
+            names = path.split(".")
+            for name in names[:-1]:
+                spec = spec["fields"][name]
+                target = target.setdefault(name, {})
+            target[names[-1]] = _example(spec["fields"][names[-1]])
+        return skeleton
+
+
+def _example(spec):
+    if "hint" in spec:
+        return spec["hint"]
+    if spec.get("type") == "object":
+        return {name: _example(field_spec) for name, field_spec in spec.get("fields", {}).items()}
+    if spec.get("type") == "array":
+        return [_example(spec.get("items", {}))]
+    return f"[{spec.get('type', 'any')}]"
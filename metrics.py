@@ -0,0 +1,245 @@
+# metrics.py
+
+import math
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+import profiling
+
+# Seconds: covers sub-millisecond parsing up to multi-minute Gemini calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Bytes or characters, 1 KB to 32 MB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(9))
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {labels}")
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, *labels):
+        """Counts the block as in progress while it runs."""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _render_series(self, labels, series):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            le = _format_labels(self.label_names, labels, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        label_text = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{label_text} {series['count']}")
+        return lines
+
+    def render(self):
+        with self._lock:
+            items = [(labels, dict(series, counts=list(series["counts"]))) for labels, series in sorted(self._values.items())]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in items:
+            lines.extend(self._render_series(labels, series))
+        return lines
+
+
+class Registry:
+    """
+    Metrics for the Prometheus text exposition format served at /metrics.
+
+    Values are per process: under gunicorn each worker reports its own, so scrape them
+    through a per-worker port or sum them in the query. Collectors are called at scrape
+    time for numbers other modules already keep (cache, queue and client stats).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, collect):
+        """collect() returns extra metrics (e.g. a Gauge filled in on the spot) to render with each scrape."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        for collect in collectors:
+            try:
+                metrics.extend(collect())
+            except Exception as e:
+                print(f"Metrics collector failed: {type(e).__name__} - {e}")
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "resume_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_ERRORS = registry.counter(
+    "resume_stage_errors_total", "Exceptions raised by pipeline stages, by exception type.", ("stage", "type"))
+PAYLOAD_BYTES = registry.histogram(
+    "resume_payload_bytes", "Sizes of uploads, extracted text, Gemini responses and rendered files.", ("kind",), SIZE_BUCKETS)
+GEMINI_TOKENS = registry.histogram(
+    "resume_gemini_tokens", "Estimated Gemini prompt and response tokens per call.", ("mode", "direction"), TOKEN_BUCKETS)
+GEMINI_SECONDS = registry.histogram(
+    "resume_gemini_call_seconds", "Gemini call latency by mode and routed model.", ("mode", "model", "outcome"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "resume_http_requests_in_flight", "Requests currently being handled, by endpoint.", ("endpoint",))
+HTTP_REQUESTS = registry.counter(
+    "resume_http_requests_total", "Requests handled, by endpoint and status code.", ("endpoint", "method", "status"))
+HTTP_SECONDS = registry.histogram(
+    "resume_http_request_seconds", "Request latency until the response is returned, by endpoint.", ("endpoint",))
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as a pipeline stage (and as a span when the request is being profiled);
+    an exception is counted by type and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        with profiling.span(name):
+            yield
+    except Exception as e:
+        STAGE_ERRORS.inc(name, type(e).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(name, value=time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def stats_gauge(name, help_text, stats):
+    """
+    A gauge with one series per numeric leaf of a nested stats dict (like /cache/stats),
+    labelled by its top-level component and the dotted path below it.
+    """
+    gauge = Gauge(name, help_text, ("component", "stat"))
+
+    def walk(component, prefix, value):
+        if isinstance(value, bool):
+            gauge.set(component, prefix, value=int(value))
+        elif isinstance(value, (int, float)):
+            gauge.set(component, prefix, value=value)
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                walk(component, f"{prefix}.{key}" if prefix else str(key), child)
+
+    for component, value in stats.items():
+        walk(component, "", value)
+    return gauge
@@ -0,0 +1,136 @@
+# model_router.py
+
+import os
+import threading
+from collections import namedtuple
+
+import prompt_compaction
+import resilience
+
+QUALITY_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-pro")
+FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "gemini-1.5-flash")
+
+# Which tier each mode prefers. Restructuring and title-targeted rewrites do not need
+# pro; scoring and JD-tailored rewrites do. Override per mode with GEMINI_MODEL_<MODE>
+# set to "fast", "quality" or a model name.
+MODE_TIERS = {
+    "analyze": "quality",
+    "reanalyze": "quality",
+    "reanalyze_incremental": "quality",
+    "rewrite": "quality",
+    "job_title": "fast",
+    "reformat": "fast",
+}
+
+# End-to-end latency target per mode, in seconds (GEMINI_SLO_<MODE>_SECONDS)
+DEFAULT_SLO_SECONDS = {
+    "analyze": 30, "reanalyze": 30, "reanalyze_incremental": 20,
+    "rewrite": 60, "job_title": 40, "reformat": 20,
+}
+
+# Prompt size buckets, in estimated tokens: latency is tracked per model and bucket,
+# since a long resume and JD take noticeably longer than a short one.
+TOKEN_BUCKETS = ((2000, "small"), (8000, "medium"), (float("inf"), "large"))
+
+# model is the Gemini model name; reason is "mode" (the mode's preferred model), "slo"
+# (moved to the fast model because the preferred one is missing the SLO) or "probe"
+# (sent to the preferred model anyway, so its latency numbers stay current)
+Route = namedtuple("Route", ["mode", "model", "reason", "tokens", "bucket"])
+
+
+def token_bucket(tokens):
+    return next(name for limit, name in TOKEN_BUCKETS if tokens < limit)
+
+
+class ModelRouter:
+    """
+    Picks the Gemini model for each call from its mode, prompt size and latency SLO.
+
+    Each mode has a preferred model. A call whose preferred model's recent p95 latency
+    for prompts of that size misses the mode's SLO goes to the fast model instead, as
+    long as the fast model is meeting it (or has too few samples to say); every
+    probe_every-th such call still goes to the preferred model to see whether it has
+    recovered. Every decision and every call's latency is recorded per model, so the
+    policy can be tuned against production numbers in /cache/stats.
+    """
+
+    def __init__(self, quality_model=QUALITY_MODEL, fast_model=FAST_MODEL, mode_models=None, slo_seconds=None, min_samples=20, probe_every=10):
+        self.quality_model = quality_model
+        self.fast_model = fast_model
+        self.mode_models = mode_models or {}
+        self.slo_seconds = dict(DEFAULT_SLO_SECONDS, **(slo_seconds or {}))
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self._rerouted = 0
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._models = {}
+        self._decisions = {}
+
+    def preferred(self, mode):
+        """The model a mode uses when its SLO is being met; also part of its cache key."""
+        choice = self.mode_models.get(mode) or MODE_TIERS.get(mode, "quality")
+        return {"fast": self.fast_model, "quality": self.quality_model}.get(choice, choice)
+
+    def _window(self, model, bucket):
+        with self._lock:
+            key = (model, bucket)
+            if key not in self._latency:
+                self._latency[key] = resilience.LatencyWindow(min_samples=self.min_samples)
+            return self._latency[key]
+
+    def route(self, mode, prompt):
+        """Chooses the model for one call and records the decision."""
+        tokens = prompt_compaction.estimate_tokens(prompt)
+        bucket = token_bucket(tokens)
+        model, reason = self.preferred(mode), "mode"
+        slo = self.slo_seconds.get(mode)
+        if slo and model != self.fast_model:
+            slow = self._window(model, bucket).percentile(95)
+            fast = self._window(self.fast_model, bucket).percentile(95)
+            if slow is not None and slow > slo and (fast is None or fast <= slo):
+                with self._lock:
+                    self._rerouted += 1
+                    probe = self.probe_every and self._rerouted % self.probe_every == 0
+                model, reason = (model, "probe") if probe else (self.fast_model, "slo")
+        with self._lock:
+            decisions = self._decisions.setdefault(mode, {})
+            decisions[f"{model}:{reason}"] = decisions.get(f"{model}:{reason}", 0) + 1
+        return Route(mode, model, reason, tokens, bucket)
+
+    def record(self, route, seconds, ok=True):
+        """Records how a routed call went. Failures that took time (e.g. timeouts) still count towards latency."""
+        if seconds is not None:
+            self._window(route.model, route.bucket).record(seconds)
+        slo = self.slo_seconds.get(route.mode)
+        with self._lock:
+            entry = self._models.setdefault(route.model, {"calls": 0, "errors": 0, "slo_misses": 0, "tokens": 0})
+            entry["calls"] += 1
+            entry["errors"] += not ok
+            entry["slo_misses"] += bool(slo and seconds is not None and seconds > slo)
+            entry["tokens"] += route.tokens
+
+    def stats(self):
+        with self._lock:
+            models = {model: dict(entry) for model, entry in self._models.items()}
+            decisions = {mode: dict(counts) for mode, counts in self._decisions.items()}
+            windows = dict(self._latency)
+        for model, entry in models.items():
+            entry["avg_tokens"] = round(entry["tokens"] / entry["calls"]) if entry["calls"] else 0
+            entry["latency"] = {bucket: windows[(name, bucket)].stats() for name, bucket in windows if name == model}
+        return {
+            "preferred": {mode: self.preferred(mode) for mode in MODE_TIERS},
+            "slo_seconds": dict(self.slo_seconds),
+            "decisions": decisions,
+            "models": models,
+        }
+
+
+def from_env():
+    """A ModelRouter configured from GEMINI_MODEL_<MODE> and GEMINI_SLO_<MODE>_SECONDS."""
+    mode_models = {mode: os.environ[f"GEMINI_MODEL_{mode.upper()}"] for mode in MODE_TIERS
+                   if os.environ.get(f"GEMINI_MODEL_{mode.upper()}")}
+    slo_seconds = {mode: float(os.environ[f"GEMINI_SLO_{mode.upper()}_SECONDS"]) for mode in DEFAULT_SLO_SECONDS
+                   if os.environ.get(f"GEMINI_SLO_{mode.upper()}_SECONDS")}
+    return ModelRouter(mode_models=mode_models, slo_seconds=slo_seconds,
+                       min_samples=int(os.environ.get("GEMINI_ROUTING_MIN_SAMPLES", 20)))
@@ -1,18 +1,22 @@
 # pdf_analyzer.py (renamed from resume_analyzer.py for clarity)
 
 import os
+import time
 import argparse
-import json
 from datetime import datetime, timezone
 import fitz  # PyMuPDF
 import google.generativeai as genai # MODIFIED: Import Gemini
 from dotenv import load_dotenv
+import json_repair
+import model_router
 
 # --- 1. SETUP: LOAD API KEY ---
 load_dotenv()
 
 # --- MODIFIED: Gemini Client Initialization ---
-model = None
+# The model is picked per call by the same routing policy as the main app (see model_router)
+router = model_router.from_env()
+models = {}
 try: 
     # Use the same environment variable as the main app
     gemini_key = os.environ.get("GEMINI_API_KEY")
@@ -20,13 +24,16 @@ try:
         print("Error: GEMINI_API_KEY not found in .env file.")
     else:
         genai.configure(api_key=gemini_key)
-        # Using a more powerful model for high-quality standalone analysis
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        print("Gemini model 'gemini-1.5-pro' initialized successfully.")
+        print("Gemini client configured successfully.")
 except Exception as e:
     print(f"Error initializing Gemini client: {e}")
 # --- END MODIFICATION ---
 
+def get_model(name):
+    if name not in models:
+        models[name] = genai.GenerativeModel(name)
+    return models[name]
+
 # --- PASTE YOUR JOB DESCRIPTION HERE ---
 JOB_DESCRIPTION_TEXT = """
 --- JOB DESCRIPTION ---
@@ -73,7 +80,7 @@ def analyze_resume_with_gemini(resume_text, jd_text):
     """
     Sends resume and JD to Gemini for analysis and returns structured JSON.
     """
-    if not model:
+    if not os.environ.get("GEMINI_API_KEY"):
         print("Gemini model not available. Cannot perform analysis.")
         return None
 
@@ -102,15 +109,21 @@ def analyze_resume_with_gemini(resume_text, jd_text):
         '- "suggested_changes": A list of specific, actionable suggestions for the candidate to improve their resume for this specific job. For example, "Quantify your achievement in Project X by adding metrics..." or "Add a \'Cloud Technologies\' section and mention your AWS experience more prominently."'
     )
 
+    route = router.route("analyze", full_prompt)
+    start = time.perf_counter()
     try:
-        response = model.generate_content(full_prompt, generation_config=generation_config)
+        response = get_model(route.model).generate_content(full_prompt, generation_config=generation_config)
         
         # Access response differently for Gemini
         response_content = response.text
-        print("✅ Analysis received from Gemini.")
-        return json.loads(response_content)
+        elapsed = time.perf_counter() - start
+        router.record(route, elapsed)
+        print(f"✅ Analysis received from {route.model} in {elapsed:.1f}s.")
+        # Tolerates fences, trailing commas and a cut-off response
+        return json_repair.repair(response_content).value
 
     except Exception as e:
+        router.record(route, time.perf_counter() - start, ok=False)
         print(f"An error occurred with the Gemini API call: {e}")
         return None
 
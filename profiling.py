@@ -0,0 +1,245 @@
+# profiling.py
+
+import io
+import os
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import inspect
+import functools
+import threading
+import tracemalloc
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Fraction of requests profiled without asking (0 disables sampling)
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+# What sampled requests capture: "spans", or a comma list adding "cpu" and/or "memory"
+SAMPLE_CAPTURE = os.environ.get("PROFILE_SAMPLE_CAPTURE", "spans")
+# Requests slower than this are kept with their spans even when not sampled (0 disables)
+SLOW_REQUEST_MS = float(os.environ.get("PROFILE_SLOW_REQUEST_MS", 2000))
+# Lets a client ask for a profile with "X-Profile: spans,cpu,memory"; off by default,
+# since cProfile and tracemalloc slow the request (and everyone else's) down
+HEADER_ENABLED = os.environ.get("PROFILE_HEADER_ENABLED", "0") != "0"
+HEADER_NAME = "X-Profile"
+BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", 50))
+MAX_SPANS = 500  # Per request, so a loop over many items cannot grow a trace without bound
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+_current = contextvars.ContextVar("profiling_trace", default=None)
+
+
+class Trace:
+    """The spans, and optionally a cProfile and tracemalloc snapshot, of one request."""
+
+    def __init__(self, name, reason, capture=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.reason = reason
+        self.capture = set(capture)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.root = {"name": name, "start_ms": 0.0, "duration_ms": None, "children": []}
+        self.stack = [self.root]
+        self.span_count = 0
+        self.profiler = None
+        self.memory_before = None
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+
+class _Tracemalloc:
+    """
+    Reference-counts tracemalloc, which is process-wide, across concurrently profiled requests
+    and anything else tracing memory (e.g. INGESTION_TRACE_MEMORY), so none stops it under another.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started = False
+
+    def acquire(self):
+        """Returns True when the caller is the only user, i.e. may reset the shared peak."""
+        with self._lock:
+            self._users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            return self._users == 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._started:
+                tracemalloc.stop()
+                self._started = False
+
+
+_tracemalloc = _Tracemalloc()
+
+
+@contextmanager
+def trace_memory():
+    """
+    Keeps tracemalloc on for the block without stopping it under a concurrent memory
+    profile. The peak is reset on entry only when nothing else is tracing.
+    """
+    if _tracemalloc.acquire():
+        tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _tracemalloc.release()
+
+
+class ProfileBuffer:
+    """The most recent captured traces, oldest dropped first."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._stats = {"traced": 0, "captured": 0, "slow": 0, "sampled": 0, "requested": 0}
+
+    def count(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+            self._stats["captured"] += 1
+            self._stats[record["reason"]] += 1
+
+    def list(self):
+        """Summaries, newest first."""
+        with self._lock:
+            records = list(self._records)
+        return [{key: record[key] for key in ("id", "reason", "method", "path", "status", "duration_ms", "started_at", "capture")}
+                for record in reversed(records)]
+
+    def get(self, trace_id):
+        with self._lock:
+            return next((record for record in self._records if record["id"] == trace_id), None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, buffered=len(self._records), buffer_size=self._records.maxlen,
+                        sample_rate=SAMPLE_RATE, slow_request_ms=SLOW_REQUEST_MS, header_enabled=HEADER_ENABLED)
+
+
+profiles = ProfileBuffer()
+
+
+def _parse_capture(value):
+    parts = {part.strip().lower() for part in str(value or "").split(",") if part.strip()}
+    if "all" in parts:
+        return {"spans", "cpu", "memory"}
+    return (parts & {"cpu", "memory"}) | {"spans"}
+
+
+def start_request(name, header_value=None):
+    """
+    Starts tracing the current request if it asked for it, was sampled, or could turn out
+    slow enough to keep. Returns the Trace, or None when this request is not traced at all.
+    """
+    if HEADER_ENABLED and header_value:
+        reason, capture = "requested", _parse_capture(header_value)
+    elif SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        reason, capture = "sampled", _parse_capture(SAMPLE_CAPTURE)
+    elif SLOW_REQUEST_MS > 0:
+        reason, capture = "slow", {"spans"}  # Spans are cheap enough to record for every request
+    else:
+        _current.set(None)  # Worker threads are reused; never inherit the previous request's trace
+        return None
+    trace = Trace(name, reason, capture)
+    if "memory" in capture:
+        _tracemalloc.acquire()
+        trace.memory_before = tracemalloc.take_snapshot()
+    if "cpu" in capture:
+        trace.profiler = cProfile.Profile()
+        trace.profiler.enable()
+    _current.set(trace)
+    profiles.count("traced")
+    return trace
+
+
+def finish_request(trace, method="", path="", status=None):
+    """Stops tracing and keeps the trace if it was requested, sampled or slow. Returns its id if kept."""
+    _current.set(None)
+    if trace is None:
+        return None
+    duration_ms = trace.elapsed_ms()
+    trace.root["duration_ms"] = round(duration_ms, 3)
+    record = {"id": trace.id, "reason": trace.reason, "method": method, "path": path, "status": status,
+              "duration_ms": round(duration_ms, 1), "started_at": trace.started_at,
+              "capture": sorted(trace.capture), "spans": trace.root, "span_count": trace.span_count}
+    if trace.profiler is not None:
+        trace.profiler.disable()
+    # Snapshot before formatting the CPU profile, so its allocations are not reported as the request's
+    if trace.memory_before is not None:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _tracemalloc.release()
+        record["memory"] = {
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top_allocations": [str(diff) for diff in after.compare_to(trace.memory_before, "lineno")[:TOP_ALLOCATIONS]],
+        }
+    if trace.profiler is not None:
+        out = io.StringIO()
+        pstats.Stats(trace.profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        record["cpu_profile"] = out.getvalue()
+    if trace.reason == "slow" and duration_ms < SLOW_REQUEST_MS:
+        return None
+    profiles.add(record)
+    return trace.id
+
+
+@contextmanager
+def span(name):
+    """Records a nested span in the current request's trace; costs almost nothing when not tracing."""
+    trace = _current.get()
+    if trace is None or trace.span_count >= MAX_SPANS:
+        yield
+        return
+    trace.span_count += 1
+    node = {"name": name, "start_ms": round(trace.elapsed_ms(), 3), "duration_ms": None, "children": []}
+    trace.stack[-1]["children"].append(node)
+    trace.stack.append(node)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        node["error"] = type(e).__name__
+        raise
+    finally:
+        node["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        # Generators can close spans out of order; remove this one wherever it is
+        if trace.stack[-1] is node:
+            trace.stack.pop()
+        elif node in trace.stack:
+            trace.stack.remove(node)
+
+
+def traced(name=None):
+    """Decorator that wraps a function (or the whole iteration of a generator function) in a span."""
+    def decorate(func):
+        span_name = name or func.__name__
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with span(span_name):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
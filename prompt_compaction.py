@@ -0,0 +1,124 @@
+# prompt_compaction.py
+
+import re
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter
+
+_ZERO_WIDTH_RE = re.compile("[​‌‍⁠﻿­]")
+_BULLET_RE = re.compile(r"^[•‣▪●◦■□⁃∙➢✓✔*]+\s*")
+_SPACES_RE = re.compile(r"[ \t\f\v]+")
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?[-–(]?\s*\d{1,3}\s*(?:(?:/|of)\s*\d{1,3})?\s*[-–)]?$", re.I)
+_TOKEN_WORD_RE = re.compile(r"\w+")
+_TOKEN_PUNCT_RE = re.compile(r"[^\w\s]")
+_TOKEN_GAP_RE = re.compile(r"\s{2,}")
+
+
+def normalize_text(text):
+    """
+    Cleans extracted resume or JD text before it goes into a prompt: folds ligatures and
+    odd Unicode (NFKC), unifies bullet glyphs to "- ", collapses runs of spaces, drops
+    page-number lines, and collapses repeated adjacent lines and runs of blank lines.
+    """
+    text = unicodedata.normalize("NFKC", str(text or ""))
+    text = _ZERO_WIDTH_RE.sub("", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines, previous, blank = [], None, False
+    for line in text.split("\n"):
+        line = _SPACES_RE.sub(" ", line).strip()
+        line = _BULLET_RE.sub("- ", line)
+        if not line:
+            blank = bool(lines)
+            continue
+        if _PAGE_NUMBER_RE.match(line) or line == previous:
+            continue
+        if blank:
+            lines.append("")
+            blank = False
+        lines.append(line)
+        previous = line
+    return "\n".join(lines)
+
+
+def strip_page_furniture(page_texts, edge_lines=3):
+    """
+    Removes running headers and footers from per-page PDF text: a line that appears near
+    the top or bottom of at least half the pages (and at least two) is kept on the first
+    page only. Returns the page texts joined, like "".join(page_texts).
+    """
+    if len(page_texts) < 2:
+        return "".join(page_texts)
+    edges = Counter()
+    for text in page_texts:
+        # Bullet glyphs and rules repeat on every page too, but they are content
+        lines = [line.strip() for line in text.splitlines() if any(c.isalnum() for c in line)]
+        edges.update(set(lines[:edge_lines] + lines[-edge_lines:]))
+    furniture = {line for line, count in edges.items() if count >= max(2, len(page_texts) / 2)}
+    if not furniture:
+        return "".join(page_texts)
+    kept = [page_texts[0]]
+    for text in page_texts[1:]:
+        kept.append("".join(line for line in text.splitlines(keepends=True) if line.strip() not in furniture))
+    return "".join(kept)
+
+
+def dump_json(obj, compact=True):
+    """JSON for embedding in a prompt; compact drops the indentation and separator spaces."""
+    if compact:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return json.dumps(obj, indent=2)
+
+
+def squeeze_prompt(prompt):
+    """Strips the source-code indentation of prompt templates and collapses blank-line runs."""
+    lines, blank = [], False
+    for line in prompt.split("\n"):
+        line = line.strip()
+        if not line:
+            blank = bool(lines)
+            continue
+        if blank:
+            lines.append("")
+            blank = False
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def estimate_tokens(text):
+    """
+    Approximate input token count without an API call: about one token per four
+    characters of a word, one per punctuation mark and one per run of whitespace.
+    """
+    text = str(text or "")
+    words = sum(math.ceil(len(word) / 4) for word in _TOKEN_WORD_RE.findall(text))
+    return words + len(_TOKEN_PUNCT_RE.findall(text)) + len(_TOKEN_GAP_RE.findall(text))
+
+
+class CompactionStats:
+    """Estimated prompt tokens before and after compaction, per mode."""
+
+    def __init__(self):
+        self._modes = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode, raw_prompt, compact_prompt):
+        before, after = estimate_tokens(raw_prompt), estimate_tokens(compact_prompt)
+        with self._lock:
+            entry = self._modes.setdefault(mode, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+            entry["calls"] += 1
+            entry["tokens_before"] += before
+            entry["tokens_after"] += after
+        return before, after
+
+    def stats(self):
+        with self._lock:
+            modes = {mode: dict(entry) for mode, entry in self._modes.items()}
+        for entry in modes.values():
+            before = entry["tokens_before"]
+            entry["reduction"] = round(1 - entry["tokens_after"] / before, 3) if before else 0.0
+            entry["avg_tokens_after"] = round(entry["tokens_after"] / entry["calls"])
+        return modes
+
+
+compaction_stats = CompactionStats()
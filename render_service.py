@@ -0,0 +1,181 @@
+# render_service.py
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource  # Unix only; memory caps are skipped elsewhere
+except ImportError:
+    resource = None
+
+import metrics
+from result_cache import MemoryLRU, make_key
+
+# Part of every rendered-file cache key and ETag. Bump it whenever the PDF/DOCX
+# layout or the logos change, so browsers and the cache stop reusing old files.
+RENDERER_VERSION = "1"
+
+# Pool processes come from a forkserver (spawn where there is none): forking the web process,
+# which already runs the Gemini loop, job workers and session GC threads, can deadlock the
+# child on a lock one of those threads held at the time.
+POOL_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+class RenderError(Exception):
+    """A render job failed inside the pool (crash, memory cap, or pool restart)."""
+
+
+class RenderTimeout(RenderError):
+    """A render job did not finish within its deadline."""
+
+
+def _init_worker(memory_limit_mb):
+    """Runs once per pool process: caps its memory and warms fonts and logos."""
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    import analyzer_logic  # noqa: F401 - imports assets, so logos are decoded before the first job
+    import text_layout
+    text_layout.get_metrics(analyzer_logic.FONT_NAME_REGULAR)
+
+
+def _render(file_format, resume_json, company):
+    import analyzer_logic
+    if file_format == 'docx':
+        return analyzer_logic.create_docx(resume_json, company).getvalue()
+    return analyzer_logic.create_pdf_with_logo(resume_json, company).getvalue()
+
+
+class RenderService:
+    """
+    Renders PDFs and DOCX files in a warm pool of worker processes.
+
+    Rendering holds the GIL for the whole layout, so running it in the web process
+    serializes concurrent downloads; the pool lets them scale with cores. A job that
+    crashes or hits the memory cap only takes down its pool worker. A job that misses
+    its deadline causes the pool to be recycled, since a busy process cannot be
+    interrupted any other way; other jobs running at that moment fail with RenderError.
+
+    With workers=0 everything renders inline in the calling thread.
+
+    Finished files are kept in an LRU bounded by cache_max_bytes (0 disables it), keyed
+    by artifact_key(), so repeated downloads of the same resume skip the renderer.
+    """
+
+    def __init__(self, workers=2, timeout=30.0, memory_limit_mb=1024, cache_max_entries=256, cache_max_bytes=64 * 1024 * 1024):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._pool = None
+        self._lock = threading.Lock()
+        self._artifacts = MemoryLRU(cache_max_entries, cache_max_bytes) if cache_max_bytes else None
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "pool_restarts": 0,
+                       "cache_hits": 0, "cache_misses": 0}
+
+    def _count(self, field):
+        with self._stats_lock:
+            self._stats[field] += 1
+
+    def _get_pool(self):
+        # Created on first use: batch_analyzer and the benchmarks import this module without
+        # rendering anything, and should not start a forkserver and its worker processes
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=POOL_CONTEXT, initializer=_init_worker, initargs=(self.memory_limit_mb,))
+            return self._pool
+
+    def _restart_pool(self, broken_pool):
+        with self._lock:
+            if self._pool is not broken_pool:
+                return  # Another thread already replaced it
+            self._pool = None
+        self._count("pool_restarts")
+        # Kill the stuck or crashed processes; shutdown() alone would wait for them
+        for process in list((getattr(broken_pool, "_processes", None) or {}).values()):
+            process.kill()
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def artifact_key(file_format, resume_json, company):
+        """Canonical hash of everything that determines the rendered file; also used as its ETag."""
+        return make_key("render", RENDERER_VERSION, file_format, company, resume_json)
+
+    def render(self, file_format, resume_json, company, timeout=None, key=None):
+        """
+        Returns the file bytes, from the rendered-file cache when possible.
+        key is artifact_key() for these arguments, if the caller already computed it.
+        Raises RenderTimeout, RenderError, or the renderer's own exception (e.g. FileNotFoundError).
+        """
+        if self._artifacts is None:
+            return self._render_uncached(file_format, resume_json, company, timeout)
+        key = key or self.artifact_key(file_format, resume_json, company)
+        cached = self._artifacts.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached
+        self._count("cache_misses")
+        result = self._render_uncached(file_format, resume_json, company, timeout)
+        self._artifacts.set(key, result)
+        return result
+
+    def _render_uncached(self, file_format, resume_json, company, timeout=None):
+        # Timed here in the web process: the pool workers' own metrics would never be scraped
+        with metrics.stage(f"{file_format}_render"):
+            result = self._render_in_pool(file_format, resume_json, company, timeout)
+        metrics.PAYLOAD_BYTES.observe(f"{file_format}_file", value=len(result))
+        return result
+
+    def _render_in_pool(self, file_format, resume_json, company, timeout=None):
+        if self.workers <= 0:
+            self._count("submitted")
+            result = _render(file_format, resume_json, company)
+            self._count("completed")
+            return result
+
+        pool = self._get_pool()
+        try:
+            self._count("submitted")
+            future = pool.submit(_render, file_format, resume_json, company)
+            result = future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            self._count("timeouts")
+            self._restart_pool(pool)
+            raise RenderTimeout(f"Rendering took longer than {timeout or self.timeout:g} seconds.")
+        except BrokenProcessPool:
+            self._count("failed")
+            self._restart_pool(pool)
+            raise RenderError("The renderer crashed while building this file.")
+        except MemoryError:
+            self._count("failed")
+            raise RenderError("The renderer ran out of memory while building this file.")
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("completed")
+        return result
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["workers"] = self.workers
+        lookups = stats["cache_hits"] + stats["cache_misses"]
+        stats["cache_hit_rate"] = round(stats["cache_hits"] / lookups, 3) if lookups else 0.0
+        stats["cache_entries"] = len(self._artifacts) if self._artifacts is not None else 0
+        stats["cache_bytes"] = self._artifacts.total_bytes if self._artifacts is not None else 0
+        return stats
+
+
+renderer = RenderService(
+    workers=int(os.environ.get("RENDER_POOL_WORKERS", min(4, os.cpu_count() or 1))),
+    timeout=float(os.environ.get("RENDER_TIMEOUT_SECONDS", 30)),
+    # Address space, not RSS: a warm forkserver worker maps about 285 MB and stayed under
+    # 300 MB rendering a 27-page resume, so 1024 MB only stops a runaway render
+    memory_limit_mb=int(os.environ.get("RENDER_MEMORY_LIMIT_MB", 1024)),
+    cache_max_entries=int(os.environ.get("RENDER_CACHE_MAX_ENTRIES", 256)),
+    cache_max_bytes=int(float(os.environ.get("RENDER_CACHE_MAX_MB", 64)) * 1024 * 1024),
+)
@@ -0,0 +1,135 @@
+# resilience.py
+
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+# HTTP statuses worth retrying: rate limits, overload and gateway/upstream timeouts
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while its circuit breaker is open."""
+
+
+def is_transient(error):
+    """True for errors a retry can fix: timeouts, dropped connections and 408/429/5xx responses."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        return int(getattr(error, "code", None)) in TRANSIENT_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Exponential backoff with full jitter, so retries from many workers do not arrive in lockstep."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for percentiles such as the hedging delay."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """The pct-th percentile in seconds, or None until min_samples calls have been seen."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, self.min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))]
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        stats = {"samples": len(samples)}
+        for pct in (50, 95, 99):
+            value = samples[min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))] if samples else None
+            stats[f"p{pct}_ms"] = round(value * 1000, 1) if value is not None else None
+        return stats
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing upstream so requests fail fast instead of queueing on it.
+
+    - closed: calls pass; failure_threshold consecutive failures open the circuit.
+    - open: calls are rejected until reset_timeout seconds have passed.
+    - half_open: a single probe call is let through; its success closes the circuit,
+      its failure opens it again for another reset_timeout.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"trips": 0, "rejected": 0}
+
+    def _refresh(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state, self._probing = self.HALF_OPEN, False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def is_open(self):
+        """True while calls would be rejected, i.e. the upstream is known to be degraded."""
+        with self._lock:
+            self._refresh()
+            return self._state == self.OPEN or (self._state == self.HALF_OPEN and self._probing)
+
+    def allow(self):
+        """Whether a new call may go upstream now. A rejected call is counted."""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state, self._failures, self._probing = self.CLOSED, 0, False
+
+    def release(self):
+        """Ends a call whose outcome is unknown (e.g. abandoned by the caller) without judging the upstream."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state, self._opened_at, self._probing = self.OPEN, self._clock(), False
+                self._stats["trips"] += 1
+                print(f"Circuit breaker opened after {self._failures} consecutive failure(s); "
+                      f"failing fast for {self.reset_timeout:g}s.")
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._stats, state=self._state, consecutive_failures=self._failures,
+                        failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
@@ -0,0 +1,212 @@
+# result_cache.py
+
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Collapses whitespace so cosmetic differences in extracted text share a cache key."""
+    return re.sub(r"\s+", " ", str(text or "")).strip()
+
+
+def make_key(*parts):
+    """Builds a stable SHA-256 key from any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """
+    A thread-safe in-memory LRU map bounded by entry count and, optionally, by the
+    total size of its values (len() of each value, e.g. rendered file bytes).
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _size(self, value):
+        return len(value) if self.max_bytes is not None else 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        size = self._size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            if key in self._data:
+                self.total_bytes -= self._size(self._data[key])
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self.total_bytes -= self._size(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self.total_bytes -= self._size(self._data.pop(key))
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskStore:
+    """
+    Stores one JSON file per key under a directory.
+    Entries older than ttl_seconds are treated as misses, and the least recently
+    used files are removed once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, ttl_seconds=7 * 24 * 3600, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.ttl_seconds:
+                self.delete(key)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            # Touch the file so eviction order follows reads, not just writes
+            os.utime(path, None)
+            return value
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False, separators=(",", ":"))
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._total_bytes += size - old_size
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        except Exception:
+            # _scan only sees .json files, so a half-written temp file would never be evicted
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def delete(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._scan(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        # Evict down to 90% so we don't rescan the directory on every write
+        target = self.max_bytes * 0.9
+        for path, mtime, size in entries:
+            if total <= target and now - mtime <= self.ttl_seconds:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-memory LRU in front of an optional DiskStore.
+    Each entry remembers how long it took to produce, so hits can report saved time.
+    """
+
+    def __init__(self, name, memory, disk=None):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def _record(self, field, saved=0.0):
+        with self._lock:
+            self._stats[field] += 1
+            self._stats["saved_seconds"] += saved
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._record("memory_hits", entry.get("cost", 0.0))
+            return copy.deepcopy(entry["value"])
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+                self._record("disk_hits", entry.get("cost", 0.0))
+                return copy.deepcopy(entry["value"])
+        self._record("misses")
+        return None
+
+    def set(self, key, value, cost_seconds=0.0):
+        entry = {"value": copy.deepcopy(value), "cost": round(cost_seconds, 3)}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, entry)
+            except OSError as e:
+                print(f"Warning: could not write {self.name} cache entry to disk: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["memory_entries"] = len(self.memory)
+        return stats
@@ -0,0 +1,369 @@
+# resume_parser.py
+
+import os
+import re
+import json
+import time
+import threading
+
+import prompt_compaction
+
+# Below this confidence the reformat falls back to Gemini
+MIN_CONFIDENCE = float(os.environ.get("RESUME_PARSER_MIN_CONFIDENCE", 0.75))
+
+# Heading words and the kind of section they start. Order matters: "Project Experience" is projects.
+_SECTION_KIND_WORDS = [
+    ("certifications", ("certif", "license", "course", "training")),
+    ("education", ("education", "academic", "qualification")),
+    ("projects", ("project",)),
+    ("experience", ("experience", "employment", "work history", "career")),
+    ("skills", ("skill", "competenc", "technolog", "tools")),
+    ("summary", ("summary", "profile", "objective", "about")),
+]
+# The renderers give these titles their job and project layouts
+_CANONICAL_TITLES = {"experience": "Experience", "projects": "Projects"}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE_RE = re.compile(r"\+?\(?\d[\d ().-]{5,}\d")
+_URL_RE = re.compile(r"(?:https?://|www\.|linkedin\.com|github\.com)\S*", re.I)
+_BULLET_RE = re.compile(r"^(?:[•·▪◦●*]\s*|[-–—](?:\s+|$))")
+_DATE_RE = re.compile(r"\b(?:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+)?(?:19|20)\d{2}\b|\b(?:present|current)\b", re.I)
+_PROJECT_LABEL_RE = re.compile(r"^project(?:\s+name)?\s*:\s*", re.I)
+_DESCRIPTION_LABEL_RE = re.compile(r"^description\s*:\s*", re.I)
+_TECH_LABEL_RE = re.compile(r"^(?:tech(?:nolog(?:y|ies))?(?:\s+stack)?|tools|stack|built with)\s*:\s*", re.I)
+_HEADER_SEPARATOR_RE = re.compile(r"\s+[|–—-]\s+|\s*\|\s*")
+_LABEL_LINE_RE = re.compile(r"^[\w /&+#.-]{2,30}:\s")  # "Languages: Python, Go"
+_WORD_RE = re.compile(r"\w+")
+
+
+def section_kind(title):
+    """Classifies a section title as summary, skills, experience, projects, education or certifications (or None)."""
+    title = str(title or "").lower()
+    for kind, words in _SECTION_KIND_WORDS:
+        if any(word in title for word in words):
+            return kind
+    return None
+
+
+def _looks_like_heading(line):
+    # Headings are short lines on their own, e.g. "WORK EXPERIENCE" or "Skills:", never "Project: Foo"
+    return 0 < len(line) <= 40 and len(line.split()) <= 4 and line[0].isalpha() and not any(c in line for c in ":.,|")
+
+
+def heading_kind(line):
+    """The kind of section a plain-text line like 'WORK EXPERIENCE' or 'Skills:' starts, or None."""
+    stripped = str(line).strip().rstrip(":").strip()
+    if not _looks_like_heading(stripped):
+        return None
+    # Mixed-case lines are classified by their last word, so "Project Manager" stays a job title
+    return section_kind(stripped if stripped.isupper() else stripped.split()[-1])
+
+
+class _ParserStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"parsed": 0, "local": 0, "fallback": 0, "confidence_total": 0.0, "seconds_total": 0.0}
+
+    def record(self, confidence, local, seconds):
+        with self._lock:
+            self._stats["parsed"] += 1
+            self._stats["local" if local else "fallback"] += 1
+            self._stats["confidence_total"] += confidence
+            self._stats["seconds_total"] += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        parsed = stats.pop("parsed")
+        confidence_total, seconds_total = stats.pop("confidence_total"), stats.pop("seconds_total")
+        stats.update({
+            "local_rate": round(stats["local"] / parsed, 3) if parsed else 0.0,
+            "avg_confidence": round(confidence_total / parsed, 3) if parsed else 0.0,
+            "avg_ms": round(seconds_total / parsed * 1000, 2) if parsed else 0.0,
+            "min_confidence": MIN_CONFIDENCE,
+        })
+        return stats
+
+
+parser_stats = _ParserStats()
+
+
+def _layout_set(layout, kind):
+    return {prompt_compaction.normalize_text(line).lower() for line in (layout or {}).get(kind, ())}
+
+
+def _is_continuation(text, previous):
+    """A wrapped line carries on the previous one: it starts lowercase, or the previous line did not end a sentence."""
+    return bool(previous) and (text[0].islower() or previous[-1] not in ".!?:;)")
+
+
+class _Parse:
+    """The state of one parse: the lines, the layout hints and a tally of guesses made."""
+
+    def __init__(self, resume_text, layout):
+        self.headings = _layout_set(layout, "headings")
+        self.bold = _layout_set(layout, "bold")
+        self.bullets = _layout_set(layout, "bullets")
+        self.guesses = 0
+        self.lines = []
+        pending_bullet = False
+        for line in prompt_compaction.normalize_text(resume_text).split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if _BULLET_RE.sub("", line).strip() == "":
+                pending_bullet = True  # PDFs often put the bullet glyph on a line of its own
+                continue
+            bullet = pending_bullet or bool(_BULLET_RE.match(line)) or line.lower() in self.bullets
+            self.lines.append((_BULLET_RE.sub("", line).strip() if bullet else line, bullet))
+            pending_bullet = False
+
+    def split_sections(self):
+        """Returns (header_lines, [(title, kind, entries)]) where entries are (text, is_bullet)."""
+        header, sections = [], []
+        for index, (text, bullet) in enumerate(self.lines):
+            stripped = text.rstrip(":").strip()
+            # The first line is usually the name, but a file without a header block starts with a
+            # heading; a name misread as one is caught by _confidence
+            kind = None if bullet else heading_kind(stripped)
+            if kind is None and index > 0 and stripped.lower() in self.headings:
+                kind = section_kind(stripped)  # Styled as a heading, so "Work History" needs no last-word rule
+            # Headings of other kinds ("Awards") count once the sections have begun, if set in the
+            # document's heading style or in capitals
+            styled = not bullet and bool(sections) and _looks_like_heading(stripped) and (
+                stripped.lower() in self.headings or stripped.isupper())
+            if kind or styled:
+                sections.append((stripped, kind, []))
+            elif sections:
+                sections[-1][2].append((text, bullet))
+            else:
+                header.append(text)
+        return header, sections
+
+    def _starts_block(self, entries, index):
+        """Whether a non-bullet line after a block's bullets starts a new job or project."""
+        text = entries[index][0]
+        if text[0].islower():
+            return False
+        if text.lower() in self.bold or _DATE_RE.search(text):
+            return True
+        following = entries[index + 1] if index + 1 < len(entries) else None
+        if following is None or len(text) > 80 or text[-1] in ".!?":
+            return False
+        following_text, following_bullet = following
+        return bool(following_bullet or _DATE_RE.search(following_text) or _DESCRIPTION_LABEL_RE.match(following_text)
+                    or _TECH_LABEL_RE.match(following_text))
+
+    def experience(self, entries):
+        jobs = []
+        for index, (text, bullet) in enumerate(entries):
+            job = jobs[-1] if jobs else None
+            if bullet:
+                if job is None:
+                    self.guesses += 1
+                    job = {"job_title": "", "company_and_date": "", "duties": []}
+                    jobs.append(job)
+                job["duties"].append(text)
+            elif job is None or (job["duties"] and self._starts_block(entries, index)):
+                jobs.append({"job_title": text, "company_and_date": "", "duties": []})
+            elif not job["duties"] and (len(text) > 80 or text.endswith(".")):
+                job["duties"].append(text)  # A paragraph instead of bullets
+            elif not job["duties"]:
+                job["company_and_date"] = f"{job['company_and_date']} | {text}" if job["company_and_date"] else text
+            elif _is_continuation(text, job["duties"][-1]):
+                job["duties"][-1] += " " + text
+            else:
+                self.guesses += 1
+                jobs.append({"job_title": text, "company_and_date": "", "duties": []})
+        for job in jobs:
+            # "Engineer | Acme | 2020 - Present" on one line
+            if not job["company_and_date"] and _DATE_RE.search(job["job_title"]):
+                parts = _HEADER_SEPARATOR_RE.split(job["job_title"], maxsplit=1)
+                if len(parts) == 2:
+                    job["job_title"], job["company_and_date"] = parts[0].strip(), parts[1].strip()
+        return jobs
+
+    def projects(self, entries):
+        entries = _attach_labels(entries)
+        projects = []
+
+        def new_project(name):
+            projects.append({"project_name": name, "description": "", "tech_stack": ""})
+            return projects[-1]
+
+        for index, (text, bullet) in enumerate(entries):
+            project = projects[-1] if projects else None
+            if _PROJECT_LABEL_RE.match(text):
+                new_project(_PROJECT_LABEL_RE.sub("", text))
+            elif _TECH_LABEL_RE.match(text) and project is not None:
+                project["tech_stack"] = _TECH_LABEL_RE.sub("", text)
+            elif _DESCRIPTION_LABEL_RE.match(text) and project is not None:
+                project["description"] = " ".join(filter(None, [project["description"], _DESCRIPTION_LABEL_RE.sub("", text)]))
+            elif bullet or (project is not None and not project["description"] and not project["tech_stack"]):
+                if project is None:
+                    self.guesses += 1
+                    project = new_project("")
+                project["description"] = " ".join(filter(None, [project["description"], text]))
+            elif project is None or self._starts_block(entries, index):
+                new_project(text)
+            else:
+                if not _is_continuation(text, project["description"]):
+                    self.guesses += 1
+                project["description"] += " " + text
+        return projects
+
+    def standard(self, kind, entries):
+        """A paragraph string, or a list of items when the section has bullets or short lines."""
+        texts = [text for text, _ in entries]
+        if not any(bullet for _, bullet in entries):
+            if any(_LABEL_LINE_RE.match(text) for text in texts) and kind != "summary":
+                return texts
+            if kind == "summary" or len(texts) == 1 or sum(map(len, texts)) / len(texts) > 60:
+                return " ".join(texts)
+            return texts
+        items = []
+        for text, bullet in entries:
+            if not bullet and items and _is_continuation(text, items[-1]):
+                items[-1] += " " + text
+            else:
+                items.append(text)
+        return items
+
+
+def _label_only(text):
+    """The label regex a line like "Tech Stack" (nothing after the label) consists of, or None."""
+    text = text.rstrip(":").strip() + ": "
+    for label_re in (_PROJECT_LABEL_RE, _DESCRIPTION_LABEL_RE, _TECH_LABEL_RE):
+        match = label_re.match(text)
+        if match and match.end() == len(text):
+            return label_re
+    return None
+
+
+def _attach_labels(entries):
+    """
+    Some templates (the PDF one among them) set "Project Name", "Description" and "Tech
+    Stack" on a line of their own above the value; this writes them as "Label: value"
+    lines, repeating the label for each line of the value.
+    """
+    attached, label = [], None
+    for text, bullet in entries:
+        label_re = _label_only(text)
+        if label_re is not None:
+            label = {_PROJECT_LABEL_RE: "Project", _DESCRIPTION_LABEL_RE: "Description"}.get(label_re, "Tech Stack")
+        elif label is not None and not bullet:
+            attached.append((f"{label}: {text}", bullet))
+            if label == "Project":
+                label = None  # A name is one line; what follows is the description
+        else:
+            attached.append((text, bullet))
+    return attached
+
+
+def _header_fields(header, candidate_name):
+    """
+    candidate_name, designation_line and contact_info from the lines above the first
+    heading, plus the unused lines. The name is the first line that is not contact
+    details, since two-column headers can put the phone and email first.
+    """
+    email = phone = designation = ""
+    unused = []
+    name_seen = False
+    for line in header:
+        email = email or next(iter(_EMAIL_RE.findall(line)), "")
+        phone_match = _PHONE_RE.search(_EMAIL_RE.sub("", line))
+        if phone_match and sum(c.isdigit() for c in phone_match.group()) < 7:
+            phone_match = None
+        if phone_match and not phone:
+            phone = phone_match.group().strip()
+        if _EMAIL_RE.search(line) or phone_match or _URL_RE.search(line):
+            continue
+        if not name_seen:
+            name_seen = True
+            if not candidate_name or line.lower() == candidate_name.lower():
+                candidate_name = candidate_name or line
+                continue
+        if not designation:
+            designation = line
+        else:
+            unused.append(line)
+    return candidate_name, designation, {"phone": phone, "email": email}, unused
+
+
+def parse_resume(resume_text, candidate_name="", layout=None):
+    """
+    Builds the generation schema (candidate_name, designation_line, contact_info,
+    sections) from extracted resume text without an AI call. layout holds the
+    "headings", "bold" and "bullets" lines ingestion found from PDF fonts or DOCX
+    styles. Returns (resume_json, confidence), confidence being between 0 and 1.
+    """
+    parse = _Parse(resume_text, layout)
+    header, raw_sections = parse.split_sections()
+    name, designation, contact, unused = _header_fields(header, candidate_name)
+
+    sections = []
+    for title, kind, entries in raw_sections:
+        if not entries:
+            continue
+        if kind == "experience":
+            content = parse.experience(entries)
+        elif kind == "projects":
+            content = parse.projects(entries)
+        else:
+            content = parse.standard(kind, entries)
+        sections.append({"title": _CANONICAL_TITLES.get(kind) or (title.title() if title.isupper() else title),
+                         "content": content})
+    resume_json = {"candidate_name": name, "designation_line": designation, "contact_info": contact, "sections": sections}
+    return resume_json, _confidence(parse, resume_json, header, raw_sections, unused)
+
+
+def _strip_labels(text):
+    """Drops the "Project:", "Description:" and "Tech Stack:" labels the schema turns into keys."""
+    for label_re in (_PROJECT_LABEL_RE, _DESCRIPTION_LABEL_RE, _TECH_LABEL_RE):
+        text = label_re.sub("", text)
+    return text
+
+
+def _confidence(parse, resume_json, header_lines, raw_sections, unused_header_lines):
+    if not any(kind for _, kind, _ in raw_sections):
+        return 0.0
+    score = 1.0
+    score -= min(0.3, 0.1 * sum(1 for _, kind, _ in raw_sections if kind is None))
+    score -= min(0.3, 0.05 * parse.guesses)
+    if len(unused_header_lines) > 2:
+        score -= 0.2  # Probably an untitled summary, or a heading that was missed
+    if not any(resume_json["contact_info"].values()):
+        score -= 0.1
+    if heading_kind(resume_json["candidate_name"]):
+        score -= 0.5  # A heading taken for the name: the header block was missed
+    for section in resume_json["sections"]:
+        if section["title"] == "Experience" and not any(job["job_title"] and job["duties"] for job in section["content"]):
+            score -= 0.3
+    # Every word of the header and section text must survive; a miss means content was dropped
+    source_text = " ".join(header_lines + [_strip_labels(text) for _, _, entries in raw_sections for text, _ in entries
+                                           if not _label_only(text)])
+    source = set(_WORD_RE.findall(source_text.lower()))
+    kept = set(_WORD_RE.findall(json.dumps(resume_json, ensure_ascii=False).lower()))
+    if source:
+        score *= len(source & kept) / len(source)
+    return round(max(0.0, score), 3)
+
+
+def reformat(resume_text, candidate_name="", layout=None, min_confidence=None):
+    """
+    The parsed resume when parse_resume is confident enough to skip the AI reformat, else
+    None. min_confidence overrides MIN_CONFIDENCE, e.g. 0 while the AI is unavailable.
+    """
+    min_confidence = MIN_CONFIDENCE if min_confidence is None else min_confidence
+    start = time.perf_counter()
+    try:
+        resume_json, confidence = parse_resume(resume_text, candidate_name, layout)
+    except Exception as e:
+        print(f"Local resume parsing failed: {type(e).__name__} - {e}")
+        resume_json, confidence = None, 0.0
+    local = resume_json is not None and confidence >= min_confidence
+    parser_stats.record(confidence, local, time.perf_counter() - start)
+    if not local:
+        print(f"Local resume parse confidence {confidence:.2f} is below {min_confidence}; using the AI reformat.")
+        return None
+    return resume_json
@@ -0,0 +1,363 @@
+# session_store.py
+
+import os
+import abc
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import secrets
+import threading
+from collections import deque
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Session values whose JSON is at least this long are stored as shared blobs
+BLOB_THRESHOLD_BYTES = 1024
+_REF_KEY = "__blob__"
+
+
+class SessionStore(abc.ABC):
+    """
+    Interface for server-side session storage.
+
+    A session is a small JSON dict keyed by session id. Large values (resume text, job
+    descriptions, analyses) live in a separate content-addressed blob store, so the same
+    payload is kept once however many sessions refer to it, and the session itself only
+    holds {"__blob__": <sha256>} references.
+    """
+
+    @abc.abstractmethod
+    def load_session(self, session_id):
+        """Returns (data, expires_at) or None if the session is unknown or expired."""
+
+    @abc.abstractmethod
+    def save_session(self, session_id, data, blob_digests):
+        """Stores a session's data dict and records which blobs it references."""
+
+    @abc.abstractmethod
+    def touch_session(self, session_id):
+        """Pushes an unchanged session's expiry back by the TTL."""
+
+    @abc.abstractmethod
+    def delete_session(self, session_id):
+        """Removes a session and its blob references."""
+
+    @abc.abstractmethod
+    def put_blob(self, payload):
+        """Stores serialized bytes once and returns their digest."""
+
+    @abc.abstractmethod
+    def get_blob(self, digest):
+        """Returns the serialized bytes for a digest, or None if it has been collected."""
+
+    @abc.abstractmethod
+    def gc(self):
+        """Deletes expired sessions and blobs no session refers to."""
+
+    def stats(self):
+        return {}
+
+
+class _LatencyStats:
+    """Count, mean, p95 and max per operation, over the last `window` samples."""
+
+    def __init__(self, window=512):
+        self._samples = {}
+        self._counts = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, op, seconds):
+        with self._lock:
+            self._samples.setdefault(op, deque(maxlen=self._window)).append(seconds * 1000)
+            self._counts[op] = self._counts.get(op, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            snapshot = {op: sorted(samples) for op, samples in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            op: {
+                "count": counts[op],
+                "mean_ms": round(sum(samples) / len(samples), 3),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                "max_ms": round(samples[-1], 3),
+            }
+            for op, samples in snapshot.items()
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SessionStore backed by one SQLite database in WAL mode, so concurrent requests and
+    gunicorn workers can read while another writes.
+
+    Blobs are zlib-compressed. A background thread removes expired sessions and blobs no
+    session refers to anymore, and drops the least recently used sessions while the blobs
+    take more than max_bytes.
+    """
+
+    def __init__(self, path, ttl_seconds=24 * 3600, max_bytes=200 * 1024 * 1024, gc_interval=300):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self._local = threading.local()
+        self._latency = _LatencyStats()
+        self._gc_lock = threading.Lock()
+        self._gc_thread = None
+        self._gc_stats = {"runs": 0, "sessions_deleted": 0, "blobs_deleted": 0, "last_run": None}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        # Must be set before the first table exists; lets gc() hand freed pages back to the OS
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL, updated_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at);
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, raw_size INTEGER NOT NULL,
+                last_used REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS session_blobs (
+                session_id TEXT NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (session_id, digest));
+            CREATE INDEX IF NOT EXISTS session_blobs_digest ON session_blobs (digest);
+        """)
+
+    def _start_gc(self):
+        if self._gc_thread is None and self.gc_interval:
+            with self._gc_lock:
+                if self._gc_thread is None:
+                    self._gc_thread = threading.Thread(target=self._gc_loop, name="session-gc", daemon=True)
+                    self._gc_thread.start()
+
+    def _gc_loop(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                self.gc()
+            except Exception as e:
+                print(f"Session store GC failed: {e}")
+
+    def load_session(self, session_id):
+        self._start_gc()
+        start = time.perf_counter()
+        row = self._connect().execute(
+            "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+        self._latency.record("session_read", time.perf_counter() - start)
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save_session(self, session_id, data, blob_digests):
+        start = time.perf_counter()
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO sessions (id, data, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+                (session_id, json.dumps(data, separators=(",", ":")), now + self.ttl_seconds, now),
+            )
+            conn.execute("DELETE FROM session_blobs WHERE session_id = ?", (session_id,))
+            conn.executemany("INSERT OR IGNORE INTO session_blobs (session_id, digest) VALUES (?, ?)",
+                             [(session_id, digest) for digest in set(blob_digests)])
+        self._latency.record("session_write", time.perf_counter() - start)
+
+    def touch_session(self, session_id):
+        now = time.time()
+        self._connect().execute("UPDATE sessions SET expires_at = ?, updated_at = ? WHERE id = ?",
+                                (now + self.ttl_seconds, now, session_id))
+
+    def delete_session(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.execute("DELETE FROM session_blobs WHERE session_id = ?", (session_id,))
+
+    def put_blob(self, payload):
+        start = time.perf_counter()
+        digest = hashlib.sha256(payload).hexdigest()
+        conn = self._connect()
+        # Already stored: just mark it used, without compressing again
+        updated = conn.execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), digest)).rowcount
+        if not updated:
+            compressed = zlib.compress(payload, 6)
+            conn.execute("INSERT OR IGNORE INTO blobs (digest, data, size, raw_size, last_used) VALUES (?, ?, ?, ?, ?)",
+                         (digest, compressed, len(compressed), len(payload), time.time()))
+        self._latency.record("blob_write", time.perf_counter() - start)
+        return digest
+
+    def get_blob(self, digest):
+        start = time.perf_counter()
+        row = self._connect().execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self._latency.record("blob_read", time.perf_counter() - start)
+        return zlib.decompress(row[0]) if row else None
+
+    def gc(self):
+        """Deletes expired sessions and unreferenced blobs, then trims to max_bytes."""
+        start = time.perf_counter()
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+            conn.execute("DELETE FROM session_blobs WHERE session_id NOT IN (SELECT id FROM sessions)")
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                # Over budget: drop the least recently used sessions until their blobs fit
+                freed = 0
+                for session_id, in conn.execute("SELECT id FROM sessions ORDER BY updated_at").fetchall():
+                    if total - freed <= self.max_bytes * 0.9:
+                        break
+                    freed += conn.execute(
+                        "SELECT COALESCE(SUM(size), 0) FROM blobs WHERE digest IN "
+                        "(SELECT digest FROM session_blobs WHERE session_id = ?) AND digest NOT IN "
+                        "(SELECT digest FROM session_blobs WHERE session_id != ?)", (session_id, session_id)
+                    ).fetchone()[0]
+                    conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                    conn.execute("DELETE FROM session_blobs WHERE session_id = ?", (session_id,))
+                    expired += 1
+
+            # A blob written for a session that has not been saved yet is younger than a minute
+            blobs = conn.execute(
+                "DELETE FROM blobs WHERE last_used < ? AND digest NOT IN (SELECT digest FROM session_blobs)", (now - 60,)
+            ).rowcount
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self._latency.record("gc", time.perf_counter() - start)
+        # The GC thread and a manual gc() can finish at the same time
+        with self._gc_lock:
+            self._gc_stats["runs"] += 1
+            self._gc_stats["sessions_deleted"] += expired
+            self._gc_stats["blobs_deleted"] += blobs
+            self._gc_stats["last_run"] = now
+        return {"sessions_deleted": expired, "blobs_deleted": blobs}
+
+    def stats(self):
+        conn = self._connect()
+        sessions = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        blobs, stored, raw = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM blobs").fetchone()
+        with self._gc_lock:
+            gc_stats = dict(self._gc_stats)
+        file_bytes = sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal", "-shm")
+                         if os.path.exists(self.path + suffix))
+        return {
+            "sessions": sessions,
+            "blobs": blobs,
+            "blob_bytes": stored,
+            "blob_raw_bytes": raw,
+            "compression_ratio": round(raw / stored, 2) if stored else 0.0,
+            "file_bytes": file_bytes,
+            "latency": self._latency.summary(),
+            "gc": gc_stats,
+        }
+
+
+class StoreSession(CallbackDict, SessionMixin):
+    """
+    A session whose large values are fetched from the blob store only when read,
+    so requests that never touch the resume text never load it.
+    """
+
+    def __init__(self, store, session_id, data=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(data, on_update)
+        self.store = store
+        self.session_id = session_id
+        self.new = new
+        self.modified = False
+
+    def _resolve(self, key, value):
+        if isinstance(value, dict) and len(value) == 1 and _REF_KEY in value:
+            payload = self.store.get_blob(value[_REF_KEY])
+            value = json.loads(payload) if payload is not None else None
+            dict.__setitem__(self, key, value)  # Cache it without marking the session modified
+        return value
+
+    def __getitem__(self, key):
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Flask session interface that keeps sessions in a SessionStore and only the id in the cookie."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if session_id:
+            loaded = self.store.load_session(session_id)
+            if loaded is not None:
+                data, expires_at = loaded
+                session = StoreSession(self.store, session_id, data)
+                # Extend the expiry without a full write once half the TTL has passed
+                if expires_at - time.time() < self.store.ttl_seconds / 2:
+                    self.store.touch_session(session_id)
+                return session
+        return StoreSession(self.store, secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete_session(session.session_id)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+        if not session.modified and not session.new:
+            return
+
+        self.write(session)
+        response.set_cookie(
+            cookie_name, session.session_id, expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+        )
+
+    def write(self, session):
+        """
+        Stores the session's data. save_session calls it at the end of a request; a streamed
+        response body calls it directly, since the session was already saved when it started.
+        """
+        data, digests = {}, []
+        for key, value in dict.items(session):
+            if isinstance(value, dict) and len(value) == 1 and _REF_KEY in value:
+                data[key] = value  # Never read this request, so it cannot have changed
+                digests.append(value[_REF_KEY])
+                continue
+            payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+            if len(payload) >= BLOB_THRESHOLD_BYTES:
+                digest = self.store.put_blob(payload)
+                data[key] = {_REF_KEY: digest}
+                digests.append(digest)
+            else:
+                data[key] = value
+        self.store.save_session(session.session_id, data, digests)
@@ -0,0 +1,162 @@
+# speculative.py
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import analyzer_logic
+import result_cache
+
+
+def job_id_for(original_resume_text, jd_text, candidate_name):
+    """Identifies the rewrite a session will ask for, from the inputs /analyze already has."""
+    return result_cache.make_key("speculative_rewrite", result_cache.normalize_text(original_resume_text),
+                                 result_cache.normalize_text(jd_text), candidate_name)
+
+
+class _Job:
+    __slots__ = ("suggestions", "future", "created_at", "seconds", "discarded")
+
+    def __init__(self, suggestions, future):
+        self.suggestions = suggestions
+        self.future = future
+        self.created_at = time.monotonic()
+        self.seconds = None
+        self.discarded = False
+
+
+class SpeculativeRewriter:
+    """
+    Starts the AI rewrite in the background as soon as a full analysis completes, since
+    users almost always ask for it next. /generate then claims the finished result, or
+    joins the job if it is still running, instead of starting a cold call.
+
+    Unclaimed jobs expire after ttl_seconds; a job still queued when it is discarded or
+    expires is cancelled. A claim waits at most claim_timeout for a running job and then
+    gives it up, so a stuck job costs the caller seconds rather than a whole Gemini
+    timeout. The generated resume also lands in the AI result cache, so a claim that
+    arrives after expiry is still served without a new Gemini call.
+    """
+
+    def __init__(self, workers=2, ttl_seconds=600, max_pending=8, claim_timeout=10.0):
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self.claim_timeout = claim_timeout
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "skipped_busy": 0, "claimed_ready": 0, "claimed_running": 0, "misses": 0,
+                       "failed": 0, "claim_timeouts": 0, "expired": 0, "discarded": 0, "cancelled": 0,
+                       "wasted_jobs": 0, "wasted_seconds": 0.0}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="speculative-rewrite")
+        return self._executor
+
+    def _run(self, job, original_resume_text, jd_text, candidate_name):
+        start = time.perf_counter()
+        try:
+            return analyzer_logic.generate_new_resume_text_with_ai(
+                original_resume_text, jd_text, job.suggestions, reformat_only=False, candidate_name=candidate_name)
+        finally:
+            with self._lock:
+                job.seconds = time.perf_counter() - start
+                if job.discarded:
+                    self._count_waste(job)
+
+    def _count_waste(self, job):
+        self._stats["wasted_jobs"] += 1
+        self._stats["wasted_seconds"] += job.seconds
+
+    def _remove(self, job_id, reason):
+        """Drops a job nobody claimed; the caller holds the lock."""
+        self._drop(self._jobs.pop(job_id), reason)
+
+    def _drop(self, job, reason):
+        self._stats[reason] += 1
+        job.discarded = True
+        if job.future.cancel():
+            self._stats["cancelled"] += 1
+        elif job.seconds is not None:
+            self._count_waste(job)  # Already finished; a running job is counted when it ends
+
+    def _expire(self):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items() if now - job.created_at > self.ttl_seconds]:
+            self._remove(job_id, "expired")
+
+    def start(self, job_id, original_resume_text, jd_text, suggestions, candidate_name):
+        """Queues the rewrite unless it is already queued or too many jobs are pending. Returns True if queued."""
+        with self._lock:
+            self._expire()
+            if job_id in self._jobs:
+                return True
+            if sum(1 for job in self._jobs.values() if not job.future.done()) >= self.max_pending:
+                self._stats["skipped_busy"] += 1
+                return False
+            job = _Job(list(suggestions or []), None)
+            job.future = self._get_executor().submit(self._run, job, original_resume_text, jd_text, candidate_name)
+            self._jobs[job_id] = job
+            self._stats["started"] += 1
+        return True
+
+    def claim(self, job_id, suggestions, timeout=None):
+        """
+        Returns the speculative rewrite for job_id if one was started with the same
+        suggestions, waiting up to timeout (default claim_timeout) if it is still running.
+        Returns None otherwise, or if it failed or timed out, so the caller makes the call itself.
+        """
+        with self._lock:
+            self._expire()
+            job = self._jobs.pop(job_id, None) if job_id else None
+            if job is None or job.suggestions != list(suggestions or []):
+                if job is not None:
+                    self._jobs[job_id] = job  # Different request; leave it to expire
+                self._stats["misses"] += 1
+                return None
+            self._stats["claimed_ready" if job.future.done() else "claimed_running"] += 1
+
+        try:
+            result = job.future.result(timeout=self.claim_timeout if timeout is None else timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._drop(job, "claim_timeouts")
+            return None
+        except Exception as e:
+            print(f"Speculative rewrite failed: {e}")
+            result = {"error": str(e)}
+        if "error" in result:
+            with self._lock:
+                self._stats["failed"] += 1
+            return None
+        return result
+
+    def discard(self, job_id):
+        """Called when a session starts over; the job will not be claimed."""
+        with self._lock:
+            if job_id in self._jobs:
+                self._remove(job_id, "discarded")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = sum(1 for job in self._jobs.values() if not job.future.done())
+            stats["ready"] = sum(1 for job in self._jobs.values() if job.future.done())
+        claimed = stats["claimed_ready"] + stats["claimed_running"]
+        stats["hit_rate"] = round((claimed - stats["claim_timeouts"]) / (claimed + stats["misses"]), 3) if claimed + stats["misses"] else 0.0
+        stats["wasted_seconds"] = round(stats["wasted_seconds"], 2)
+        return stats
+
+
+# Off unless SPECULATIVE_REWRITE=1: every analysis then costs a rewrite call, claimed or not
+ENABLED = os.environ.get("SPECULATIVE_REWRITE", "0") == "1"
+
+rewriter = SpeculativeRewriter(
+    workers=int(os.environ.get("SPECULATIVE_REWRITE_WORKERS", 2)),
+    ttl_seconds=int(os.environ.get("SPECULATIVE_REWRITE_TTL_SECONDS", 600)),
+    max_pending=int(os.environ.get("SPECULATIVE_REWRITE_MAX_PENDING", 8)),
+    claim_timeout=float(os.environ.get("SPECULATIVE_REWRITE_CLAIM_TIMEOUT_SECONDS", 10)),
+)
@@ -22,6 +22,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- State for generated resume data and initial score ---
     let generatedResumeJson = null;
     let initialAnalysisScore = 0;
+    // Last downloaded file per template and format: { etag, blob }
+    const downloadCache = {};
 
     // --- Event Handlers ---
     resumeUploadInput.addEventListener('change', () => {
@@ -38,9 +40,10 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- UI and State Management Functions ---
     function updateFormUI() {
         const selectedMode = document.querySelector('input[name="analysis_mode"]:checked').value;
-        jobDescriptionGroup.classList.toggle('hidden', selectedMode !== 'full_analysis');
+        const needsJobDescription = ['full_analysis', 'fast_score'].includes(selectedMode);
+        jobDescriptionGroup.classList.toggle('hidden', !needsJobDescription);
         jobTitleGroup.classList.toggle('hidden', selectedMode !== 'job_title');
-        jobDescriptionInput.required = (selectedMode === 'full_analysis');
+        jobDescriptionInput.required = needsJobDescription;
         jobTitleInput.required = (selectedMode === 'job_title');
     }
 
@@ -74,21 +77,97 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Core Logic Functions ---
+    // Reads a Server-Sent Events response from a POST request and calls onEvent(name, data)
+    // for every frame. Returns the data of the final 'complete' event. When the server is
+    // busy it queues the request instead (202); the job is then followed over its own event
+    // stream, with its queue position shown as "<queuedText> (position N in queue)...".
+    async function streamEvents(url, options, onEvent, queuedText) {
+        const response = await fetch(url, options);
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream')) {
+            const result = await response.json();
+            if (!response.ok) throw new Error(result.error || 'Request failed.');
+            if (response.status === 202) return followJob(result.events_url, queuedText);
+            return result;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let completeData = null;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let dataText = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) eventName = line.slice(7);
+                    else if (line.startsWith('data: ')) dataText += line.slice(6);
+                });
+                if (!dataText) continue;  // Keep-alive comment
+                const data = JSON.parse(dataText);
+                if (eventName === 'error') throw new Error(data.error || 'Request failed.');
+                if (eventName === 'complete') completeData = data;
+                else onEvent(eventName, data);
+            }
+        }
+        if (!completeData) throw new Error('The connection closed before the response was complete.');
+        return completeData;
+    }
+
+    // Waits for a queued job through /jobs/<id>/events; returns the body the route would have returned
+    function followJob(eventsUrl, queuedText) {
+        const loaderDefault = loaderText.textContent;
+        return streamEvents(eventsUrl, {}, (eventName, data) => {
+            if (eventName !== 'status') return;
+            loaderText.textContent = data.status === 'queued' ? `${queuedText} (position ${data.position} in queue)...` : loaderDefault;
+        });
+    }
+
+    // Applies one streamed event to a partially received analysis or resume object
+    function applyStreamEvent(partial, eventName, data) {
+        if (eventName === 'field') {
+            partial[data.name] = data.value;
+        } else if (eventName === 'section') {
+            partial.sections = partial.sections || [];
+            partial.sections[data.index] = data.section;
+        }
+    }
+
     async function handleFormSubmit(event) {
         event.preventDefault();
         resetUI();
         showLoader('Processing your request...');
         
+        const selectedMode = document.querySelector('input[name="analysis_mode"]:checked').value;
+        const partial = {};
         try {
-            const response = await fetch('/analyze', {
+            const result = await streamEvents('/analyze/stream', {
                 method: 'POST',
                 body: new FormData(form),
-            });
-            const result = await response.json();
-            if (!response.ok) throw new Error(result.error || 'Request failed.');
+            }, (eventName, data) => {
+                applyStreamEvent(partial, eventName, data);
+                if (selectedMode === 'full_analysis' || selectedMode === 'fast_score') {
+                    // Each part of the report shows as soon as it arrives; the loader stays
+                    // up above it until the analysis is complete
+                    if (eventName !== 'field') return;
+                    renderAnalysisProgress(partial);
+                    resultsContainer.classList.remove('hidden');
+                    loaderText.textContent = `Analyzing... received ${data.name.replace(/_/g, ' ')}`;
+                } else {
+                    populateDownloadSection(partial, 'Building your resume...');
+                    showSection(downloadSection);
+                }
+            }, 'Waiting for the analyzer');
 
             if (result.status === 'analysis_complete') {
                 initialAnalysisScore = result.data.match_score || 0;
+                renderAnalysisProgress(result.data);
                 displayAnalysisResults(result.data);
                 showSection(resultsContainer);
                 confirmationSection.classList.remove('hidden');
@@ -112,14 +191,17 @@ document.addEventListener('DOMContentLoaded', () => {
             : 'AI is optimizing your resume for maximum ATS compatibility...';
         showLoader(loaderMessage);
 
+        const partial = {};
         try {
-            const response = await fetch('/generate', { 
+            const data = await streamEvents('/generate/stream', { 
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({ reformat_only: reformatOnly })
-            });
-            const data = await response.json();
-            if (!response.ok) throw new Error(data.error || 'Generation failed.');
+            }, (eventName, eventData) => {
+                applyStreamEvent(partial, eventName, eventData);
+                populateDownloadSection(partial, 'Building your resume...');
+                showSection(downloadSection);
+            }, 'Waiting for the resume writer');
 
             showSection(downloadSection);
             if (data.new_analysis_result) {
@@ -151,16 +233,29 @@ document.addEventListener('DOMContentLoaded', () => {
         showLoader(`Generating professional ${selectedFormat.toUpperCase()} with ${templateName}...`);
         
         try {
+            // Send the ETag of the last file downloaded for this template and format;
+            // if the resume has not changed the server answers 304 and the saved file is reused.
+            const cacheKey = `${company}:${selectedFormat}`;
+            const cached = downloadCache[cacheKey];
+            const headers = {'Content-Type': 'application/json'};
+            if (cached) headers['If-None-Match'] = cached.etag;
             const response = await fetch('/download', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'},
+                headers,
                 body: JSON.stringify({ company, resume_json: generatedResumeJson, format: selectedFormat })
             });
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.error || 'File generation failed.');
+            let blob;
+            if (response.status === 304 && cached) {
+                blob = cached.blob;
+            } else {
+                if (!response.ok) {
+                    const errorData = await response.json();
+                    throw new Error(errorData.error || 'File generation failed.');
+                }
+                blob = await response.blob();
+                const etag = response.headers.get('ETag');
+                if (etag) downloadCache[cacheKey] = { etag, blob };
             }
-            const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
@@ -188,6 +283,37 @@ document.addEventListener('DOMContentLoaded', () => {
         // It remains unchanged.
     }
     
+    // Renders the parts of an analysis that have arrived so far; called again for each new field
+    function renderAnalysisProgress(analysis) {
+        const cards = [];
+        if (analysis.match_score !== undefined) {
+            cards.push(`<div class="result-card score-card"><h3>Match Score</h3><p>${escapeHtml(analysis.match_score)}%</p></div>`);
+        }
+        if (analysis.summary) {
+            cards.push(`<div class="result-card summary-card"><h3>Summary</h3><p>${escapeHtml(analysis.summary)}</p></div>`);
+        }
+        if (analysis.scoring_breakdown && Object.keys(analysis.scoring_breakdown).length > 0) {
+            const items = Object.entries(analysis.scoring_breakdown).map(([category, entry]) => `
+                <li class="breakdown-item">
+                    <div class="breakdown-header"><span>${escapeHtml(category.replace(/_/g, ' '))}</span><strong>${escapeHtml((entry || {}).score ?? '')}</strong></div>
+                    ${entry && entry.justification ? `<p class="justification">${escapeHtml(entry.justification)}</p>` : ''}
+                </li>`).join('');
+            cards.push(`<div class="result-card breakdown-card"><h3>Score Breakdown</h3><ul>${items}</ul></div>`);
+        }
+        const listCard = (items, title, cardClass) => {
+            if (!Array.isArray(items) || items.length === 0) return;
+            cards.push(`<div class="result-card ${cardClass}"><h3>${title}</h3><ul>${items.map(item => `<li>${escapeHtml(item)}</li>`).join('')}</ul></div>`);
+        };
+        listCard(analysis.strengths, 'Strengths', '');
+        listCard(analysis.missing_keywords, 'Missing Keywords', '');
+        listCard(analysis.suggested_changes, 'Suggested Changes', 'suggestions-card');
+        resultsContainer.innerHTML = cards.join('');
+    }
+
+    function escapeHtml(value) {
+        return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+    }
+
     // --- MODIFICATION 2: Call the new function after rendering the preview ---
     function populateDownloadSection(jsonToShow, headerText) {
         generatedResumeJson = jsonToShow;
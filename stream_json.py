@@ -0,0 +1,133 @@
+# stream_json.py
+
+import json
+
+
+class IncrementalJSONParser:
+    """
+    Parses a single JSON object as it arrives in chunks and reports each
+    top-level field as soon as its value is complete.
+
+    feed() returns a list of events:
+      ("field", key, value)       - a completed top-level field
+      ("item", key, index, value) - a completed element of a top-level array listed in item_keys
+
+    Arrays named in item_keys are reported element by element instead of as one field.
+    Every character is scanned exactly once, so feeding N chunks costs O(total length).
+    """
+
+    def __init__(self, item_keys=()):
+        self.item_keys = set(item_keys)
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # State of the top-level object: 'key' -> 'colon' -> 'value_start' -> 'value' -> 'after_value'
+        self._state = "key"
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._streaming_items = False
+        self._item_start = None
+        self._item_index = 0
+
+    def feed(self, chunk):
+        events = []
+        self.buffer += chunk
+        buf = self.buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if ch == '"':
+                self._token_start(i)
+                self._in_string = True
+            elif ch in "{[":
+                self._token_start(i)
+                self._depth += 1
+            elif ch in "}]":
+                self._scalar_end(i, events)
+                self._depth -= 1
+                self._container_closed(i, events)
+            elif ch == ",":
+                self._scalar_end(i, events)
+                if self._depth == 1:
+                    self._state = "key"
+            elif ch == ":":
+                if self._depth == 1 and self._state == "colon":
+                    self._state = "value_start"
+            elif not ch.isspace():
+                self._token_start(i)
+        self._pos = len(buf)
+        return events
+
+    def result(self):
+        """Parses the whole buffer once the stream has ended."""
+        return json.loads(self.buffer)
+
+    # --- Token boundary handlers ---
+    def _token_start(self, i):
+        if self._depth == 1:
+            if self._state == "key" and self.buffer[i] == '"':
+                self._key_start = i
+            elif self._state == "value_start":
+                self._value_start = i
+                self._state = "value"
+                self._streaming_items = self.buffer[i] == "[" and self._key in self.item_keys
+                self._item_index = 0
+        elif self._depth == 2 and self._streaming_items and self._item_start is None:
+            self._item_start = i
+
+    def _string_closed(self, i, events):
+        buf = self.buffer
+        if self._depth == 1:
+            if self._state == "key" and self._key_start is not None:
+                self._key = json.loads(buf[self._key_start:i + 1])
+                self._key_start = None
+                self._state = "colon"
+            elif self._state == "value" and buf[self._value_start] == '"':
+                self._emit_field(buf[self._value_start:i + 1], events)
+        elif self._depth == 2 and self._streaming_items and self._item_start is not None and buf[self._item_start] == '"':
+            self._emit_item(buf[self._item_start:i + 1], events)
+
+    def _container_closed(self, i, events):
+        buf = self.buffer
+        if self._depth == 1 and self._state == "value" and buf[self._value_start] in "{[":
+            if self._streaming_items:
+                self._streaming_items = False
+                self._state = "after_value"
+            else:
+                self._emit_field(buf[self._value_start:i + 1], events)
+        elif self._depth == 2 and self._streaming_items and self._item_start is not None and buf[self._item_start] in "{[":
+            self._emit_item(buf[self._item_start:i + 1], events)
+
+    def _scalar_end(self, i, events):
+        buf = self.buffer
+        if self._depth == 1 and self._state == "value" and buf[self._value_start] not in '"{[':
+            self._emit_field(buf[self._value_start:i].strip(), events)
+        elif self._depth == 2 and self._streaming_items and self._item_start is not None and buf[self._item_start] not in '"{[':
+            self._emit_item(buf[self._item_start:i].strip(), events)
+
+    def _emit_field(self, raw, events):
+        self._state = "after_value"
+        try:
+            events.append(("field", self._key, json.loads(raw)))
+        except ValueError:
+            pass
+
+    def _emit_item(self, raw, events):
+        self._item_start = None
+        try:
+            events.append(("item", self._key, self._item_index, json.loads(raw)))
+        except ValueError:
+            pass
+        self._item_index += 1
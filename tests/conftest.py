@@ -0,0 +1,20 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))  # synthetic resumes
+
+# Set before anything imports analyzer_logic: no Gemini calls, and no caches written under .cache
+os.environ.setdefault("GEMINI_FAKE", "1")
+os.environ.setdefault("GEMINI_FAKE_LATENCY_MS", "0")
+os.environ.setdefault("AI_CACHE_DIR", "")
+os.environ.setdefault("EXTRACTION_CACHE_DIR", "")
+# app keeps sessions and queued jobs in SQLite; give each test run its own files
+_STATE_DIR = tempfile.mkdtemp(prefix="resume-app-tests-")
+os.environ.setdefault("SESSION_DB_PATH", os.path.join(_STATE_DIR, "sessions.sqlite3"))
+os.environ.setdefault("JOB_QUEUE_DB_PATH", os.path.join(_STATE_DIR, "jobs.sqlite3"))
+os.environ.setdefault("RENDER_POOL_WORKERS", "0")
@@ -0,0 +1,90 @@
+// tests/js/harness.js
+// Runs static/script.js against a minimal fake DOM and a scripted fetch, so its
+// streaming logic can be tested without a browser.
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const SCRIPT = fs.readFileSync(path.join(__dirname, '..', '..', 'static', 'script.js'), 'utf8');
+
+class FakeElement {
+    constructor() {
+        this.textContent = '';
+        this.innerHTML = '';
+        this.value = '';
+        this.style = {};
+        this.dataset = {};
+        this.listeners = {};
+        const classes = new Set();
+        this.classList = {
+            add: (...names) => names.forEach(name => classes.add(name)),
+            remove: (...names) => names.forEach(name => classes.delete(name)),
+            toggle: (name, force) => (force ?? !classes.has(name)) ? classes.add(name) : classes.delete(name),
+            contains: name => classes.has(name),
+        };
+    }
+
+    get hidden() { return this.classList.contains('hidden'); }
+    addEventListener(name, handler) { this.listeners[name] = handler; }
+    querySelectorAll() { return []; }
+}
+
+// An SSE response whose frames the test pushes one at a time with send()
+function eventStream() {
+    let controller;
+    const body = new ReadableStream({ start(c) { controller = c; } });
+    const encoder = new TextEncoder();
+    return {
+        response: new Response(body, { headers: { 'Content-Type': 'text/event-stream' } }),
+        send(event, data) { controller.enqueue(encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`)); },
+        close() { controller.close(); },
+    };
+}
+
+function jsonResponse(body, status = 200) {
+    return new Response(JSON.stringify(body), { status, headers: { 'Content-Type': 'application/json' } });
+}
+
+// Loads the page script. routes maps a URL to a function returning its Response.
+function loadPage(routes, mode = 'full_analysis') {
+    const elements = {};
+    const selectors = {};
+    const document = {
+        getElementById: id => (elements[id] = elements[id] || new FakeElement()),
+        querySelector: selector => {
+            if (selector.startsWith('[data-key') || selector === '.contact-separator') return null;
+            selectors[selector] = selectors[selector] || new FakeElement();
+            if (selector.endsWith(':checked')) selectors[selector].value = mode;
+            return selectors[selector];
+        },
+        querySelectorAll: () => [],
+        addEventListener: (name, handler) => { document.ready = handler; },
+    };
+    const requests = [];
+    const fetch = async (url, options = {}) => {
+        requests.push({ url, options });
+        if (!routes[url]) throw new Error(`Unexpected request to ${url}`);
+        return routes[url](options);
+    };
+    const context = vm.createContext({
+        document, fetch, requests, console, Response, ReadableStream, TextDecoder, TextEncoder,
+        FormData: class FormData {},
+    });
+    vm.runInContext(SCRIPT, context);
+    document.ready();
+    const element = document.getElementById;
+    return {
+        element,
+        requests,
+        submit: () => element('analysis-form').listeners.submit({ preventDefault() {} }),
+        rewrite: () => element('rewrite-button').listeners.click(),
+    };
+}
+
+// Lets pending promise callbacks (fetch, reader.read) run
+function settle() {
+    return new Promise(resolve => setTimeout(resolve, 10));
+}
+
+module.exports = { loadPage, eventStream, jsonResponse, settle };
@@ -0,0 +1,82 @@
+// tests/js/test_script.js
+// Run with: node --test tests/js/test_script.js (tests/test_script.py runs it under pytest)
+
+const test = require('node:test');
+const assert = require('node:assert');
+
+const { loadPage, eventStream, jsonResponse, settle } = require('./harness');
+
+const ANALYSIS = { summary: 'Strong backend match.', strengths: ['Python'], missing_keywords: ['Kubernetes'],
+                   suggested_changes: ['Mention Kubernetes.'], scoring_breakdown: {}, match_score: 72 };
+
+test('a queued analysis shows its queue position, then the result', async () => {
+    const job = eventStream();
+    const page = loadPage({
+        '/analyze/stream': () => jsonResponse({ status: 'queued', job_id: 'j1', events_url: '/jobs/j1/events' }, 202),
+        '/jobs/j1/events': () => job.response,
+    });
+    const loaderText = page.element('loader-text');
+
+    const submitted = page.submit();
+    await settle();
+    job.send('status', { status: 'queued', position: 2 });
+    await settle();
+    assert.strictEqual(loaderText.textContent, 'Waiting for the analyzer (position 2 in queue)...');
+
+    job.send('status', { status: 'running', position: null });
+    await settle();
+    assert.strictEqual(loaderText.textContent, 'Processing your request...');
+
+    job.send('complete', { status: 'analysis_complete', data: ANALYSIS });
+    job.close();
+    await submitted;
+    assert.deepStrictEqual(page.requests.map(r => r.url), ['/analyze/stream', '/jobs/j1/events']);
+    assert.ok(!page.element('results-container').hidden && page.element('loader').hidden);
+    assert.ok(!page.element('confirmation-section').hidden);
+});
+
+test('an idle server streams the rewrite without queueing it', async () => {
+    const stream = eventStream();
+    const page = loadPage({ '/generate/stream': () => stream.response });
+
+    const generated = page.rewrite();
+    await settle();
+    stream.send('section', { index: 0, section: { title: 'Experience', content: ['Built the billing service.'] } });
+    await settle();
+    assert.ok(!page.element('download-section').hidden);
+    assert.match(page.element('new-resume-preview').innerHTML, /Built the billing service\./);
+
+    stream.send('complete', { new_resume_json: { candidate_name: 'Jane Doe', sections: [] } });
+    stream.close();
+    await generated;
+    assert.deepStrictEqual(page.requests.map(r => r.url), ['/generate/stream']);
+    assert.match(page.element('new-resume-preview').innerHTML, /Jane Doe/);
+});
+
+test('analysis fields are rendered as they stream in, before the analysis completes', async () => {
+    const stream = eventStream();
+    const page = loadPage({ '/analyze/stream': () => stream.response });
+    const results = page.element('results-container');
+
+    const submitted = page.submit();
+    await settle();
+    stream.send('field', { name: 'summary', value: 'Strong <backend> match.' });
+    await settle();
+    assert.ok(!results.hidden && !page.element('loader').hidden);
+    assert.match(results.innerHTML, /Strong &lt;backend&gt; match\./);
+    assert.doesNotMatch(results.innerHTML, /Strengths/);
+
+    stream.send('field', { name: 'strengths', value: ['Python'] });
+    stream.send('field', { name: 'scoring_breakdown', value: { technical_skills: { score: 80, justification: 'Solid Python.' } } });
+    await settle();
+    assert.match(results.innerHTML, /Strengths[\s\S]*Python/);
+    assert.match(results.innerHTML, /technical skills[\s\S]*80[\s\S]*Solid Python\./);
+    assert.doesNotMatch(results.innerHTML, /Match Score/);
+    assert.ok(page.element('confirmation-section').hidden);
+
+    stream.send('complete', { status: 'analysis_complete', data: ANALYSIS });
+    stream.close();
+    await submitted;
+    assert.match(results.innerHTML, /Match Score[\s\S]*72%/);
+    assert.ok(page.element('loader').hidden && !page.element('confirmation-section').hidden);
+});
@@ -0,0 +1,43 @@
+# tests/test_ai_cache.py
+
+import pytest
+
+import analyzer_logic
+import model_router
+import result_cache
+from synthetic import make_resume
+
+JD_TEXT = "Backend engineer with Python, Kubernetes and PostgreSQL experience."
+
+
+@pytest.fixture
+def resume_text(monkeypatch):
+    monkeypatch.setattr(analyzer_logic, "ai_cache", result_cache.TieredCache(
+        "ai_results", memory=result_cache.MemoryLRU(max_entries=8)))
+    return analyzer_logic.convert_resume_json_to_text(make_resume(1, seed=11))
+
+
+@pytest.fixture
+def rerouted(monkeypatch):
+    """Routes every call to the fast model, as the router does while the preferred one misses its SLO."""
+    router = analyzer_logic.router
+
+    def route(mode, prompt):
+        return model_router.Route(mode, router.fast_model, "slo", 0, "small")
+    monkeypatch.setattr(router, "route", route)
+
+
+def _stream(resume_text, jd_text):
+    return dict(analyzer_logic.stream_analysis_with_ai(resume_text, jd_text))["complete"]
+
+
+@pytest.mark.parametrize("analyze", [analyzer_logic.analyze_resume_with_ai, _stream])
+def test_preferred_model_result_is_cached(resume_text, analyze):
+    assert analyze(resume_text, JD_TEXT)["scoring_breakdown"]
+    assert analyzer_logic.get_cached_analysis(resume_text, JD_TEXT) is not None
+
+
+@pytest.mark.parametrize("analyze", [analyzer_logic.analyze_resume_with_ai, _stream])
+def test_rerouted_result_is_not_cached_under_the_preferred_model(resume_text, rerouted, analyze):
+    assert analyze(resume_text, JD_TEXT)["scoring_breakdown"]
+    assert analyzer_logic.get_cached_analysis(resume_text, JD_TEXT) is None
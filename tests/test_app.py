@@ -0,0 +1,92 @@
+# tests/test_app.py
+
+import json
+
+import pytest
+
+import analyzer_logic
+import app as web
+import model_router
+import result_cache
+from synthetic import make_resume
+
+JD_TEXT = "Backend engineer with Python, Kubernetes and PostgreSQL experience."
+
+
+def _events(body):
+    """Parses an SSE body into (event, data) pairs, skipping keep-alive comments."""
+    events = []
+    for frame in body.split("\n\n"):
+        lines = [line for line in frame.split("\n") if line and not line.startswith(":")]
+        if lines:
+            event = next(line[7:] for line in lines if line.startswith("event: "))
+            data = "".join(line[6:] for line in lines if line.startswith("data: "))
+            events.append((event, json.loads(data)))
+    return events
+
+
+@pytest.fixture
+def client():
+    web.app.config["TESTING"] = True
+    return web.app.test_client()
+
+
+def _analyze_stream(client):
+    pdf = analyzer_logic.create_pdf_with_logo(make_resume(2, seed=11), "beround")
+    return client.post("/analyze/stream", data={
+        "analysis_mode": "full_analysis", "job_description": JD_TEXT, "speculative_rewrite": "0",
+        "resume": (pdf, "resume.pdf"),
+    })
+
+
+def test_analysis_streams_fields_before_complete_and_frees_its_slot(client):
+    response = _analyze_stream(client)
+    assert response.mimetype == "text/event-stream"
+    events = _events(response.get_data(as_text=True))
+    response.close()
+
+    names = [event for event, _ in events]
+    assert names[-1] == "complete" and names.count("field") >= 3
+    fields = [data["name"] for event, data in events if event == "field"]
+    assert "summary" in fields and "scoring_breakdown" in fields
+    assert events[-1][1]["status"] == "analysis_complete"
+    stats = web._stream_admission_stats()
+    assert stats["open"] == 0 and stats["streamed"] >= 1
+
+
+def test_generate_uses_the_streamed_analysis_even_when_it_was_not_cached(client, monkeypatch):
+    monkeypatch.setattr(analyzer_logic, "ai_cache", result_cache.TieredCache(
+        "ai_results", memory=result_cache.MemoryLRU(max_entries=8)))
+    router = analyzer_logic.router
+    # A call rerouted to the fast model is not cached, so only the session has the analysis
+    monkeypatch.setattr(router, "route", lambda mode, prompt: model_router.Route(mode, router.fast_model, "slo", 0, "small"))
+
+    analysis = _events(_analyze_stream(client).get_data(as_text=True))[-1][1]["data"]
+    with client.session_transaction() as session:
+        assert session["initial_analysis"]["scoring_breakdown"] == analysis["scoring_breakdown"]
+        assert analyzer_logic.get_cached_analysis(session["original_resume_text"], JD_TEXT) is None
+
+    response = client.post("/generate", json={"reformat_only": True})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["new_resume_json"]
+
+
+def test_busy_server_queues_the_stream_and_the_job_streams_its_result(client, monkeypatch):
+    monkeypatch.setattr(web, "MAX_AI_STREAMS", 1)
+    monkeypatch.setitem(web._stream_stats, "open", 1)  # Another request holds the only slot
+
+    response = _analyze_stream(client)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["events_url"] == f"/jobs/{job['job_id']}/events"
+
+    events = _events(client.get(job["events_url"]).get_data(as_text=True))
+    assert events[-1][0] == "complete"
+    assert events[-1][1]["status"] == "analysis_complete"
+    assert events[-1][1]["data"]["scoring_breakdown"]
+    assert all(event == "status" for event, _ in events[:-1])
+    assert web._stream_admission_stats()["queued_when_busy"] >= 1
+
+
+def test_events_for_an_unknown_job_are_not_found(client):
+    assert client.get("/jobs/unknown/events").status_code == 404
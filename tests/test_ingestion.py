@@ -0,0 +1,54 @@
+# tests/test_ingestion.py
+
+import io
+import tracemalloc
+
+import fitz
+import pytest
+
+import analyzer_logic
+import ingestion
+import profiling
+from synthetic import make_resume
+
+
+@pytest.fixture
+def pdf_bytes():
+    return analyzer_logic.create_pdf_with_logo(make_resume(3), "beround").getvalue()
+
+
+def test_pdf_text_from_the_layout_pass_matches_get_text(pdf_bytes):
+    text, layout = ingestion._pdf_text(memoryview(pdf_bytes))
+    plain, no_layout = ingestion._pdf_text(memoryview(pdf_bytes), with_layout=False)
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    assert text == plain
+    assert all(ingestion._pdf_page(page)[0] == page.get_text() for page in doc)
+    assert layout["headings"] and no_layout is None
+
+
+def test_text_only_cache_entry_is_not_used_for_layout(pdf_bytes, monkeypatch):
+    monkeypatch.setattr(ingestion, "extraction_cache", ingestion.result_cache.TieredCache(
+        "extractions", memory=ingestion.result_cache.MemoryLRU(max_entries=8)))
+
+    assert ingestion.extract_text_from_bytes("resume.pdf", pdf_bytes)
+    extracted = ingestion.extract("resume.pdf", io.BytesIO(pdf_bytes))
+
+    assert not extracted.cached and extracted.layout["headings"]
+    assert ingestion.extract("resume.pdf", io.BytesIO(pdf_bytes)).cached
+
+
+def test_memory_tracing_upload_leaves_a_concurrent_memory_profile_running(pdf_bytes, monkeypatch):
+    monkeypatch.setattr(ingestion, "TRACE_MEMORY", True)
+    monkeypatch.setattr(profiling, "HEADER_ENABLED", True)
+    traces, pdf_text = [], ingestion._pdf_text
+
+    def profile_starts_mid_upload(*args):
+        traces.append(profiling.start_request("analyze", "memory"))
+        return pdf_text(*args)
+    monkeypatch.setattr(ingestion, "_pdf_text", profile_starts_mid_upload)
+
+    assert ingestion.extract_text_from_bytes("resume.pdf", pdf_bytes)
+    assert tracemalloc.is_tracing()
+    profiling.finish_request(traces[0], "POST", "/analyze", 200)
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,90 @@
+# tests/test_json_repair.py
+
+from json.decoder import JSONDecodeError
+
+import pytest
+
+import json_repair
+
+
+@pytest.mark.parametrize("text, value, repairs", [
+    ('{"score": 85}', {"score": 85}, ()),
+    ('```json\n{"score": 85}\n```', {"score": 85}, ("fence",)),
+    ('```\n[1, 2]\n```', [1, 2], ("fence",)),
+    ('{"skills": ["Python", "SQL",], }', {"skills": ["Python", "SQL"]}, ("trailing_comma",)),
+    ('Here is the analysis:\n{"score": 85}', {"score": 85}, ("leading_text",)),
+    ('{"score": 85}\nLet me know if you need anything else.', {"score": 85}, ("trailing_text",)),
+    ('{"summary": "Led the billing', {"summary": "Led the billing"}, ("truncated",)),
+    ('{"summary": "ends in an escape \\', {"summary": "ends in an escape "}, ("truncated",)),
+    ('{"score": 85, "summa', {"score": 85}, ("truncated",)),
+    ('{"score": 85, "summary"', {"score": 85}, ("truncated",)),
+    ('{"score": 85, "summary":', {"score": 85}, ("truncated",)),
+    ('{"score": 85, "ok": tru', {"score": 85}, ("truncated",)),
+    ('{"score": 85, "ok": true', {"score": 85, "ok": True}, ("truncated",)),
+    ('{"score": 8', {"score": 8}, ("truncated",)),
+    ('{"items": [{"a": 1}, {"a": 2', {"items": [{"a": 1}, {"a": 2}]}, ("truncated",)),
+    ('{"items": [1, 2,', {"items": [1, 2]}, ("truncated",)),
+    ('```json\nSure! {"score": 85,}\n```', {"score": 85}, ("fence", "leading_text", "trailing_comma")),
+])
+def test_repair(text, value, repairs):
+    repaired = json_repair.repair(text)
+    assert repaired.value == value
+    assert repaired.repairs == repairs
+
+
+@pytest.mark.parametrize("text", ["", "no json here", None, '{"score": 85 "summary": "x"}'])
+def test_repair_gives_up(text):
+    with pytest.raises(JSONDecodeError):
+        json_repair.repair(text)
+
+
+SCHEMA = json_repair.Schema({"type": "object", "fields": {
+    "score": {"type": "integer", "min": 0, "max": 100},
+    "summary": {"type": "string"},
+    "strengths": {"type": "array", "items": {"type": "string"}, "default": []},
+    "details": {"type": "object", "fields": {"level": {"type": "string", "default": "unknown"}}},
+}})
+VALID = {"score": 85, "summary": "Strong match", "strengths": ["Python"], "details": {"level": "senior"}}
+
+
+@pytest.mark.parametrize("field, raw, coerced", [
+    ("score", "85%", 85),
+    ("score", "85", 85),
+    ("score", 84.6, 85),
+    ("score", "8/10", 80),
+    ("score", "4.5 / 5", 90),
+    ("score", 140, 100),
+    ("score", "-3", 0),
+    ("summary", 42, "42"),
+    ("summary", ["Strong", "match"], "Strong match"),
+    ("strengths", "Python", ["Python"]),
+    ("strengths", "  ", []),
+    ("strengths", ["Python", None, {"x": 1}], ["Python"]),
+    ("strengths", 7, []),
+    ("details", {"level": None}, {"level": "unknown"}),
+])
+def test_validate_coerces(field, raw, coerced):
+    value, missing = SCHEMA.validate(dict(VALID, **{field: raw}))
+    assert value[field] == coerced
+    assert missing == []
+
+
+@pytest.mark.parametrize("value, missing", [
+    (dict(VALID, score="excellent"), ["score"]),
+    (dict(VALID, score=True), ["score"]),
+    ({k: v for k, v in VALID.items() if k != "summary"}, ["summary"]),
+    ({k: v for k, v in VALID.items() if k != "details"}, ["details"]),
+    ("not an object", ["score", "summary", "details"]),
+])
+def test_validate_reports_missing(value, missing):
+    checked, reported = SCHEMA.validate(value)
+    assert reported == missing
+    assert all(path not in checked for path in missing)
+
+
+def test_skeleton_asks_only_for_missing_fields():
+    schema = json_repair.Schema({"type": "object", "fields": {
+        "score": {"type": "integer", "hint": "0-100"},
+        "details": {"type": "object", "fields": {"level": {"type": "string"}, "years": {"type": "integer"}}},
+    }})
+    assert schema.skeleton(["score", "details.level"]) == {"score": "0-100", "details": {"level": "[string]"}}
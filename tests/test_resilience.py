@@ -0,0 +1,161 @@
+# tests/test_resilience.py
+
+import time
+import threading
+
+import pytest
+
+import analyzer_logic
+import fake_gemini
+import gemini_client
+import resilience
+from synthetic import make_resume
+
+PROMPT = "Summarise this resume."
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _script(model, *settings):
+    """Applies settings[i] to the i-th call to model; the last settings stay for every later call."""
+    simulate, lock, calls = model._simulate, threading.Lock(), [0]
+
+    def scripted(*args):
+        with lock:
+            index, calls[0] = calls[0], calls[0] + 1
+        model.configure(**settings[min(index, len(settings) - 1)])
+        simulate(*args)
+    model._simulate = scripted
+    return model
+
+
+def _client(model, **kwargs):
+    kwargs = dict({"timeout": 5.0, "max_retries": 2, "backoff_base": 0.001, "hedge_percentile": 0}, **kwargs)
+    return gemini_client.AsyncGeminiClient(lambda model_name: model, **kwargs)
+
+
+def test_caller_deadline_raises_timeout():
+    client = _client(fake_gemini.FakeModel(latency=1.0), timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        client.generate(PROMPT)
+    assert client.stats()["timeouts"] == 1
+
+
+def test_slow_attempt_is_retried_within_the_deadline():
+    model = _script(fake_gemini.FakeModel(latency=0), {"latency": 1.0}, {"latency": 0})
+    client = _client(model, upstream_timeout=0.1)
+
+    assert client.generate(PROMPT).text
+    assert model.calls == 2 and client.stats()["retries"] == 1
+
+
+@pytest.mark.parametrize("failures, max_retries, succeeds", [
+    (0, 2, True),
+    (1, 2, True),
+    (2, 2, True),
+    (3, 2, False),
+    (1, 0, False),
+])
+def test_transient_errors_are_retried(failures, max_retries, succeeds):
+    model = _script(fake_gemini.FakeModel(latency=0), *[{"error_rate": 1.0}] * failures, {"error_rate": 0.0})
+    client = _client(model, max_retries=max_retries)
+
+    if succeeds:
+        assert client.generate(PROMPT).text
+    else:
+        with pytest.raises(fake_gemini.FakeUpstreamError):
+            client.generate(PROMPT)
+    assert model.calls == min(failures, max_retries) + 1
+    assert client.stats()["retries"] == min(failures, max_retries)
+
+
+def test_timed_out_blocking_call_keeps_its_slot_until_it_returns():
+    model = _script(fake_gemini.FakeModel(), {"latency": 0.5}, {"latency": 0})
+    client = _client(model, max_concurrency=1, max_retries=0, upstream_timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        client.generate(PROMPT)
+    assert client.stats()["in_flight"] == 1 and client.stats()["abandoned_calls"] == 1
+
+    start = time.perf_counter()
+    assert client.generate("Another prompt.").text
+    assert time.perf_counter() - start > 0.3
+    assert client.stats()["in_flight"] == 0
+
+
+def test_client_errors_are_not_retried_or_held_against_the_breaker():
+    model = fake_gemini.FakeModel(latency=0, error_rate=1.0, error_code=400)
+    client = _client(model, breaker=resilience.CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(fake_gemini.FakeUpstreamError):
+        client.generate(PROMPT)
+    assert model.calls == 1
+    assert client.breaker.state == resilience.CircuitBreaker.CLOSED
+
+
+def test_call_slower_than_p95_is_hedged():
+    warmup = resilience.LatencyWindow().min_samples
+    model = _script(fake_gemini.FakeModel(), *[{"latency": 0.01}] * warmup, {"latency": 2.0}, {"latency": 0.01})
+    client = _client(model, hedge_percentile=95, hedge_min_delay=0.05)
+    for _ in range(warmup):
+        client.generate(PROMPT)
+
+    start = time.perf_counter()
+    assert client.generate(PROMPT).text
+    assert time.perf_counter() - start < 1.0
+    stats = client.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_breaker_trips_then_recovers_through_a_probe():
+    clock = _Clock()
+    model = fake_gemini.FakeModel(latency=0, error_rate=1.0)
+    client = _client(model, max_retries=0,
+                     breaker=resilience.CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock))
+
+    for _ in range(2):
+        with pytest.raises(fake_gemini.FakeUpstreamError):
+            client.generate(PROMPT)
+    with pytest.raises(resilience.CircuitOpenError):
+        client.generate(PROMPT)
+    assert model.calls == 2 and client.circuit_open()
+
+    # A failed probe opens the circuit for another reset_timeout
+    clock.now += 30
+    with pytest.raises(fake_gemini.FakeUpstreamError):
+        client.generate(PROMPT)
+    assert client.circuit_open() and client.breaker.stats()["trips"] == 2
+
+    clock.now += 30
+    model.configure(error_rate=0.0)
+    assert client.generate(PROMPT).text
+    assert client.breaker.state == resilience.CircuitBreaker.CLOSED
+    assert client.breaker.stats()["rejected"] == 1
+
+
+def test_open_circuit_falls_back_to_the_local_score(monkeypatch):
+    model = fake_gemini.FakeModel(latency=0)
+    client = _client(model, breaker=resilience.CircuitBreaker(failure_threshold=1))
+    client.breaker.record_failure()
+    monkeypatch.setattr(analyzer_logic, "gemini", client)
+    resume_text = analyzer_logic.convert_resume_json_to_text(make_resume(1, seed=7))
+    jd_text = "Backend engineer with Python, Kubernetes and PostgreSQL experience."
+
+    result = analyzer_logic.analyze_resume_with_ai(resume_text, jd_text)
+    assert result["degraded"] and "error" not in result
+    assert result["scoring_breakdown"] and model.calls == 0
+
+    monkeypatch.setattr(analyzer_logic, "LOCAL_FALLBACK", False)
+    assert analyzer_logic.analyze_resume_with_ai(resume_text, jd_text) == {"error": analyzer_logic.UNAVAILABLE_ERROR}
+
+    # The degraded result was not cached, so the first call after recovery goes to Gemini
+    client.breaker.record_success()
+    result = analyzer_logic.analyze_resume_with_ai(resume_text, jd_text)
+    assert not result.get("degraded") and model.calls == 1
@@ -0,0 +1,17 @@
+# tests/test_result_cache.py
+
+import os
+
+import pytest
+
+import result_cache
+
+
+def test_failed_disk_write_leaves_no_temp_file(tmp_path):
+    store = result_cache.DiskStore(str(tmp_path))
+    store.set("ok", {"score": 85})
+
+    with pytest.raises(TypeError):
+        store.set("bad", {"score": object()})
+    assert os.listdir(tmp_path) == ["ok.json"]
+    assert store.get("ok") == {"score": 85} and store.get("bad") is None
@@ -0,0 +1,52 @@
+# tests/test_resume_parser.py
+
+import io
+
+import pytest
+
+import analyzer_logic
+import ingestion
+import resume_parser
+from synthetic import make_resume
+
+RENDERERS = {"pdf": analyzer_logic.create_pdf_with_logo, "docx": analyzer_logic.create_docx}
+
+
+@pytest.mark.parametrize("company", ["nologo", "beround"])
+@pytest.mark.parametrize("file_format", ["pdf", "docx"])
+@pytest.mark.parametrize("pages", [1, 3])
+def test_rendered_resume_round_trips(file_format, company, pages):
+    resume = make_resume(pages, seed=pages)
+    data = RENDERERS[file_format](resume, company).getvalue()
+    extracted = ingestion.extract(f"resume.{file_format}", io.BytesIO(data))
+
+    parsed, confidence = resume_parser.parse_resume(extracted.text, extracted.candidate_name, extracted.layout)
+
+    assert extracted.candidate_name == resume["candidate_name"]
+    assert parsed == resume
+    assert confidence >= resume_parser.MIN_CONFIDENCE
+
+
+def test_first_line_heading_is_not_taken_for_the_name():
+    text = "SUMMARY\nBackend engineer with ten years of Python.\nSKILLS\nPython, Go\n"
+    parsed, confidence = resume_parser.parse_resume(text, ingestion.candidate_name_from_text(text))
+
+    assert [section["title"] for section in parsed["sections"]] == ["Summary", "Skills"]
+    assert confidence < resume_parser.MIN_CONFIDENCE
+
+
+def test_dropped_header_lines_lower_confidence():
+    text = ("Jane Doe\nSenior Engineer\njane@example.com\nLed platform work at scale\nMentored eight engineers\n"
+            "Spoke at PyCon\nSKILLS\nPython, Go\n")
+    _, confidence = resume_parser.parse_resume(text, "Jane Doe")
+
+    assert confidence < resume_parser.MIN_CONFIDENCE
+
+
+def test_contact_lines_before_the_name_are_skipped():
+    text = "+1 555 0100\njane@example.com\nJane Doe\nSenior Engineer\nSKILLS\nPython, Go\n"
+    parsed, _ = resume_parser.parse_resume(text, ingestion.candidate_name_from_text(text))
+
+    assert parsed["candidate_name"] == "Jane Doe"
+    assert parsed["designation_line"] == "Senior Engineer"
+    assert parsed["contact_info"] == {"phone": "+1 555 0100", "email": "jane@example.com"}
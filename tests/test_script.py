@@ -0,0 +1,15 @@
+# tests/test_script.py
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+SCRIPT_TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js", "test_script.js")
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="static/script.js tests need Node.js")
+def test_static_script():
+    result = subprocess.run(["node", "--test", SCRIPT_TESTS], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,92 @@
+# text_layout.py
+
+import functools
+from itertools import accumulate
+
+import fitz  # PyMuPDF
+
+
+class GlyphMetrics:
+    """
+    Per-character advance widths for one font at size 1, so the width of any run of
+    text is a sum of table lookups instead of a call into MuPDF.
+
+    fontname is either a PDF Base-14 name such as "helv" or a path to a TrueType file
+    such as the ones in static/fonts. For Base-14 fonts, Latin-1 characters are measured
+    exactly like fitz.get_text_length; other characters use the font's real glyph advance.
+    (get_text_length itself under-measures whole strings containing non-ASCII text: it
+    steps through the string by UTF-8 byte count and skips the following characters.)
+    """
+
+    def __init__(self, fontname):
+        self.fontname = fontname
+        if fontname.lower().endswith((".ttf", ".otf")):
+            font = fitz.Font(fontfile=fontname)
+            latin_measure = lambda ch: font.glyph_advance(ord(ch))
+        else:
+            font = fitz.Font(fontname)
+            latin_measure = lambda ch: fitz.get_text_length(ch, fontname=fontname, fontsize=1)
+        self._measure = lambda ch: font.glyph_advance(ord(ch))
+        # Latin-1 covers nearly all resume text; anything else is measured on first use
+        self._latin = [latin_measure(chr(i)) for i in range(256)]
+        self._other = {}
+
+    def advance(self, ch):
+        code = ord(ch)
+        if code < 256:
+            return self._latin[code]
+        width = self._other.get(ch)
+        if width is None:
+            width = self._other[ch] = self._measure(ch)
+        return width
+
+    def text_length(self, text, fontsize):
+        return sum(map(self.advance, text)) * fontsize
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics(fontname):
+    return GlyphMetrics(fontname)
+
+
+@functools.lru_cache(maxsize=8192)
+def wrap_lines(text, width, fontname="helv", fontsize=11):
+    """
+    Greedily breaks text into lines narrower than width, in a single pass.
+
+    Words are re-joined with single spaces and a prefix sum of glyph advances is built
+    over the whole paragraph, so the width of any candidate line is one subtraction.
+    Results are memoized per (text, width, font, size): estimating a paragraph's height
+    and then painting it costs one layout, not two.
+
+    Returns a tuple of line strings; an empty tuple for blank text.
+    """
+    words = str(text).split()
+    if not words:
+        return ()
+    metrics = get_metrics(fontname)
+    paragraph = " ".join(words)
+    prefix = [0.0, *accumulate(map(metrics.advance, paragraph))]
+
+    lines = []
+    line_start = 0  # character offset of the current line in paragraph
+    line_end = 0    # offset just past the last word placed on it; 0 while the first line is still empty
+    offset = 0
+    for word in words:
+        word_end = offset + len(word)
+        # The current line always ends at the previous word, so this span is "line + space + word"
+        if (prefix[word_end] - prefix[line_start]) * fontsize < width:
+            line_end = word_end
+        else:
+            # Same rule as the original renderer: a word that does not fit starts a new
+            # line, even if that leaves the current line empty.
+            lines.append(paragraph[line_start:line_end] if line_end else "")
+            line_start, line_end = offset, word_end
+        offset = word_end + 1
+    lines.append(paragraph[line_start:line_end])
+    return tuple(lines)
+
+
+def wrapped_height(text, width, fontname="helv", fontsize=11, line_height=15.5):
+    """Height of text wrapped to width; blank text still occupies one line."""
+    return max(1, len(wrap_lines(str(text), width, fontname, fontsize))) * line_height